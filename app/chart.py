@@ -1,23 +1,99 @@
+import json
 from abc import ABC, abstractclassmethod
 
-import plotly.express as px
 import streamlit as st
 
-from utils import load_constants
+from utils import LRUCache, downsample_indices, load_constants
 
 
 C = CONSTANTS = load_constants()
 
 
+@st.cache_resource
+def figure_cache() -> LRUCache:
+    return LRUCache(C["figure_cache_size"])
+
+
+def downsample(df, x, y, groups, max_points, anchors=()):
+    """Downsample every series of a long-format DataFrame with LTTB
+
+    Args:
+        df (DataFrame): Long-format chart data
+        x (str): Column with the x values
+        y (str): Column with the y values
+        groups (list[str]): Columns identifying each series
+        max_points (int): Point budget per series
+        anchors (Iterable[float], optional): x values to keep exact
+
+    Returns:
+        DataFrame: The downsampled data, sorted by x within each series
+    """
+    import pandas as pd
+
+    series = df.groupby(groups, sort=False) if groups else [(None, df)]
+    parts = []
+    for _, series_df in series:
+        series_df = series_df.sort_values(x)
+        keep = downsample_indices(series_df[x].to_numpy(dtype=float),
+                                  series_df[y].to_numpy(dtype=float),
+                                  max_points,
+                                  anchors)
+        parts.append(series_df.iloc[keep])
+    return pd.concat(parts)
+
+
 class PlotlyChart(ABC):
+    # Scenario the chart is restricted to, if any
+    scenario = None
+
     def __init__(self, chart, use_container_width=True):
         self.chart = st.plotly_chart(
             chart, use_container_width=use_container_width)
 
     @abstractclassmethod
-    def build(cls):
+    def figure(cls, df, num_steps, vline):
         raise NotImplementedError
 
+    @classmethod
+    def build(cls, df, num_steps, vline):
+        """Render the chart, reusing the serialized figure when the same
+        simulation result was already drawn with the same phase boundaries.
+
+        The result is identified by `df.attrs['result_hash']`; results
+        without one are always redrawn.
+        """
+        result_hash = df.attrs.get('result_hash')
+        key = (result_hash, cls.__name__, tuple(vline.items()))
+        cache = figure_cache()
+        figure_json = cache.get(key)
+        if figure_json is None:
+            if cls.scenario is not None:
+                df = df.query(f"scenario == '{cls.scenario}'")
+            figure_json = cls.figure(df, num_steps, vline).to_json()
+            if result_hash is not None:
+                cache.put(key, figure_json)
+        return cls(json.loads(figure_json))
+
+    @staticmethod
+    def line(df, x, y, vline, max_points=C["chart_max_points"], **kwargs):
+        """WebGL line chart over a downsampled copy of `df`
+
+        Wide-format `y` lists are melted into a `variable` / `value` pair,
+        as `px.line` would do, so that every series is downsampled on its own.
+        The points around each phase boundary in `vline` are always kept.
+        """
+        # Deferred so that cached reruns never load Plotly Express
+        import plotly.express as px
+
+        if isinstance(y, list):
+            id_vars = [x] + [col for col in (kwargs.get('line_dash'),) if col]
+            df = df.melt(id_vars=id_vars, value_vars=y)
+            y = 'value'
+            kwargs.setdefault('color', 'variable')
+        groups = [kwargs[k] for k in ('color', 'line_dash') if kwargs.get(k)]
+        df = downsample(df, x, y, groups, max_points, vline.values())
+        return px.line(df, x=x, y=y, render_mode='webgl', **kwargs)
+
     @staticmethod
     def compose_x_domain(num_steps):
         return (
@@ -28,10 +104,13 @@ class PlotlyChart(ABC):
 
 
 class NetworkPowerPlotlyChart(PlotlyChart):
+    scenario = 'consensus_pledge_on'
+
     @classmethod
-    def build(cls, df, num_steps, vline):
-        chart = px.line(
+    def figure(cls, df, num_steps, vline):
+        chart = cls.line(
             df,
+            vline=vline,
             x="years_passed",
             y=["power_rb", "baseline"],
             title="RB Network Power vs. Time",
@@ -45,14 +124,17 @@ class NetworkPowerPlotlyChart(PlotlyChart):
         )
         for k, v in vline.items():
             chart.add_vline(v, line_dash="dot",   annotation_text=k)
-        return cls(chart)
+        return chart
 
 
 class QAPowerPlotlyChart(PlotlyChart):
+    scenario = 'consensus_pledge_on'
+
     @classmethod
-    def build(cls, df, num_steps, vline):
-        chart = px.line(
+    def figure(cls, df, num_steps, vline):
+        chart = cls.line(
             df,
+            vline=vline,
             x="years_passed",
             y='power_qa',
             title="QA Power vs. Time",
@@ -66,16 +148,15 @@ class QAPowerPlotlyChart(PlotlyChart):
         )
         for k, v in vline.items():
             chart.add_vline(v, line_dash="dot",   annotation_text=k)
-        return cls(chart)
-
-        return cls(chart)
+        return chart
 
 
 class EffectiveNetworkTimePlotlyChart(PlotlyChart):
     @classmethod
-    def build(cls, df, num_steps, vline):
-        chart = px.line(
+    def figure(cls, df, num_steps, vline):
+        chart = cls.line(
             df,
+            vline=vline,
             x="years_passed",
             y="effective_network_time",
             color="scenario",
@@ -89,15 +170,18 @@ class EffectiveNetworkTimePlotlyChart(PlotlyChart):
         )
         for k, v in vline.items():
             chart.add_vline(v, line_dash="dot",   annotation_text=k)
-        return cls(chart)
+        return chart
 
 
 class RewardPlotlyChart(PlotlyChart):
+    scenario = 'consensus_pledge_on'
+
     @classmethod
-    def build(cls, df, num_steps, vline):
+    def figure(cls, df, num_steps, vline):
         fig_df = df.melt(id_vars=['years_passed'], value_vars=['daily_simple_reward', 'daily_baseline_reward'])
-        chart = px.line(
+        chart = cls.line(
             fig_df,
+            vline=vline,
             x="years_passed",
             y="value",
             color='variable',
@@ -117,14 +201,17 @@ class RewardPlotlyChart(PlotlyChart):
             y=-0.5,
             xanchor="center",
             x=0.5))
-        return cls(chart)
+        return chart
     
 class RewardPerPowerPlotlyChart(PlotlyChart):
+    scenario = 'consensus_pledge_on'
+
     @classmethod
-    def build(cls, df, num_steps, vline):
+    def figure(cls, df, num_steps, vline):
         fig_df = df.melt(id_vars=['years_passed'], value_vars=['daily_reward_per_rbp', 'daily_reward_per_qap'])
-        chart = px.line(
+        chart = cls.line(
             fig_df,
+            vline=vline,
             x="years_passed",
             y="value",
             color='variable',
@@ -144,14 +231,15 @@ class RewardPerPowerPlotlyChart(PlotlyChart):
             y=-0.5,
             xanchor="center",
             x=0.5))
-        return cls(chart)
+        return chart
 
 
 class TokenDistributionPlotlyChart(PlotlyChart):
     @classmethod
-    def build(cls, df, num_steps, vline):
-        chart = px.line(
+    def figure(cls, df, num_steps, vline):
+        chart = cls.line(
             df,
+            vline=vline,
             x="years_passed",
             y=["fil_circulating",
                'fil_locked'],
@@ -173,14 +261,15 @@ class TokenDistributionPlotlyChart(PlotlyChart):
             y=-0.5,
             xanchor="center",
             x=0.5))
-        return cls(chart)
+        return chart
 
 
 class TokenLockedDistributionPlotlyChart(PlotlyChart):
     @classmethod
-    def build(cls, df, num_steps, vline):
-        chart = px.line(
+    def figure(cls, df, num_steps, vline):
+        chart = cls.line(
             df,
+            vline=vline,
             x="years_passed",
             y=["fil_collateral", "fil_locked_reward"],
             title="Locked Token Distribution - Collateral vs Locked Rewards",
@@ -201,14 +290,15 @@ class TokenLockedDistributionPlotlyChart(PlotlyChart):
             y=-0.5,
             xanchor="center",
             x=0.5))
-        return cls(chart)
+        return chart
 
 
 class CriticalCostPlotlyChart(PlotlyChart):
     @classmethod
-    def build(cls, df, num_steps, vline):
-        chart = px.line(
+    def figure(cls, df, num_steps, vline):
+        chart = cls.line(
             df,
+            vline=vline,
             x="years_passed",
             y="critical_cost",
             title="Critical Cost",
@@ -229,14 +319,15 @@ class CriticalCostPlotlyChart(PlotlyChart):
             y=-0.5,
             xanchor="center",
             x=0.5))
-        return cls(chart)
+        return chart
 
 
 class CirculatingSurplusPlotlyChart(PlotlyChart):
     @classmethod
-    def build(cls, df, num_steps, vline):
-        chart = px.line(
+    def figure(cls, df, num_steps, vline):
+        chart = cls.line(
             df,
+            vline=vline,
             x="years_passed",
             y="circulating_surplus",
             title="Circulating Surplus",
@@ -257,14 +348,15 @@ class CirculatingSurplusPlotlyChart(PlotlyChart):
             y=-0.5,
             xanchor="center",
             x=0.5))
-        return cls(chart)
+        return chart
 
 
 class CirculatingSupplyPlotlyChart(PlotlyChart):
     @classmethod
-    def build(cls, df, num_steps, vline):
-        chart = px.line(
+    def figure(cls, df, num_steps, vline):
+        chart = cls.line(
             df,
+            vline=vline,
             x="years_passed",
             y=["circulating_supply", 'locked_supply'],
             title="Circulating and Locked Supply",
@@ -285,12 +377,12 @@ class CirculatingSupplyPlotlyChart(PlotlyChart):
             y=-0.5,
             xanchor="center",
             x=0.5))
-        return cls(chart)
+        return chart
 
 
 class OnboardingCollateralPlotlyChart(PlotlyChart):
     @classmethod
-    def build(cls, df, num_steps, vline):
+    def figure(cls, df, num_steps, vline):
 
         fig_df = df.melt(id_vars=['years_passed', 'scenario'],
                          value_vars=['initial_pledge_per_new_qa_power',
@@ -298,8 +390,9 @@ class OnboardingCollateralPlotlyChart(PlotlyChart):
                                      'consensus_pledge_per_new_qa_power',
                                     ])
 
-        chart = px.line(
+        chart = cls.line(
             fig_df,
+            vline=vline,
             x="years_passed",
             y="value",
             color='variable',
@@ -320,12 +413,12 @@ class OnboardingCollateralPlotlyChart(PlotlyChart):
             y=-0.5,
             xanchor="center",
             x=0.5))
-        return cls(chart)
+        return chart
 
 
 class RBOnboardingCollateralPlotlyChart(PlotlyChart):
     @classmethod
-    def build(cls, df, num_steps, vline):
+    def figure(cls, df, num_steps, vline):
 
         fig_df = df.melt(id_vars=['years_passed', 'scenario'],
                          value_vars=['initial_pledge_per_new_rb_power',
@@ -333,8 +426,9 @@ class RBOnboardingCollateralPlotlyChart(PlotlyChart):
                                      'consensus_pledge_per_new_rb_power'
                                     ])
 
-        chart = px.line(
+        chart = cls.line(
             fig_df,
+            vline=vline,
             x="years_passed",
             y="value",
             color='variable',
@@ -355,4 +449,4 @@ class RBOnboardingCollateralPlotlyChart(PlotlyChart):
             y=-0.5,
             xanchor="center",
             x=0.5))
-        return cls(chart)
+        return chart
@@ -0,0 +1,71 @@
+import gzip
+import io
+from collections import namedtuple
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# Rows encoded at a time, so that the encoders never hold a second full copy
+CHUNK_ROWS = 10_000
+
+DownloadFormat = namedtuple('DownloadFormat', ['extension', 'mime', 'writer'])
+
+
+def _chunks(df: 'pd.DataFrame'):
+    for start in range(0, len(df), CHUNK_ROWS):
+        yield df.iloc[start:start + CHUNK_ROWS]
+
+
+def _write_csv(df: 'pd.DataFrame', file) -> None:
+    text = io.TextIOWrapper(file, encoding='utf-8', newline='')
+    for i, chunk in enumerate(_chunks(df)):
+        chunk.to_csv(text, header=(i == 0))
+    text.flush()
+    # Leave the underlying binary file open for the caller
+    text.detach()
+
+
+def _write_csv_gzip(df: 'pd.DataFrame', file) -> None:
+    with gzip.GzipFile(fileobj=file, mode='wb') as gzip_file:
+        _write_csv(df, gzip_file)
+
+
+def _write_parquet(df: 'pd.DataFrame', file) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    for chunk in _chunks(df):
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(file, table.schema, compression='zstd')
+        writer.write_table(table)
+    if writer is not None:
+        writer.close()
+
+
+DOWNLOAD_FORMATS = {
+    'CSV (gzip)': DownloadFormat('.csv.gz', 'application/gzip', _write_csv_gzip),
+    'Parquet': DownloadFormat('.parquet', 'application/vnd.apache.parquet', _write_parquet),
+    'CSV': DownloadFormat('.csv', 'text/csv', _write_csv),
+}
+
+
+def encode_results(df: 'pd.DataFrame', columns: list[str], format_name: str):
+    """Encode the selected columns of the results chunk by chunk
+
+    Args:
+        df (DataFrame): Simulation results
+        columns (list[str]): Columns to include, in order
+        format_name (str): Key of `DOWNLOAD_FORMATS`
+
+    Returns:
+        BytesIO: The encoded file, rewound to its start, which
+            `st.download_button` accepts as data
+    """
+    file = io.BytesIO()
+    DOWNLOAD_FORMATS[format_name].writer(df[columns], file)
+    file.seek(0)
+    return file
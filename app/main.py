@@ -3,13 +3,15 @@ import streamlit as st
 
 from chart import *
 from description import description
+from download import DOWNLOAD_FORMATS, encode_results
 from glossary import glossary
-from model import run_cadcad_model
+from model import preview_result, run_cadcad_model
+from preview import relative_error
+from simulation import SimulationHalted, cumulative_durations, default_phases
 from utils import load_constants
-from consensus_pledge_model.types import BehaviouralParams
+from consensus_pledge_model.types import BehaviouralParams, CalculatorSimParams
 from copy import deepcopy
-from dataclasses import dataclass
-from dataclasses_json import dataclass_json
+from functools import partial
 C = CONSTANTS = load_constants()
 import json
 
@@ -36,7 +38,7 @@ with st.expander("See description"):
 
 
 st.markdown("## Graphs")
-plot_container = st.container()
+plot_container = st.empty()
 
 st.markdown("## Glossary")
 glossary_container = st.container()
@@ -77,24 +79,8 @@ phase_count = st.sidebar.slider(
 )
 
 
-
-def generate_default_phases():
-    DEFAULT_PHASES = {}
-    DEFAULT_PHASE_DURATIONS = {}
-    for i in range(1, len(phase_defaults) + 1):
-        phase_default = phase_defaults[i]
-        DEFAULT_PHASE_DURATIONS[i] = phase_default['duration']
-        params = BehaviouralParams(i, 
-                                phase_default['rb_onboarding_rate'], 
-                                phase_default['quality_factor'], 
-                                phase_default['sector_lifetime'], 
-                                phase_default['daily_renewal_probability'] / 100, 
-                                phase_default['sector_lifetime'])
-        DEFAULT_PHASES[i] = params
-    return (DEFAULT_PHASES, DEFAULT_PHASE_DURATIONS)
-
 if ('phases' not in st.session_state) or ('phase_durations' not in st.session_state):
-    (phases, phase_durations) = generate_default_phases()
+    (phases, phase_durations) = default_phases()
     st.session_state['phases'] = phases
     st.session_state['phase_durations'] = phase_durations
 else:
@@ -149,13 +135,6 @@ phases[option] = BehaviouralParams(label,
 st.session_state['phases'] = phases
 st.session_state['phase_durations'] = phase_durations
 
-@dataclass_json
-@dataclass
-class CalculatorSimParams():
-    phase_count: int
-    phases: dict[int, BehaviouralParams]
-    phase_durations: dict[int, float]
-
 params = CalculatorSimParams(phase_count, phases, phase_durations)
 
 st.sidebar.download_button(
@@ -178,31 +157,24 @@ if uploaded_file is not None:
     st.session_state['phases'] = phases
     st.session_state['phase_durations'] = phase_durations
 
-sim_phase_durations = {k: v for k, v in phase_durations.items() if k <= phase_count}
-
-cumm_years = 0.0
-for k, v in sim_phase_durations.items():
-    cumm_years += v
-    sim_phase_durations[k] = cumm_years
+sim_phase_durations = cumulative_durations(phase_durations, phase_count)
 vlines = {f"Phase {k + 1}": v for k, v in sim_phase_durations.items()
           if k >= 1 and k < len(sim_phase_durations)}
 
 sim_phases = {k: v for k, v in phases.items() if k <= phase_count}
-# Run model
-############
-
-df = run_cadcad_model(sim_phase_durations, sim_phases)
 
 # Plot results
 ##########
 
-user_df = df.query("scenario == 'consensus_pledge_on'")
-with plot_container:
-    num_steps = df.timestep.nunique()
-    vline = 0 / 365.25 # TODO
+def format_error(error):
+    return ", ".join(f"{kpi} {value:.1%}" for kpi, value in error.items())
+
+
+def plot_results(df):
+    num_steps = df.attrs['num_steps']
     st.markdown("### Network Power")
-    network_power_chart = NetworkPowerPlotlyChart.build(user_df, num_steps, vlines)
-    qa_power_chart = QAPowerPlotlyChart.build(user_df, num_steps, vlines)
+    NetworkPowerPlotlyChart.build(df, num_steps, vlines)
+    QAPowerPlotlyChart.build(df, num_steps, vlines)
     with st.expander("Click for more context"):
         st.write(
         '''
@@ -210,7 +182,7 @@ with plot_container:
         ''')
 
     st.markdown("### Token Distribution & Supply")
-    circulating_supply_chart = CirculatingSupplyPlotlyChart.build(df, num_steps, vlines)
+    CirculatingSupplyPlotlyChart.build(df, num_steps, vlines)
     with st.expander("Click for more context"):
         st.write(
         '''
@@ -222,11 +194,11 @@ with plot_container:
 
         See Glossary for more information. 
         ''')
-    token_dist_chart = TokenDistributionPlotlyChart.build(df, num_steps, vlines)
-    locked_token_dist_chart = TokenLockedDistributionPlotlyChart.build(df, num_steps, vlines)
+    TokenDistributionPlotlyChart.build(df, num_steps, vlines)
+    TokenLockedDistributionPlotlyChart.build(df, num_steps, vlines)
 
     st.markdown("### Security")
-    critical_cost_chart = CriticalCostPlotlyChart.build(df, num_steps, vlines)
+    CriticalCostPlotlyChart.build(df, num_steps, vlines)
     with st.expander("Click for more context"):
         st.write(
         '''
@@ -234,7 +206,7 @@ with plot_container:
 
         CriticalCost = OnboardingPledge per QAP * Network QAP * 1/3 
         ''')
-    circulating_surplus_chart = CirculatingSurplusPlotlyChart.build(df, num_steps, vlines)
+    CirculatingSurplusPlotlyChart.build(df, num_steps, vlines)
     with st.expander("Click for more context"):
         st.write(
         '''
@@ -246,32 +218,59 @@ with plot_container:
         ''')
 
     st.markdown("### Sector Onboarding")
-    onboarding_collateral_chart = OnboardingCollateralPlotlyChart.build(df, num_steps, vlines)
+    OnboardingCollateralPlotlyChart.build(df, num_steps, vlines)
     with st.expander("Click for more context"):
         st.write(
         '''
         The distribution of the costs per PiB (first for QAP, then RBP) for the individual parts of the Initial Pledge show the effects of the Consensus Pledge on Filecoin security. While an increase in Consensus Pledge makes attacks more costly, it naturally also increases capital costs for honest Storage Providers and their daily operations. 
         ''')
-    rb_onboarding_collateral_chart = RBOnboardingCollateralPlotlyChart.build(df, num_steps, vlines)
+    RBOnboardingCollateralPlotlyChart.build(df, num_steps, vlines)
     
     st.markdown("### Sector Reward")
-    reward_chart = RewardPlotlyChart.build(user_df, num_steps, vlines)
-    reward_per_power_chart = RewardPerPowerPlotlyChart.build(user_df, num_steps, vlines)
-    
-# Download data
-
+    RewardPlotlyChart.build(df, num_steps, vlines)
+    RewardPerPowerPlotlyChart.build(df, num_steps, vlines)
 
-@st.cache_data
-def convert_df(df):
-    return df.to_csv().encode("utf-8")
+# Run model
+############
 
+# Show an interpolated preview while the exact run computes
+preview = preview_result(sim_phase_durations, sim_phases)
+if preview is not None:
+    preview_df, typical_error = preview
+    preview_note = "Preview interpolated from precomputed runs, shown until the simulation finishes."
+    if typical_error is not None:
+        preview_note += (
+            " Similar previews typically have 95% of their points within "
+            f"{format_error({kpi: median for kpi, (median, _) in typical_error.items()})} "
+            "of the exact result.")
+    with plot_container.container():
+        st.info(preview_note)
+        plot_results(preview_df)
+
+try:
+    df = run_cadcad_model(sim_phase_durations, sim_phases)
+except SimulationHalted as e:
+    with plot_container.container():
+        st.error(f"{e}. Adjust the inputs to get a result.")
+    st.stop()
+
+with plot_container.container():
+    if preview is not None:
+        st.caption(f"95% of the preview's points were within {format_error(relative_error(preview_df, df))} "
+                   "of this exact result.")
+    plot_results(df)
 
+# Download data
 with download_container:
-    csv = convert_df(df)
-    st.text("Download raw simulation results as .csv.")
+    st.text("Download raw simulation results. The file is only generated when requested.")
+    download_columns = st.multiselect(
+        "Columns", list(df.columns), default=list(df.columns), key="download_columns")
+    download_format = st.radio(
+        "Format", list(DOWNLOAD_FORMATS), horizontal=True, key="download_format")
     st.download_button(
         label="Download",
-        data=csv,
-        file_name="results.csv",
-        mime="text/csv",
+        data=partial(encode_results, df, download_columns, download_format),
+        file_name=f"results{DOWNLOAD_FORMATS[download_format].extension}",
+        mime=DOWNLOAD_FORMATS[download_format].mime,
+        on_click="ignore",
     )
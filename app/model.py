@@ -1,93 +1,161 @@
-
 import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+from typing import Optional
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
-import pandas as pd
-from cadCAD_tools.execution import easy_run
-from consensus_pledge_model.types import ConsensusPledgeSweepParams, BehaviouralParams
-from consensus_pledge_model.params import INITIAL_STATE, SINGLE_RUN_PARAMS, TIMESTEP_IN_DAYS
-from consensus_pledge_model.structure import CONSENSUS_PLEDGE_DEMO_BLOCKS
-from utils import load_constants
-from copy import deepcopy
-from cadCAD_tools.preparation import sweep_cartesian_product
-from joblib import Parallel, delayed
-from math import inf
-C = CONSTANTS = load_constants()
+from consensus_pledge_model.types import BehaviouralParams
+from simulation import SCENARIOS, SimulationHalted, SimulationJob
+from simulation import decode_result, encode_request, request_key
+from utils import LRUCache
 import streamlit as st
 
+# Base URL of the simulation service, eg. http://127.0.0.1:8502. If unset,
+# simulations run in a process pool of the app.
+SERVICE_URL_VARIABLE = 'CALCULATOR_SERVICE_URL'
+# Session state key of the session's running simulation
+JOB_STATE_KEY = 'simulation_job'
+# Seconds between checks of a running simulation
+POLL_INTERVAL = 0.1
+# Number of results kept across sessions
+RESULT_CACHE_SIZE = 32
+# Seconds a withdrawal from a service request may take, in the background
+CANCEL_TIMEOUT = 2.0
+
+
+class RemoteSimulationJob():
+    """A request to the simulation service at `url`, see `app/service.py`"""
+
+    def __init__(self,
+                 url: str,
+                 phase_durations: dict[int, float],
+                 phases: dict[int, BehaviouralParams]):
+        self.url = url.rstrip('/')
+        self.body = encode_request(phase_durations, phases)
+        self._thread = ThreadPoolExecutor(1)
+        self.future = self._thread.submit(self._post, '/simulate')
+        self._thread.shutdown(wait=False)
+
+    def _post(self, path: str, timeout: Optional[float] = None) -> bytes:
+        from urllib.request import Request, urlopen
+
+        request = Request(f"{self.url}{path}", data=self.body,
+                          headers={'Content-Type': 'application/json'})
+        with urlopen(request, timeout=timeout) as response:
+            return response.read()
+
+    def _withdraw(self) -> None:
+        try:
+            self._post('/cancel', CANCEL_TIMEOUT)
+        except OSError:
+            # Unreachable, the job then runs to completion on the service
+            pass
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def result(self):
+        """The result of the request, waiting for it if needed
+
+        Raises:
+            SimulationHalted: If a scenario tripped a guard on the service
+        """
+        from urllib.error import HTTPError
+
+        try:
+            return decode_result(self.future.result())
+        except HTTPError as e:
+            if e.code == 422:
+                raise SimulationHalted(e.read().decode()) from e
+            raise
+
+    def cancel(self) -> None:
+        """Withdraw from the request, which the service stops once no other
+        session waits for it. Returns without waiting for the service.
+        """
+        if not self.done():
+            Thread(target=self._withdraw, daemon=True).start()
+
+
+def _executor():
+    # joblib's process pool, reused across calls and sessions. Unlike a
+    # multiprocessing pool it doesn't re-run the app script, which Streamlit
+    # makes the main module, in its workers.
+    from joblib.externals.loky import get_reusable_executor
+
+    return get_reusable_executor(max_workers=len(SCENARIOS))
+
+
+@st.cache_resource
+def _results() -> LRUCache:
+    return LRUCache(maxsize=RESULT_CACHE_SIZE)
+
+
 @st.cache_resource
+def _preview_grid():
+    from preview import PreviewGrid
+
+    return PreviewGrid.load()
+
+
+def preview_result(phase_durations: dict[int, float],
+                   phases: dict[int, BehaviouralParams]):
+    """Interpolated preview of a request and the typical error of such
+    previews, or None if its exact result is cached or the grid doesn't
+    cover it, see `app/preview.py`
+    """
+    grid = _preview_grid()
+    if grid is None or not grid.covers(phase_durations, phases):
+        return None
+    if _results().get(request_key(phase_durations, phases)) is not None:
+        return None
+    return grid.preview(phase_durations, phases), grid.typical_error(phases)
+
+
+def start_simulation(phase_durations: dict[int, float],
+                     phases: dict[int, BehaviouralParams]):
+    """Start a cancellable simulation, on the service if one is configured"""
+    url = os.environ.get(SERVICE_URL_VARIABLE)
+    if url:
+        return RemoteSimulationJob(url, phase_durations, phases)
+    return SimulationJob(_executor(), phase_durations, phases)
+
+
 def run_cadcad_model(phase_durations: dict[int, float],
                      phases: dict[int, BehaviouralParams]):
-    
-    total_duration = max(phase_durations.values())
-    timesteps = int(total_duration * 365.25 / TIMESTEP_IN_DAYS) + 1
-
-    
-    def run_sim(tls):
-        behaviour_param_dict = {}
-        for i_phase, phase in phases.items():
-            if i_phase == len(phases):
-                duration = inf
-            else:
-                duration = int(phase_durations[i_phase] * 365.25)
-            behaviour_param_dict[duration] = phase
-
-        params = ConsensusPledgeSweepParams(**{k: [v] for k, v in SINGLE_RUN_PARAMS.items()})
-        params['target_locked_supply'] = [tls]
-        params["behavioural_params"] = [behaviour_param_dict]
-
-
-        RUN_ARGS = (deepcopy(INITIAL_STATE), sweep_cartesian_product(params), CONSENSUS_PLEDGE_DEMO_BLOCKS, timesteps, 1)
-        
-        return easy_run(*RUN_ARGS)
-
-    dfs = Parallel(n_jobs=2)(delayed(run_sim)(i) for i in [0.3, 0.0])
-    df = pd.concat(dfs).assign(scenario="").sort_values(['target_locked_supply', 'days_passed'], ascending=False)
-    df.loc[df.target_locked_supply == 0.0, 'scenario'] = 'consensus_pledge_off'
-    df.loc[df.target_locked_supply == 0.3, 'scenario'] = 'consensus_pledge_on'
-
-    # Post-process results
-    df = post_process_results(df)
-    
-    # Return relevant scenarios
-    return df.query('timestep > 1')
-
-
-
-def post_process_results(df):
-
-    DROP_COLS = ["reward", 
-                 "simple_mechanism", 
-                 "baseline_mechanism", 
-                 "token_distribution",
-                 "aggregate_sectors",
-                 "behavioural_params",
-                 "vesting_schedule",
-                 "behaviour"]
-
-    df = (df
-        .assign(initial_pledge_per_new_qa_power=lambda df: df.storage_pledge_per_new_qa_power + df.consensus_pledge_per_new_qa_power)
-        .assign(storage_pledge_per_new_rb_power=lambda df: df.storage_pledge_per_new_qa_power * df.power_qa / df.power_rb)
-        .assign(consensus_pledge_per_new_rb_power=lambda df: df.consensus_pledge_per_new_qa_power * df.power_qa / df.power_rb)
-        .assign(initial_pledge_per_new_rb_power=lambda df: df.initial_pledge_per_new_qa_power * df.power_qa / df.power_rb)
-        .assign(daily_simple_reward=lambda df: df.reward.map(lambda x: x.simple_reward)  / TIMESTEP_IN_DAYS)
-        .assign(daily_baseline_reward=lambda df: df.reward.map(lambda x: x.baseline_reward) / TIMESTEP_IN_DAYS)
-        .assign(fil_locked=lambda df: df.token_distribution.map(lambda x: x.locked))
-        .assign(fil_collateral=lambda df: df.token_distribution.map(lambda x: x.collateral))
-        .assign(fil_locked_reward=lambda df: df.token_distribution.map(lambda x: x.locked_rewards))
-        .assign(fil_circulating=lambda df: df.token_distribution.map(lambda x: x.circulating))
-        .assign(fil_available=lambda df: df.token_distribution.map(lambda x: x.available))
-        .assign(fil_vested=lambda df: df.token_distribution.map(lambda x: x.vested))
-        .assign(fil_minted=lambda df: df.token_distribution.map(lambda x: x.minted))
-        .assign(years_passed=lambda x: x.days_passed / C["days_per_year"])
-        .assign(critical_cost=lambda df: (df.power_qa * 0.33) * df.initial_pledge_per_new_qa_power)
-        .assign(circulating_surplus=lambda df: df.fil_circulating / df.critical_cost)
-        .assign(circulating_supply=lambda df: df.fil_circulating / df.fil_available)
-        .assign(locked_supply=lambda df: df.fil_locked / df.fil_available)
-        .assign(daily_reward=lambda df: df.daily_simple_reward + df.daily_baseline_reward)
-        .assign(daily_reward_per_rbp=lambda df: df.daily_reward / df.power_rb)
-        .assign(daily_reward_per_qap=lambda df: df.daily_reward / df.power_qa)
-        .drop(columns=DROP_COLS)
-    )
+    """The calculator's result, cached across sessions
+
+    The simulation runs in the background while this polls it. When an input
+    changes, Streamlit stops the superseded run at its next element update,
+    which cancels the simulation and frees its workers. Each session holds
+    its running simulation as a handle in its state, so that a newer request
+    also cancels one left behind.
+
+    Raises:
+        SimulationHalted: If a scenario tripped a guard, which isn't cached
+    """
+    key = request_key(phase_durations, phases)
+    results = _results()
+    df = results.get(key)
+    if df is not None:
+        return df
+
+    stale = st.session_state.get(JOB_STATE_KEY)
+    if stale is not None:
+        stale.cancel()
+    job = st.session_state[JOB_STATE_KEY] = start_simulation(phase_durations, phases)
+    status = st.empty()
+    try:
+        while not job.done():
+            status.caption("Running the simulation...")
+            time.sleep(POLL_INTERVAL)
+        df = job.result()
+    finally:
+        status.empty()
+        job.cancel()
+        if st.session_state.get(JOB_STATE_KEY) is job:
+            del st.session_state[JOB_STATE_KEY]
+    results.put(key, df)
     return df
@@ -0,0 +1,261 @@
+"""Instant previews of the calculator's results, interpolated from a grid of
+precomputed runs.
+
+Most users stay near the `const.yaml` defaults. The grid varies the
+onboarding rate, quality factor and renewal probability of one phase at a
+time, with the other phases at their defaults, and is run offline with the
+vectorized engine by `scripts/build_preview_grid.py`.
+
+A preview adds the interpolated effect of each changed phase to the default
+run, which is exact on the grid's nodes when a single phase changes and
+approximate otherwise. Previews are only offered for the default phase
+count, durations and lifetimes, and for numbers of changed phases whose
+previews the build measured to be close enough to exact runs. The app
+reports that error next to them.
+"""
+from itertools import product
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from consensus_pledge_model.results import RESULT_METRICS, results_frame
+from consensus_pledge_model.types import BehaviouralParams
+from simulation import FIRST_TIMESTEP, SCENARIOS, combine_scenarios
+from simulation import cumulative_durations, default_phases
+
+GRID_PATH = Path(__file__).parent.parent / 'data' / 'preview_grid.npz'
+
+# Grid nodes of each per-phase parameter, spanning the sidebar's ranges
+GRID_AXES = {
+    'new_sector_rb_onboarding_rate': (0.0, 1.0, 2.0, 5.0, 10.0, 20.0, 50.0,
+                                      100.0, 200.0, 500.0, 1000.0),
+    'new_sector_quality_factor': (1.0, 2.0, 3.5, 5.0, 7.5, 10.0, 15.0, 20.0),
+    'daily_renewal_probability': tuple(
+        monthly / (100 * 30) for monthly in (0.0, 1.0, 3.0, 6.0, 12.0, 20.0)),
+}
+# Results whose preview error is reported
+ERROR_KPIS = ('power_qa',
+              'fil_circulating',
+              'fil_locked',
+              'critical_cost',
+              'circulating_surplus',
+              'initial_pledge_per_new_qa_power',
+              'daily_reward')
+# Numbers of changed phases the preview error is measured for. Changes to
+# more phases interact too much for a preview.
+VALIDATED_CHANGES = (1, 2)
+# Largest 95th percentile over the validation requests of any KPI's
+# `relative_error` for which previews are offered. A preview only shows
+# until the exact result replaces it, but should still have its shape.
+MAX_PREVIEW_ERROR = 0.5
+# Columns identifying a row of the calculator's result
+ROW_KEYS = ['scenario', 'timestep']
+
+
+class PreviewGrid():
+    """Precomputed runs around the default phases
+
+    Positive metrics are interpolated in log scale, so that the effects of
+    several phases multiply rather than add up.
+
+    Args:
+        base (np.ndarray): Metrics of the default run, shape (scenarios,
+            metrics, timesteps + 1)
+        values (np.ndarray): Deviation from `base` on the grid, in log scale
+            where `log_scale` is set, shape (phases, *axes, scenarios,
+            metrics, timesteps + 1)
+        log_scale (np.ndarray): Whether each metric is in log scale
+        error (dict[int, dict[str, tuple[float, float]]], optional): By
+            number of changed phases, the median and 95th percentile over
+            random requests of each KPI's `relative_error`
+    """
+
+    def __init__(self,
+                 base: np.ndarray,
+                 values: np.ndarray,
+                 log_scale: np.ndarray,
+                 error: Optional[dict[int, dict[str, tuple[float, float]]]]
+                 = None):
+        self.base = base
+        self.values = values
+        self.log_scale = log_scale
+        self.error = {} if error is None else error
+        self.phases, self.phase_durations = default_phases()
+        self.sim_phase_durations = cumulative_durations(self.phase_durations,
+                                                        len(self.phases))
+        self.axes = [np.array(nodes) for nodes in GRID_AXES.values()]
+
+    def _transform(self, metrics: np.ndarray) -> np.ndarray:
+        metrics = np.array(metrics, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            metrics[..., self.log_scale, :] = np.log(
+                metrics[..., self.log_scale, :])
+        return metrics
+
+    def _inverse(self, metrics: np.ndarray) -> np.ndarray:
+        metrics = np.array(metrics, dtype=np.float64)
+        metrics[..., self.log_scale, :] = np.exp(
+            metrics[..., self.log_scale, :])
+        return metrics
+
+    @classmethod
+    def from_runs(cls, base: np.ndarray, runs: np.ndarray) -> 'PreviewGrid':
+        """Grid from the runs of the default phases and of every node
+
+        Args:
+            base (np.ndarray): Metrics of the default run, shape (scenarios,
+                metrics, timesteps + 1)
+            runs (np.ndarray): Metrics of the nodes of every phase in the
+                order of `product(phases, *GRID_AXES.values())`, shape
+                (nodes, scenarios, metrics, timesteps + 1)
+        """
+        both = np.concatenate([base[None], runs])
+        finite = np.where(np.isfinite(both), both, 1.0)
+        log_scale = (finite > 0).all(axis=(0, 1, 3))
+        grid = cls(base, runs, log_scale)
+        shape = (len(grid.phases),
+                 *(len(nodes) for nodes in GRID_AXES.values()),
+                 *runs.shape[1:])
+        with np.errstate(invalid='ignore'):
+            deviation = grid._transform(runs) - grid._transform(base)
+        grid.values = deviation.astype(np.float32).reshape(shape)
+        return grid
+
+    def save(self, path=GRID_PATH) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        error = np.array([[error[kpi] for kpi in ERROR_KPIS]
+                          for error in self.error.values()])
+        np.savez_compressed(path,
+                            base=self.base,
+                            values=self.values,
+                            log_scale=self.log_scale,
+                            error_changes=np.array(list(self.error),
+                                                   dtype=int),
+                            error=error.reshape(-1, len(ERROR_KPIS), 2))
+
+    @classmethod
+    def load(cls, path=GRID_PATH) -> Optional['PreviewGrid']:
+        """The stored grid, or None if it hasn't been built"""
+        if not Path(path).exists():
+            return None
+        with np.load(path) as data:
+            error = {changes: dict(zip(ERROR_KPIS, map(tuple, kpi_errors)))
+                     for changes, kpi_errors
+                     in zip(data['error_changes'].tolist(),
+                            data['error'].tolist())}
+            return cls(data['base'], data['values'], data['log_scale'],
+                       error)
+
+    def usable(self, changes: int) -> bool:
+        """Whether previews changing `changes` phases were measured to be
+        within `MAX_PREVIEW_ERROR` on every KPI
+        """
+        error = self.error.get(changes)
+        return error is not None and all(
+            p95 <= MAX_PREVIEW_ERROR for _, p95 in error.values())
+
+    def covers(self,
+               phase_durations: dict[int, float],
+               phases: dict[int, BehaviouralParams]) -> bool:
+        """Whether a request only differs from the defaults in gridded
+        parameters, of a `usable` number of phases
+        """
+        if (phase_durations != self.sim_phase_durations
+                or set(phases) != set(self.phases)):
+            return False
+        if not self.usable(max(self.changed_phases(phases), 1)):
+            return False
+        fixed = ('new_sector_lifetime', 'renewal_lifetime')
+        return all(getattr(phases[i], name) == getattr(self.phases[i], name)
+                   for i in phases for name in fixed)
+
+    def changed_phases(self, phases: dict[int, BehaviouralParams]) -> int:
+        return sum(phase != self.phases[i_phase]
+                   for i_phase, phase in phases.items())
+
+    def typical_error(self, phases: dict[int, BehaviouralParams]
+                      ) -> Optional[dict[str, tuple[float, float]]]:
+        """Measured error of previews changing as many phases as `phases`,
+        or None if it wasn't measured
+        """
+        return self.error.get(max(self.changed_phases(phases), 1))
+
+    def _interpolate(self, i_phase: int,
+                     phase: BehaviouralParams) -> np.ndarray:
+        """Multilinear interpolation on the grid of `i_phase`"""
+        lower, weights = [], []
+        for axis, name in zip(self.axes, GRID_AXES):
+            x = getattr(phase, name)
+            i = np.searchsorted(axis, x, side='right') - 1
+            i = int(np.clip(i, 0, len(axis) - 2))
+            lower.append(i)
+            weight = (x - axis[i]) / (axis[i + 1] - axis[i])
+            weights.append(float(np.clip(weight, 0.0, 1.0)))
+
+        values = np.zeros(self.values.shape[-3:])
+        for corner in product((0, 1), repeat=len(lower)):
+            weight = np.prod([w if c else 1.0 - w
+                              for c, w in zip(corner, weights)])
+            if weight > 0.0:
+                index = tuple(i + c for i, c in zip(lower, corner))
+                values += weight * self.values[(i_phase - 1, *index)]
+        return values
+
+    def metrics(self, phases: dict[int, BehaviouralParams]) -> np.ndarray:
+        """Previewed metrics, shape (scenarios, metrics, timesteps + 1)
+
+        Phases with their default parameters keep the default run's exact
+        metrics.
+        """
+        metrics = self._transform(self.base)
+        for i_phase, phase in phases.items():
+            if phase != self.phases[i_phase]:
+                metrics = metrics + self._interpolate(i_phase, phase)
+        return self._inverse(metrics)
+
+    def preview(self,
+                phase_durations: dict[int, float],
+                phases: dict[int, BehaviouralParams]):
+        """The previewed result, with the rows and columns of the exact one
+        as `simulation.combine_scenarios` returns it
+        """
+        from consensus_pledge_model.params import SINGLE_RUN_PARAMS
+        from consensus_pledge_model.params import TIMESTEP_IN_DAYS
+
+        metrics = self.metrics(phases)
+        params = [{**SINGLE_RUN_PARAMS, 'target_locked_supply': tls}
+                  for tls in SCENARIOS.values()]
+        days_passed = np.arange(metrics.shape[-1]) * TIMESTEP_IN_DAYS
+        df = results_frame({name: metrics[:, i].T
+                            for i, name in enumerate(RESULT_METRICS)},
+                           days_passed, params, list(SCENARIOS))
+        df = df[df.timestep >= FIRST_TIMESTEP]
+        df['subset'] = 0
+        return combine_scenarios([df])
+
+
+def relative_error(preview, exact) -> dict[str, float]:
+    """Relative error of each of `ERROR_KPIS` which 95% of the rows are
+    within, comparing the rows of the same scenario and timestep
+
+    The maximum over the rows would mostly reflect the transients at the
+    phase transitions, which previews smooth out.
+
+    Raises:
+        ValueError: If the results have no row in common
+    """
+    p = preview.set_index(ROW_KEYS)[list(ERROR_KPIS)]
+    e = exact.set_index(ROW_KEYS)[list(ERROR_KPIS)]
+    p, e = p.align(e, join='inner')
+    if p.empty:
+        raise ValueError("The results have no scenario and timestep in common")
+    errors = {}
+    for kpi in ERROR_KPIS:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            error = (np.abs(p[kpi].to_numpy() - e[kpi].to_numpy())
+                     / np.abs(e[kpi].to_numpy()))
+        error = np.where(np.isfinite(error), error, np.nan)
+        errors[kpi] = float(np.nanpercentile(error, 95))
+    return errors
@@ -0,0 +1,180 @@
+"""Local simulation service for the calculator.
+
+Runs the calculator's scenarios in a persistent pool of worker processes
+which have cadCAD and the model loaded before the first request, and which
+every app session shares. Identical requests arriving while one is being
+computed wait for its result rather than computing it again. Clients withdraw
+from a request with `POST /cancel`, and once none waits for it anymore its
+job stops at the next timestep. Run from the repository root, with the
+model package on the path:
+
+    PYTHONPATH=. python app/service.py --port 8502
+
+and start the app with `CALCULATOR_SERVICE_URL=http://127.0.0.1:8502`.
+"""
+import os
+from concurrent.futures import CancelledError, ProcessPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock
+
+import click
+
+from consensus_pledge_model.types import BehaviouralParams
+from simulation import SimulationCancelled, SimulationHalted, SimulationJob
+from simulation import decode_request, encode_result, request_key
+
+PARQUET_MIME = 'application/vnd.apache.parquet'
+
+
+def warm_up() -> int:
+    """Import everything a simulation needs, returning the process id"""
+    import cadCAD_tools.execution  # noqa: F401
+    import consensus_pledge_model.params  # noqa: F401
+    import consensus_pledge_model.structure  # noqa: F401
+    return os.getpid()
+
+
+class SharedJob():
+    """A job and the number of clients waiting for it and having withdrawn"""
+
+    def __init__(self, job: SimulationJob):
+        self.job = job
+        self.waiting = 0
+        self.withdrawn = 0
+
+
+class SimulationService():
+    """Worker pool running the scenarios of coalesced requests
+
+    Args:
+        workers (int): Number of worker processes
+    """
+
+    def __init__(self, workers: int):
+        # Loaded before forking so that the workers share the parent's pages
+        warm_up()
+        self.pool = ProcessPoolExecutor(workers, initializer=warm_up)
+        wait([self.pool.submit(warm_up) for _ in range(workers)])
+        self.jobs: dict[str, SharedJob] = {}
+        self._lock = Lock()
+
+    def simulate(self,
+                 phase_durations: dict[int, float],
+                 phases: dict[int, BehaviouralParams]) -> bytes:
+        """The Parquet-encoded calculator result, joining the running job of
+        an identical request if any
+
+        Raises:
+            SimulationCancelled | CancelledError: If every client waiting for
+                the job withdrew
+        """
+        key = request_key(phase_durations, phases)
+        with self._lock:
+            shared = self.jobs.get(key)
+            if shared is None:
+                shared = self.jobs[key] = SharedJob(SimulationJob(self.pool, phase_durations, phases))
+            shared.waiting += 1
+        try:
+            return encode_result(shared.job.result())
+        finally:
+            with self._lock:
+                shared.waiting -= 1
+                if shared.waiting == 0 and self.jobs.get(key) is shared:
+                    del self.jobs[key]
+
+    def cancel(self,
+               phase_durations: dict[int, float],
+               phases: dict[int, BehaviouralParams]) -> None:
+        """Withdraw one client from a request, cancelling its job once no
+        client waits for it anymore
+        """
+        key = request_key(phase_durations, phases)
+        with self._lock:
+            shared = self.jobs.get(key)
+            if shared is None:
+                return
+            shared.withdrawn += 1
+            if shared.withdrawn >= shared.waiting:
+                shared.job.cancel()
+                del self.jobs[key]
+
+    def close(self) -> None:
+        self.pool.shutdown(cancel_futures=True)
+
+
+class SimulationHandler(BaseHTTPRequestHandler):
+    """`GET /health`, and `POST /simulate` or `POST /cancel` with an
+    `encode_request` body. A cancelled simulation gets a 409 response, and
+    one which tripped a guard a 422 response with the reason.
+    """
+    server: 'SimulationServer'
+
+    def _send(self, status: int, body: bytes, content_type: str = 'text/plain') -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.path == '/health':
+            self._send(200, b'ok')
+        else:
+            self._send(404, b'not found')
+
+    def do_POST(self) -> None:
+        if self.path not in ('/simulate', '/cancel'):
+            self._send(404, b'not found')
+            return
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        try:
+            phase_durations, phases = decode_request(body)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            self._send(400, f"bad request: {e}".encode())
+            return
+        if self.path == '/cancel':
+            self.server.service.cancel(phase_durations, phases)
+            self._send(200, b'ok')
+            return
+        try:
+            result = self.server.service.simulate(phase_durations, phases)
+        except (SimulationCancelled, CancelledError):
+            self._send(409, b'cancelled')
+            return
+        except SimulationHalted as e:
+            self._send(422, str(e).encode())
+            return
+        except Exception as e:
+            self._send(500, f"simulation failed: {e}".encode())
+            return
+        self._send(200, result, PARQUET_MIME)
+
+
+class SimulationServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], service: SimulationService):
+        super().__init__(address, SimulationHandler)
+        self.service = service
+
+
+@click.command()
+@click.option('--host', default='127.0.0.1', show_default=True)
+@click.option('--port', default=8502, show_default=True)
+@click.option('-w', '--workers', default=os.cpu_count(), show_default=True,
+              help="Number of worker processes")
+def main(host: str, port: int, workers: int) -> None:
+    service = SimulationService(workers)
+    server = SimulationServer((host, port), service)
+    click.echo(f"Serving simulations on http://{host}:{server.server_port} with {workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""Calculator simulations, free of Streamlit so that the simulation service's
+workers can run them as well as the app itself.
+
+Simulations run as jobs on a process pool. Cancelling a job stops its
+scenarios at their next timestep, which frees the workers for newer requests.
+Scenarios also stop once their state breaks an invariant of
+`consensus_pledge_model.guards.DEFAULT_GUARDS`.
+"""
+import hashlib
+import io
+import json
+import tempfile
+import uuid
+from concurrent.futures import Executor
+from math import inf
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+
+from consensus_pledge_model.types import BehaviouralParams
+from utils import load_constants
+C = CONSTANTS = load_constants()
+
+# Target locked supply of each scenario shown by the calculator
+SCENARIOS = {'consensus_pledge_on': 0.3, 'consensus_pledge_off': 0.0}
+# Post-processing of the scenarios, 'arrow' or 'pandas'
+RESULTS_BACKEND = C['results_backend']
+# Object columns of a run which the results don't use, never retained
+UNUSED_COLS = ("simple_mechanism",
+               "baseline_mechanism",
+               "aggregate_sectors",
+               "behavioural_params",
+               "vesting_schedule",
+               "behaviour")
+# Fields of the object columns which the results derive from, among the
+# `SOURCE_COLUMNS` of `consensus_pledge_model.results`
+OBJECT_FIELDS = {'reward': ('simple_reward', 'baseline_reward'),
+                 'token_distribution': ('locked', 'collateral', 'locked_rewards', 'circulating',
+                                        'available', 'vested', 'minted')}
+# Object columns of a run, dropped once the results are derived from them
+DROP_COLS = list(OBJECT_FIELDS)
+# First timestep shown by the calculator
+FIRST_TIMESTEP = 2
+# Column keeping the index of a run through Arrow
+INDEX_COLUMN = '__index_level_0__'
+
+
+def default_phases() -> tuple[dict[int, BehaviouralParams], dict[int, float]]:
+    """Behaviour and duration in years of every phase, as in `const.yaml`"""
+    phase_defaults = C['phase_config']
+    DEFAULT_PHASES = {}
+    DEFAULT_PHASE_DURATIONS = {}
+    for i in range(1, len(phase_defaults) + 1):
+        phase_default = phase_defaults[i]
+        DEFAULT_PHASE_DURATIONS[i] = phase_default['duration']
+        params = BehaviouralParams(i,
+                                   phase_default['rb_onboarding_rate'],
+                                   phase_default['quality_factor'],
+                                   phase_default['sector_lifetime'],
+                                   phase_default['daily_renewal_probability'] / 100,
+                                   phase_default['sector_lifetime'])
+        DEFAULT_PHASES[i] = params
+    return (DEFAULT_PHASES, DEFAULT_PHASE_DURATIONS)
+
+
+def cumulative_durations(phase_durations: dict[int, float], phase_count: int) -> dict[int, float]:
+    """Year on which each of the first `phase_count` phases ends"""
+    cumm_years = 0.0
+    sim_phase_durations = {}
+    for k, v in phase_durations.items():
+        if k <= phase_count:
+            cumm_years += v
+            sim_phase_durations[k] = cumm_years
+    return sim_phase_durations
+
+
+def behavioural_params(phase_durations: dict[int, float],
+                       phases: dict[int, BehaviouralParams]) -> dict[float, BehaviouralParams]:
+    """Phases keyed by the day they end on, from their cumulative durations in years"""
+    behaviour_param_dict = {}
+    for i_phase, phase in phases.items():
+        if i_phase == len(phases):
+            duration = inf
+        else:
+            duration = int(phase_durations[i_phase] * 365.25)
+        behaviour_param_dict[duration] = phase
+    return behaviour_param_dict
+
+
+class SimulationCancelled(Exception):
+    """Raised by a scenario whose job was cancelled"""
+
+
+class SimulationHalted(Exception):
+    """Raised by a scenario whose state tripped a guard, with the reason"""
+
+
+class CancellationToken():
+    """Cancellation flag visible to other processes, as a file which exists
+    once the token is cancelled
+    """
+
+    def __init__(self):
+        self.path = Path(tempfile.gettempdir()) / f'calculator-cancel-{uuid.uuid4().hex}'
+
+    @property
+    def cancelled(self) -> bool:
+        return self.path.exists()
+
+    def cancel(self) -> None:
+        self.path.touch()
+
+    def check(self) -> None:
+        """Raise `SimulationCancelled` if the token was cancelled"""
+        if self.cancelled:
+            raise SimulationCancelled
+
+    def close(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+def cancellable_blocks(blocks: list[dict], token: CancellationToken) -> list[dict]:
+    """`blocks` checking `token` at the start of every timestep"""
+    def p_check_cancelled(_1, _2, _3, _4) -> dict:
+        token.check()
+        return {}
+
+    first = {**blocks[0], 'policies': {**blocks[0]['policies'],
+                                       'check_cancelled': p_check_cancelled}}
+    return [first, *blocks[1:]]
+
+
+def run_scenario(phase_durations: dict[int, float],
+                 phases: dict[int, BehaviouralParams],
+                 scenario: str,
+                 token: Optional[CancellationToken] = None):
+    """Run and post-process one scenario with cadCAD, stopping it with
+    `SimulationCancelled` once `token` is cancelled. With the Arrow backend,
+    the post-processing is left to `combine_tables`.
+
+    Only the timesteps and columns which the calculator shows or derives its
+    results from are retained.
+
+    Raises:
+        SimulationHalted: If the state trips one of the `DEFAULT_GUARDS`
+    """
+    from cadCAD_tools.preparation import sweep_cartesian_product
+    from consensus_pledge_model import guards
+    from consensus_pledge_model.params import INITIAL_STATE, SINGLE_RUN_PARAMS, TIMESTEP_IN_DAYS
+    from consensus_pledge_model.retention import RetentionPolicy, run_retained
+    from consensus_pledge_model.structure import scheduled_blocks
+    from consensus_pledge_model.types import ConsensusPledgeSweepParams
+    from copy import deepcopy
+
+    total_duration = max(phase_durations.values())
+    timesteps = int(total_duration * 365.25 / TIMESTEP_IN_DAYS) + 1
+
+    params = ConsensusPledgeSweepParams(**{k: [v] for k, v in SINGLE_RUN_PARAMS.items()})
+    params['target_locked_supply'] = [SCENARIOS[scenario]]
+    params["behavioural_params"] = [behavioural_params(phase_durations, phases)]
+
+    blocks = guards.guarded_blocks(scheduled_blocks(), guards.DEFAULT_GUARDS)
+    if token is not None:
+        blocks = cancellable_blocks(blocks, token)
+
+    retention = RetentionPolicy(start=FIRST_TIMESTEP,
+                                variables=tuple(name for name in [*INITIAL_STATE, *params]
+                                                if name not in UNUSED_COLS))
+    RUN_ARGS = (deepcopy(INITIAL_STATE), sweep_cartesian_product(params), blocks, timesteps, 1)
+    try:
+        df = run_retained(*RUN_ARGS, retention=retention).assign(scenario=scenario)
+    except guards.RunHalted as e:
+        raise SimulationHalted(f"The {scenario} scenario stopped: {e}") from e
+    if RESULTS_BACKEND == 'arrow':
+        return scenario_table(df)
+    return post_process_results(df)
+
+
+def combine_scenarios(dfs):
+    """The calculator's result from the post-processed scenarios"""
+    import pandas as pd
+
+    df = pd.concat(dfs).sort_values(['target_locked_supply', 'days_passed'], ascending=False)
+    return identify_result(df)
+
+
+def identify_result(df):
+    """Identify the result so that downstream caches can be keyed on it"""
+    df.attrs['result_hash'] = result_hash(df)
+    df.attrs['num_steps'] = df.timestep.nunique()
+    return df
+
+
+def scenario_table(df):
+    """Arrow table of a scenario's scalar columns and index, and of the fields
+    of its objects which the results derive from
+    """
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df.drop(columns=DROP_COLS), preserve_index=True)
+    for column, names in OBJECT_FIELDS.items():
+        for name in names:
+            values = [getattr(value, name) for value in df[column]]
+            table = table.append_column(f'{column}.{name}', pa.array(values, pa.float64()))
+    return table
+
+
+def result_expressions(columns) -> dict:
+    """Arrow expressions of the result's columns, in the order of
+    `post_process_results` and derived like it with `derive_results`, from
+    those of `scenario_table`
+    """
+    import pyarrow.compute as pc
+    from consensus_pledge_model.params import TIMESTEP_IN_DAYS
+    from consensus_pledge_model.results import SOURCE_COLUMNS, Arithmetic, derive_results
+
+    f = pc.field
+    e = {name: f(name) for name in columns
+         if name != INDEX_COLUMN and '.' not in name}
+    sources = {name: f(name) for name in SOURCE_COLUMNS if name in columns}
+    sources['days_passed'] = f('days_passed').cast('float64')
+    sources.update({name: f(f'{column}.{name}')
+                    for column, names in OBJECT_FIELDS.items() for name in names})
+    e.update(derive_results(sources, TIMESTEP_IN_DAYS, C["days_per_year"],
+                            Arithmetic(pc.add, pc.multiply, pc.divide)))
+    e[INDEX_COLUMN] = f(INDEX_COLUMN)
+    return e
+
+
+def combine_tables(tables):
+    """The calculator's result from the `scenario_table`s, as
+    `combine_scenarios` of the post-processed scenarios returns it
+
+    Derives and sorts the columns in one multithreaded Acero plan, so that
+    the only copy to pandas is of the final result.
+    """
+    import pyarrow as pa
+    from pyarrow import acero
+
+    table = pa.concat_tables(tables)
+    expressions = result_expressions(table.column_names)
+    plan = acero.Declaration.from_sequence([
+        acero.Declaration('table_source', acero.TableSourceNodeOptions(table)),
+        acero.Declaration('project', acero.ProjectNodeOptions(list(expressions.values()),
+                                                              list(expressions))),
+        acero.Declaration('order_by', acero.OrderByNodeOptions([('target_locked_supply', 'descending'),
+                                                                ('days_passed', 'descending')])),
+    ])
+    df = plan.to_table(use_threads=True).to_pandas().set_index(INDEX_COLUMN)
+    df.index.name = None
+    return identify_result(df)
+
+
+def request_key(phase_durations: dict[int, float],
+                phases: dict[int, BehaviouralParams]) -> str:
+    """Identifier of a calculator request, equal for equal requests"""
+    from consensus_pledge_model.registry import canonical_hash
+
+    return canonical_hash([phase_durations, phases])
+
+
+class SimulationJob():
+    """The scenarios of one calculator request, running on `executor`
+
+    Args:
+        executor (Executor): Process pool running the scenarios
+        phase_durations (dict[int, float]): Cumulative phase durations in years
+        phases (dict[int, BehaviouralParams]): Behaviour of each phase
+    """
+
+    def __init__(self,
+                 executor: Executor,
+                 phase_durations: dict[int, float],
+                 phases: dict[int, BehaviouralParams]):
+        self.token = CancellationToken()
+        self._result = None
+        self._lock = Lock()
+        self.futures = [executor.submit(run_scenario, phase_durations, phases, scenario, self.token)
+                        for scenario in SCENARIOS]
+        for future in self.futures:
+            future.add_done_callback(self._finished)
+
+    def _finished(self, _) -> None:
+        if self.done():
+            self.token.close()
+
+    def done(self) -> bool:
+        return all(future.done() for future in self.futures)
+
+    def result(self):
+        """The combined result, waiting for it if needed
+
+        Raises:
+            SimulationCancelled: If the job was cancelled while running
+            SimulationHalted: If a scenario tripped a guard
+            CancelledError: If it was cancelled before starting
+        """
+        with self._lock:
+            if self._result is None:
+                results = [future.result() for future in self.futures]
+                if RESULTS_BACKEND == 'arrow':
+                    self._result = combine_tables(results)
+                else:
+                    self._result = combine_scenarios(results)
+            return self._result
+
+    def cancel(self) -> None:
+        """Stop the scenarios at their next timestep, or before they start"""
+        if not self.done():
+            self.token.cancel()
+            for future in self.futures:
+                future.cancel()
+
+
+def result_hash(df) -> str:
+    """Content hash of a simulation result DataFrame"""
+    import pandas as pd
+
+    row_hashes = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    return hashlib.sha1(row_hashes.tobytes()).hexdigest()
+
+
+def post_process_results(df):
+    from operator import attrgetter
+    from consensus_pledge_model.params import TIMESTEP_IN_DAYS
+    from consensus_pledge_model.results import SOURCE_COLUMNS, derive_results
+
+    sources = {name: df[name] for name in SOURCE_COLUMNS if name in df}
+    sources.update({name: df[column].map(attrgetter(name))
+                    for column, names in OBJECT_FIELDS.items() for name in names})
+    derived = derive_results(sources, TIMESTEP_IN_DAYS, C["days_per_year"])
+    return df.assign(**derived).drop(columns=DROP_COLS)
+
+
+def encode_request(phase_durations: dict[int, float],
+                   phases: dict[int, BehaviouralParams]) -> bytes:
+    """JSON body of a simulation request to the service"""
+    return json.dumps({'phase_durations': phase_durations,
+                       'phases': {i: phase.to_dict() for i, phase in phases.items()}}).encode()
+
+
+def decode_request(body: bytes) -> tuple[dict[int, float], dict[int, BehaviouralParams]]:
+    """Arguments of `SimulationJob` from a request body, with JSON's string keys
+    turned back into phase numbers
+    """
+    request = json.loads(body)
+    phase_durations = {int(i): float(v) for i, v in request['phase_durations'].items()}
+    phases = {int(i): BehaviouralParams.from_dict(v) for i, v in request['phases'].items()}
+    if set(phase_durations) != set(phases):
+        raise ValueError("Phase durations and phases must be numbered alike")
+    return phase_durations, phases
+
+
+def encode_result(df) -> bytes:
+    """Parquet encoding of a result, which keeps its index and `attrs`"""
+    buffer = io.BytesIO()
+    df.to_parquet(buffer)
+    return buffer.getvalue()
+
+
+def decode_result(body: bytes):
+    import pandas as pd
+
+    return pd.read_parquet(io.BytesIO(body))
@@ -1,7 +1,119 @@
 import os
+from collections import OrderedDict
+from math import floor
+from threading import Lock
+
+import numpy as np
 from ruamel.yaml import YAML
 
 
 def load_constants():
     config_path = os.path.join(os.path.dirname(__file__), "const.yaml")
     return YAML(typ="safe").load(open(config_path))
+
+
+class LRUCache():
+    """Thread-safe LRU cache, of serialized figures or of results"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        """Return the cached value for `key` or None, marking it as recently used"""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        """Store `value`, evicting the least recently used entries if full"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets downsampling of a single series.
+
+    Args:
+        x (np.ndarray): Sorted x values
+        y (np.ndarray): y values
+        threshold (int): Number of points to keep
+
+    Returns:
+        np.ndarray: Indices of the points to keep, including both endpoints
+            unless `threshold` is 1
+    """
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        # No bucket between the endpoints, keep those which fit
+        return np.array([0, n - 1][:max(threshold, 0)], dtype=int)
+
+    every = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start = int(floor(i * every)) + 1
+        end = int(floor((i + 1) * every)) + 1
+        next_end = min(int(floor((i + 2) * every)) + 1, n)
+
+        # The third triangle vertex is the average of the next bucket
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        indices[i + 1] = a
+    return indices
+
+
+def downsample_indices(x: np.ndarray,
+                       y: np.ndarray,
+                       threshold: int,
+                       anchors=()) -> np.ndarray:
+    """LTTB downsampling which always keeps the points bracketing each anchor.
+
+    The series is split at the anchors and each segment gets a share of the
+    point budget proportional to its length, so that features such as
+    phase boundaries are not smoothed away.
+
+    Args:
+        x (np.ndarray): Sorted x values
+        y (np.ndarray): y values
+        threshold (int): Approximate number of points to keep
+        anchors (Iterable[float], optional): x values to keep exact
+
+    Returns:
+        np.ndarray: Sorted indices of the points to keep
+    """
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+
+    forced = {0, n - 1}
+    for anchor in anchors:
+        i = int(np.searchsorted(x, anchor))
+        forced |= {i - 1, i} & set(range(n))
+    forced = sorted(forced)
+
+    kept = [np.array(forced)]
+    for start, end in zip(forced[:-1], forced[1:]):
+        size = end - start + 1
+        budget = max(2, round(threshold * size / n))
+        segment = lttb(x[start:end + 1], y[start:end + 1], budget)
+        kept.append(segment + start)
+    return np.unique(np.concatenate(kept))
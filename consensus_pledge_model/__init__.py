@@ -1,8 +1,35 @@
-from consensus_pledge_model.params import SINGLE_RUN_PARAMS, INITIAL_STATE, TIMESTEPS, SAMPLES
-from consensus_pledge_model.structure import CONSENSUS_PLEDGE_DEMO_BLOCKS
-
-default_run_args = (INITIAL_STATE,
-                     {k: [v] for k, v in SINGLE_RUN_PARAMS.items()},
-                    CONSENSUS_PLEDGE_DEMO_BLOCKS,
-                    TIMESTEPS,
-                    SAMPLES)
+from importlib import import_module
+
+# Attributes resolved on first access (PEP 562), so that importing the package
+# neither builds the initial state nor imports cadCAD
+_LAZY_ATTRIBUTES = {
+    'SINGLE_RUN_PARAMS': 'consensus_pledge_model.params',
+    'INITIAL_STATE': 'consensus_pledge_model.params',
+    'TIMESTEPS': 'consensus_pledge_model.params',
+    'SAMPLES': 'consensus_pledge_model.params',
+    'CONSENSUS_PLEDGE_DEMO_BLOCKS': 'consensus_pledge_model.structure',
+    'scheduled_blocks': 'consensus_pledge_model.structure',
+    'NETWORK_POWER_BLOCKS': 'consensus_pledge_model.structure',
+}
+
+__all__ = [*_LAZY_ATTRIBUTES, 'default_run_args']
+
+
+def __getattr__(name: str) -> object:
+    if name == 'default_run_args':
+        value = (__getattr__('INITIAL_STATE'),
+                 {k: [v] for k, v in __getattr__('SINGLE_RUN_PARAMS').items()},
+                 __getattr__('CONSENSUS_PLEDGE_DEMO_BLOCKS'),
+                 __getattr__('TIMESTEPS'),
+                 __getattr__('SAMPLES'))
+    elif name in _LAZY_ATTRIBUTES:
+        value = getattr(import_module(_LAZY_ATTRIBUTES[name]), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # Cache it so that later lookups bypass this function
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *__all__})
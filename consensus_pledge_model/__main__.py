@@ -1,9 +1,5 @@
-from consensus_pledge_model import default_run_args
-from consensus_pledge_model.experiment import standard_run
-from cadCAD_tools.execution import easy_run
 from datetime import datetime
 import click
-import os
 
 
 @click.command()
@@ -11,13 +7,92 @@ import os
               default=False,
               is_flag=True,
               help="Make an experiment run instead")
+@click.option('--resume', 'resume',
+              default=False,
+              is_flag=True,
+              help="Continue the interrupted experiment run from its last checkpoint")
+@click.option('--kpis', 'kpis',
+              default=False,
+              is_flag=True,
+              help="Keep one row of KPIs per experiment run member instead of its trajectory")
+@click.option('-d', '--daily', 'daily',
+              default=False,
+              is_flag=True,
+              help="Run six years with daily timesteps instead")
+@click.option('-s', '--stochastic-samples', 'stochastic_samples',
+              default=0,
+              help="Run this many stochastic Monte Carlo samples and keep their quantiles instead")
+@click.option('--seed', 'seed', default=None, type=int,
+              help="Seed for the stochastic samples")
+@click.option('--compact', 'compact', default=False, is_flag=True,
+              help="Store the stochastic samples' sectors in float32 to halve their memory")
+@click.option('--batch-size', 'batch_size', default=None, type=int,
+              help="Run the stochastic samples this many at a time, streaming their mean, spread and quantiles")
+@click.option('--max-surplus', 'max_surplus', default=None, type=float,
+              help="Search the smallest target_locked_supply keeping the circulating surplus at or below this value instead")
+@click.option('--calibrate', 'calibrate', default=None, type=click.Path(exists=True),
+              help="Fit the calculator phases to the observations in this CSV and print them as JSON instead")
 @click.option('-p', '--pickle', 'pickle', default=False, is_flag=True)
-def main(experiment_run: bool, pickle: bool) -> None:
+def main(experiment_run: bool,
+         resume: bool,
+         kpis: bool,
+         daily: bool,
+         stochastic_samples: int,
+         seed: int,
+         compact: bool,
+         batch_size: int,
+         max_surplus: float,
+         calibrate: str,
+         pickle: bool) -> None:
+    # The run modes, each of which ignores the others
+    modes = {'-e': experiment_run,
+             '-d': daily,
+             '-s': stochastic_samples > 0,
+             '--max-surplus': max_surplus is not None,
+             '--calibrate': calibrate is not None}
+    chosen = [flag for flag, selected in modes.items() if selected]
+    if len(chosen) > 1:
+        raise click.UsageError(f"{' and '.join(chosen)} can't be combined")
+    if (compact or batch_size is not None) and stochastic_samples <= 0:
+        raise click.UsageError("--compact and --batch-size only apply to stochastic runs (-s)")
+    if seed is not None and stochastic_samples <= 0 and calibrate is None:
+        raise click.UsageError("--seed only applies to stochastic runs (-s) and --calibrate")
+    if pickle and (max_surplus is not None or calibrate is not None):
+        raise click.UsageError("--max-surplus and --calibrate print their result, -p doesn't apply")
+    if resume and not experiment_run:
+        raise click.UsageError("--resume only applies to experiment runs (-e)")
+    if kpis and (resume or not experiment_run):
+        raise click.UsageError("--kpis only applies to experiment runs (-e) without --resume")
+    # Deferred so that `--help` does not pay for cadCAD and the initial state
+    from consensus_pledge_model import default_run_args
+    from consensus_pledge_model.experiment import daily_run, stochastic_run, sweep_run
+    from cadCAD_tools.execution import easy_run
+
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    if experiment_run is False:
+    if calibrate is not None:
+        from consensus_pledge_model import calibration
+        result = calibration.calibrate(calibration.load_observations(calibrate), seed=seed)
+        click.echo(result.sim_params.to_json())
+        click.echo(f"loss = {result.loss:.3g} ({result.evaluations} simulations)", err=True)
+        return
+    if max_surplus is not None:
+        from consensus_pledge_model.params import INITIAL_STATE, SINGLE_RUN_PARAMS, TIMESTEPS
+        from consensus_pledge_model.search import search_parameter
+        result = search_parameter(INITIAL_STATE, SINGLE_RUN_PARAMS, TIMESTEPS,
+                                  'circulating_surplus', max_surplus)
+        click.echo(f"target_locked_supply = {result.value:.4f} "
+                   f"({result.simulations} simulations)")
+        return
+    if daily:
+        df = daily_run()
+    elif stochastic_samples > 0:
+        df = stochastic_run(stochastic_samples, seed, compact, batch_size)
+    elif experiment_run is False:
         df = easy_run(*default_run_args)
     else:
-        df = standard_run()
+        df = sweep_run(resume, kpis)
+        if kpis:
+            click.echo(df.to_string(index=False))
     if pickle:
         df.to_pickle(
             f"data/simulations/multi-run-{timestamp}.pkl.gz", compression="gzip")
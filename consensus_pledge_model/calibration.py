@@ -0,0 +1,200 @@
+"""Calibration of the calculator phases to observed network history.
+
+Fits the onboarding rate, quality factor and renewal probability of every
+phase with the cross-entropy method: each generation draws a population of
+candidates, runs all of them as one vectorized batch, and moves the sampling
+distribution towards the candidates closest to the observations.
+"""
+from dataclasses import dataclass, field, replace
+from math import ceil, inf
+from typing import Optional
+
+import numpy as np
+
+from consensus_pledge_model.params import INITIAL_STATE, SINGLE_RUN_PARAMS, YEAR
+from consensus_pledge_model.types import BehaviouralParams, CalculatorSimParams
+from consensus_pledge_model.types import ConsensusPledgeDemoState, ConsensusPledgeParams, Days
+from consensus_pledge_model.vectorized import TrajectoryRecorder, VectorizedModel
+
+# Observed series, any of which may be missing
+OBSERVED_COLUMNS = ('power_rb', 'power_qa', 'pledge_per_qa_power')
+
+# Fitted fields of each phase and their ranges, as allowed by the app sidebar
+CALIBRATED_FIELDS = {'new_sector_rb_onboarding_rate': (0.0, 1000.0),
+                     'new_sector_quality_factor': (1.0, 20.0),
+                     'daily_renewal_probability': (0.0, 0.2 / 30)}
+
+
+def load_observations(path):
+    """Read an observed time series
+
+    Args:
+        path (str | Path): CSV with a `days_passed` column, counted from the
+            start of the simulation, and any of `OBSERVED_COLUMNS`
+
+    Raises:
+        ValueError: If no observed column is present
+
+    Returns:
+        DataFrame: The observations sorted by day
+    """
+    import pandas as pd
+
+    df = pd.read_csv(path)
+    columns = [c for c in OBSERVED_COLUMNS if c in df.columns]
+    if 'days_passed' not in df.columns or not columns:
+        raise ValueError(f"{path} needs days_passed and any of {OBSERVED_COLUMNS}")
+    return df[['days_passed', *columns]].astype(float).sort_values('days_passed')
+
+
+def behavioural_params(sim_params: CalculatorSimParams) -> dict[Days, BehaviouralParams]:
+    """Phases keyed by the day they end on, as `run_cadcad_model` sets them up"""
+    phases = {}
+    cumulative_years = 0.0
+    for i_phase in range(1, sim_params.phase_count + 1):
+        cumulative_years += sim_params.phase_durations[i_phase]
+        end = inf if i_phase == sim_params.phase_count else int(cumulative_years * YEAR)
+        phases[end] = sim_params.phases[i_phase]
+    return phases
+
+
+def initial_sim_params(observations, phase_count: int = 3) -> CalculatorSimParams:
+    """Phases of equal duration spanning the observations, with the app's
+    default behaviour as a starting point
+    """
+    duration = observations.days_passed.max() / YEAR / phase_count
+    return CalculatorSimParams(
+        phase_count=phase_count,
+        phases={i: BehaviouralParams(i, 1.0, 2.0, 360, 0.004, 360)
+                for i in range(1, phase_count + 1)},
+        phase_durations={i: duration for i in range(1, phase_count + 1)})
+
+
+@dataclass
+class CalibrationResult():
+    sim_params: CalculatorSimParams
+    # Mean squared relative error of the fitted run, over all observations
+    loss: float
+    evaluations: int
+    # Best loss after each generation
+    history: list[float] = field(default_factory=list)
+
+
+class Objective():
+    """Batched loss of candidate phases against the observations
+
+    Args:
+        observations (DataFrame): See `load_observations`
+        initial_state (ConsensusPledgeDemoState): Initial state
+        params (ConsensusPledgeParams): Parameters the phases are set on
+    """
+
+    def __init__(self,
+                 observations,
+                 initial_state: ConsensusPledgeDemoState,
+                 params: ConsensusPledgeParams):
+        self.initial_state = initial_state
+        self.params = params
+        dt = params['timestep_in_days']
+        days = observations.days_passed.to_numpy()
+        self.timesteps = int(ceil(days.max() / dt))
+        # Linear interpolation between the surrounding timesteps
+        position = np.clip(days / dt, 0, self.timesteps)
+        self.index = np.minimum(np.floor(position).astype(int), self.timesteps - 1)
+        self.weight = (position - self.index)[:, None]
+        self.observed = {c: observations[c].to_numpy()[:, None]
+                         for c in OBSERVED_COLUMNS if c in observations}
+
+    def __call__(self, candidates: list[CalculatorSimParams]) -> np.ndarray:
+        batch = [ConsensusPledgeParams(**{**self.params,
+                                          'behavioural_params': behavioural_params(c)})
+                 for c in candidates]
+        recorder = TrajectoryRecorder(('power_rb',
+                                       'power_qa',
+                                       'storage_pledge_per_new_qa_power',
+                                       'consensus_pledge_per_new_qa_power'))
+        arrays = VectorizedModel(self.initial_state, batch).run(self.timesteps, recorder).arrays()
+        arrays['pledge_per_qa_power'] = (arrays['storage_pledge_per_new_qa_power']
+                                         + arrays['consensus_pledge_per_new_qa_power'])
+
+        squared_errors = []
+        for column, observed in self.observed.items():
+            values = arrays[column]
+            simulated = (values[self.index] * (1 - self.weight)
+                         + values[self.index + 1] * self.weight)
+            valid = np.isfinite(observed[:, 0]) & (observed[:, 0] != 0.0)
+            with np.errstate(invalid='ignore'):
+                squared_errors.append((simulated[valid] / observed[valid] - 1.0) ** 2)
+        loss = np.concatenate(squared_errors).mean(axis=0)
+        return np.where(np.isfinite(loss), loss, inf)
+
+
+def calibrate(observations,
+              initial: Optional[CalculatorSimParams] = None,
+              initial_state: ConsensusPledgeDemoState = INITIAL_STATE,
+              params: ConsensusPledgeParams = SINGLE_RUN_PARAMS,
+              population: int = 256,
+              generations: int = 40,
+              elite_fraction: float = 0.1,
+              seed: Optional[int] = None) -> CalibrationResult:
+    """Fit the phase behaviour to observed power and pledge series
+
+    Phase durations and sector lifetimes are kept from `initial`.
+
+    Args:
+        observations (DataFrame): See `load_observations`
+        initial (CalculatorSimParams, optional): Starting point. Defaults to
+            `initial_sim_params(observations)`.
+        initial_state (ConsensusPledgeDemoState, optional): Initial state
+        params (ConsensusPledgeParams, optional): Non-behavioural parameters
+        population (int, optional): Candidates per generation, run as one batch
+        generations (int, optional): Number of generations
+        elite_fraction (float, optional): Share of candidates the sampling
+            distribution is refit on
+        seed (int, optional): Seed of the random generator
+
+    Returns:
+        CalibrationResult: The fitted phases and their loss
+    """
+    initial = initial_sim_params(observations) if initial is None else initial
+    objective = Objective(observations, initial_state, params)
+    rng = np.random.default_rng(seed)
+
+    # Candidates are sampled in the unit box spanned by `CALIBRATED_FIELDS`
+    phase_ids = list(range(1, initial.phase_count + 1))
+    low, high = np.array([CALIBRATED_FIELDS[name]
+                          for _ in phase_ids for name in CALIBRATED_FIELDS]).T
+
+    def to_unit(sim_params: CalculatorSimParams) -> np.ndarray:
+        values = np.array([getattr(sim_params.phases[i], name)
+                           for i in phase_ids for name in CALIBRATED_FIELDS])
+        return np.clip((values - low) / (high - low), 0.0, 1.0)
+
+    def from_unit(x: np.ndarray) -> CalculatorSimParams:
+        values = (low + x * (high - low)).reshape(len(phase_ids), len(CALIBRATED_FIELDS))
+        phases = dict(initial.phases)
+        for i, phase_values in zip(phase_ids, values):
+            phases[i] = replace(phases[i], **dict(zip(CALIBRATED_FIELDS, phase_values.tolist())))
+        return replace(initial, phases=phases)
+
+    mean = to_unit(initial)
+    std = np.full_like(mean, 0.25)
+    n_elite = max(2, int(population * elite_fraction))
+    best_x, best_loss = mean, float(objective([initial])[0])
+    history = []
+    for _ in range(generations):
+        x = np.clip(mean + std * rng.standard_normal((population, len(mean))), 0.0, 1.0)
+        x[0] = best_x
+        loss = objective([from_unit(row) for row in x])
+        elite = x[np.argsort(loss)[:n_elite]]
+        if loss.min() < best_loss:
+            best_x, best_loss = x[np.argmin(loss)], float(loss.min())
+        # Smoothed update, with a floor so that the search doesn't freeze
+        mean = 0.7 * elite.mean(axis=0) + 0.3 * mean
+        std = np.maximum(0.7 * elite.std(axis=0) + 0.3 * std, 1e-4)
+        history.append(best_loss)
+
+    return CalibrationResult(sim_params=from_unit(best_x),
+                             loss=best_loss,
+                             evaluations=1 + population * generations,
+                             history=history)
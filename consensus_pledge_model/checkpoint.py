@@ -0,0 +1,156 @@
+"""Checkpoints of long vectorized sweeps, so that they resume after the process dies.
+
+A sweep runs its members in batches, one after another. While a batch runs,
+its model and recorder are pickled every `interval` seconds, which keeps the
+sector book, token distribution, random generator and step index. Finished
+batches are stored as Parquet and listed in `progress.json`. Every file is
+written to a temporary path and renamed over its target, so that a crash
+never leaves a partial file behind.
+"""
+import json
+import pickle
+import time
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+from consensus_pledge_model.registry import canonical_hash
+from consensus_pledge_model.types import ConsensusPledgeDemoState, ConsensusPledgeParams
+from consensus_pledge_model.vectorized import TrajectoryRecorder, VectorizedModel
+
+# Parent of the checkpoint directory of each sweep
+CHECKPOINT_ROOT = 'data/checkpoints'
+# Files of a sweep in its checkpoint directory, besides their temporary copies
+CHECKPOINT_FILES = ('batch-*.pkl', 'batch-*.parquet', 'progress.json')
+
+
+def atomic_write(path: Path, write: Callable[[Path], None]) -> None:
+    """Call `write` on a temporary path, then rename it to `path`"""
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    write(tmp_path)
+    tmp_path.replace(path)
+
+
+class SweepCheckpoint():
+    """Checkpoint directory of one sweep
+
+    Args:
+        directory (str | Path): Directory of the sweep's files
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, batch: int, suffix: str) -> Path:
+        return self.directory / f'batch-{batch:05d}{suffix}'
+
+    def completed(self) -> set[int]:
+        """Batches whose results are stored"""
+        path = self.directory / 'progress.json'
+        if not path.exists():
+            return set()
+        return set(json.loads(path.read_text())['completed'])
+
+    def save(self, batch: int, model: VectorizedModel, recorder: TrajectoryRecorder) -> None:
+        """Checkpoint a running batch"""
+        def write(path: Path) -> None:
+            with open(path, 'wb') as f:
+                pickle.dump((model, recorder), f, protocol=pickle.HIGHEST_PROTOCOL)
+        atomic_write(self._path(batch, '.pkl'), write)
+
+    def load(self, batch: int) -> Optional[tuple[VectorizedModel, TrajectoryRecorder]]:
+        """The last checkpoint of a batch, if any"""
+        path = self._path(batch, '.pkl')
+        if not path.exists():
+            return None
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def complete(self, batch: int, df) -> None:
+        """Store the results of a batch and drop its checkpoint"""
+        atomic_write(self._path(batch, '.parquet'), lambda p: df.to_parquet(p, index=False))
+        completed = sorted(self.completed() | {batch})
+        atomic_write(self.directory / 'progress.json',
+                     lambda p: p.write_text(json.dumps({'completed': completed})))
+        self._path(batch, '.pkl').unlink(missing_ok=True)
+
+    def result(self, batch: int):
+        """The stored results of a batch"""
+        import pandas as pd
+
+        return pd.read_parquet(self._path(batch, '.parquet'))
+
+    def clear(self) -> None:
+        """Drop every file of the sweep, leaving anything else in its directory"""
+        for pattern in CHECKPOINT_FILES:
+            for path in [*self.directory.glob(pattern), *self.directory.glob(pattern + '.tmp')]:
+                path.unlink()
+
+
+def sweep_directory(initial_state: ConsensusPledgeDemoState,
+                    params: Sequence[ConsensusPledgeParams],
+                    timesteps: int,
+                    batch_size: int) -> Path:
+    """Default checkpoint directory of a sweep, unique to its inputs"""
+    key = canonical_hash([canonical_hash(initial_state), list(params), timesteps, batch_size])
+    return Path(CHECKPOINT_ROOT) / key
+
+
+def run_sweep(initial_state: ConsensusPledgeDemoState,
+              params: Sequence[ConsensusPledgeParams],
+              timesteps: int,
+              directory=None,
+              batch_size: int = 64,
+              interval: float = 60.0,
+              resume: bool = False):
+    """Run a sweep with `VectorizedModel`, checkpointing it as it goes
+
+    Args:
+        initial_state (ConsensusPledgeDemoState): Initial state
+        params (Sequence[ConsensusPledgeParams]): Parameters of each sweep member
+        timesteps (int): Number of timesteps
+        directory (str | Path, optional): Checkpoint directory. Defaults to
+            one per sweep under `CHECKPOINT_ROOT`.
+        batch_size (int, optional): Members run as one vectorized batch
+        interval (float, optional): Seconds between checkpoints of a batch
+        resume (bool, optional): Skip finished batches and continue the
+            running one from its last checkpoint, rather than starting over.
+            Defaults to False.
+
+    Returns:
+        DataFrame: Long-format results, see `TrajectoryRecorder.to_dataframe`,
+            with the sweep member as `subset`
+    """
+    import pandas as pd
+
+    if directory is None:
+        directory = sweep_directory(initial_state, params, timesteps, batch_size)
+    checkpoint = SweepCheckpoint(directory)
+    if not resume:
+        checkpoint.clear()
+    completed = checkpoint.completed()
+
+    dfs = []
+    for batch, start in enumerate(range(0, len(params), batch_size)):
+        if batch not in completed:
+            restored = checkpoint.load(batch) if resume else None
+            if restored is None:
+                model = VectorizedModel(initial_state, params[start:start + batch_size])
+                recorder = TrajectoryRecorder()
+                recorder.record(model)
+            else:
+                model, recorder = restored
+
+            saved_at = time.monotonic()
+            while model.state.timestep < timesteps:
+                model.step()
+                recorder.record(model)
+                if time.monotonic() - saved_at >= interval:
+                    checkpoint.save(batch, model, recorder)
+                    saved_at = time.monotonic()
+
+            df = recorder.to_dataframe()
+            df['subset'] += start
+            checkpoint.complete(batch, df)
+        dfs.append(checkpoint.result(batch))
+    return pd.concat(dfs, ignore_index=True)
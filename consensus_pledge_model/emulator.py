@@ -0,0 +1,280 @@
+"""Polynomial chaos emulator of the model's trajectories.
+
+Training runs sample the parameter space with a Latin hypercube and run
+through the vectorized model in batches. A ridge regression on Legendre
+polynomials of the scaled parameters then maps them to every metric on every
+timestep, positive metrics in log scale. Predictions are a matrix product,
+so that millions of evaluations take seconds.
+"""
+from dataclasses import dataclass
+from itertools import combinations_with_replacement
+from typing import Optional, Sequence, Union
+
+import numpy as np
+from numpy.polynomial import legendre
+
+from consensus_pledge_model.results import RESULT_METRICS, results_frame
+from consensus_pledge_model.sensitivity import UNUSED_PARAMS, scalar_parameters, with_parameters
+from consensus_pledge_model.sobol import default_bounds
+from consensus_pledge_model.types import ConsensusPledgeDemoState, ConsensusPledgeParams
+from consensus_pledge_model.vectorized import TrajectoryRecorder, VectorizedModel
+
+# Results the held-out error is reported on
+EMULATOR_KPIS = ('power_qa',
+                 'fil_circulating',
+                 'fil_locked',
+                 'critical_cost',
+                 'circulating_surplus',
+                 'initial_pledge_per_new_qa_power',
+                 'daily_reward')
+
+
+def latin_hypercube(bounds: dict[str, tuple[float, float]],
+                    samples: int,
+                    seed: Optional[int] = None) -> np.ndarray:
+    """Latin hypercube sample of uniform ranges
+
+    Args:
+        bounds (dict[str, tuple[float, float]]): Uniform range by parameter
+        samples (int): Number of samples
+        seed (int, optional): Seed of the random generator
+
+    Returns:
+        np.ndarray: Parameter values, shape (samples, parameters)
+    """
+    rng = np.random.default_rng(seed)
+    low, high = np.array(list(bounds.values())).T
+    strata = np.argsort(rng.random((len(bounds), samples)), axis=1).T
+    unit = (strata + rng.random((samples, len(bounds)))) / samples
+    return low + (high - low) * unit
+
+
+def polynomial_terms(dimensions: int, degree: int) -> np.ndarray:
+    """Exponents of the multivariate polynomials of total degree up to `degree`
+
+    Returns:
+        np.ndarray: One row of per-dimension degrees per term, shape (terms, dimensions)
+    """
+    terms = []
+    for total in range(degree + 1):
+        for dims in combinations_with_replacement(range(dimensions), total):
+            terms.append(np.bincount(np.array(dims, dtype=int), minlength=dimensions))
+    return np.array(terms)
+
+
+def legendre_features(unit: np.ndarray, terms: np.ndarray) -> np.ndarray:
+    """Orthonormal Legendre polynomials of points in [-1, 1]
+
+    Args:
+        unit (np.ndarray): Points, shape (samples, dimensions)
+        terms (np.ndarray): Exponents as returned by `polynomial_terms`
+
+    Returns:
+        np.ndarray: Features, shape (samples, terms)
+    """
+    max_degree = int(terms.max(initial=0))
+    # shape (degree + 1, samples, dimensions)
+    univariate = np.stack([legendre.legval(unit, np.eye(max_degree + 1)[k]) * np.sqrt(2 * k + 1)
+                           for k in range(max_degree + 1)])
+    features = np.ones((len(unit), len(terms)))
+    for dimension in range(unit.shape[1]):
+        features *= univariate[terms[:, dimension], :, dimension].T
+    return features
+
+
+def training_runs(initial_state: ConsensusPledgeDemoState,
+                  params: ConsensusPledgeParams,
+                  names: Sequence[str],
+                  rows: np.ndarray,
+                  timesteps: int,
+                  batch_size: int = 1024,
+                  n_jobs: int = 1) -> tuple[np.ndarray, np.ndarray]:
+    """`RESULT_METRICS` of the model at each row of parameter values
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The metrics, shape (rows, metrics,
+            timesteps + 1), and the day of each timestep
+    """
+    chunks = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+    if n_jobs == 1:
+        recorders = [_evaluate(initial_state, params, names, chunk, timesteps) for chunk in chunks]
+    else:
+        from joblib import Parallel, delayed
+        recorders = Parallel(n_jobs=n_jobs)(
+            delayed(_evaluate)(initial_state, params, names, chunk, timesteps) for chunk in chunks)
+    outputs = np.concatenate([
+        np.stack([recorder.arrays()[name].T for name in RESULT_METRICS], axis=1)
+        for recorder in recorders])
+    return outputs, np.array(recorders[0].days_passed)
+
+
+def _evaluate(initial_state: ConsensusPledgeDemoState,
+              params: ConsensusPledgeParams,
+              names: Sequence[str],
+              rows: np.ndarray,
+              timesteps: int) -> TrajectoryRecorder:
+    batch = [with_parameters(params, dict(zip(names, row))) for row in rows]
+    return VectorizedModel(initial_state, batch).run(timesteps, TrajectoryRecorder(RESULT_METRICS))
+
+
+def relative_error(predicted, exact) -> dict[str, tuple[float, float]]:
+    """Median and 95th percentile over the rows of the relative error of
+    each of `EMULATOR_KPIS`
+    """
+    errors = {}
+    for kpi in EMULATOR_KPIS:
+        p, e = predicted[kpi].to_numpy(), exact[kpi].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            error = np.abs(p - e) / np.abs(e)
+        error = error[np.isfinite(error)]
+        errors[kpi] = (float(np.median(error)), float(np.percentile(error, 95)))
+    return errors
+
+
+@dataclass
+class Emulator():
+    # Parameters the emulated ones replace
+    params: ConsensusPledgeParams
+    # Uniform range of each emulated parameter, as named by `scalar_parameters`
+    bounds: dict[str, tuple[float, float]]
+    # Polynomial exponents, shape (terms, parameters)
+    terms: np.ndarray
+    # Regression coefficients, shape (terms, metrics * (timesteps + 1))
+    coefficients: np.ndarray
+    # Whether each of `RESULT_METRICS` is emulated in log scale
+    log_scale: np.ndarray
+    days_passed: np.ndarray
+    # Number of runs the emulator was fitted on
+    training_runs: int
+    # Median and 95th percentile of the relative error on held-out runs by KPI
+    held_out_error: dict[str, tuple[float, float]]
+
+    def _unit(self, values: np.ndarray) -> np.ndarray:
+        low, high = np.array(list(self.bounds.values())).T
+        return 2 * (values - low) / (high - low) - 1
+
+    def predict_metrics(self, values: np.ndarray) -> dict[str, np.ndarray]:
+        """Emulated metrics at rows of parameter values
+
+        Args:
+            values (np.ndarray): Values of the parameters in `bounds`, shape
+                (batch, parameters)
+
+        Returns:
+            dict[str, np.ndarray]: `RESULT_METRICS` with shape
+                (timesteps + 1, batch), as `TrajectoryRecorder.arrays`
+
+        Raises:
+            ValueError: If a value is outside the training bounds
+        """
+        values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+        unit = self._unit(values)
+        if (np.abs(unit) > 1 + 1e-9).any():
+            raise ValueError(f"Parameters outside the emulator's bounds {self.bounds}")
+        outputs = legendre_features(unit, self.terms) @ self.coefficients
+        outputs = outputs.reshape(len(values), len(RESULT_METRICS), -1)
+        outputs[:, self.log_scale] = np.exp(outputs[:, self.log_scale])
+        return {name: outputs[:, i].T for i, name in enumerate(RESULT_METRICS)}
+
+    def parameter_values(self, params: Sequence[ConsensusPledgeParams]) -> np.ndarray:
+        """Values of the emulated parameters of each of `params`"""
+        return np.array([[scalar_parameters(p)[name] for name in self.bounds] for p in params])
+
+    def predict(self, params: Union[ConsensusPledgeParams, Sequence[ConsensusPledgeParams]]):
+        """Emulated results, with the columns of the calculator's
+        `post_process_results`
+
+        Args:
+            params (ConsensusPledgeParams | Sequence[ConsensusPledgeParams]):
+                Parameters differing from `self.params` in emulated ones only
+
+        Returns:
+            DataFrame: One row per timestep and parameter set, which is the `subset`
+        """
+        if isinstance(params, dict):
+            params = [params]
+        arrays = self.predict_metrics(self.parameter_values(params))
+        return results_frame(arrays, self.days_passed, params)
+
+
+def fit_emulator(initial_state: ConsensusPledgeDemoState,
+                 params: ConsensusPledgeParams,
+                 timesteps: int,
+                 bounds: Optional[dict[str, tuple[float, float]]] = None,
+                 samples: int = 1024,
+                 degree: int = 2,
+                 ridge: float = 1e-6,
+                 test_fraction: float = 0.2,
+                 seed: Optional[int] = None,
+                 batch_size: int = 1024,
+                 n_jobs: int = 1) -> Emulator:
+    """Fit an emulator on runs sampled from `bounds`
+
+    Args:
+        initial_state (ConsensusPledgeDemoState): Initial state
+        params (ConsensusPledgeParams): Parameters the sampled ones replace
+        timesteps (int): Number of timesteps
+        bounds (dict[str, tuple[float, float]], optional): Uniform range by
+            parameter name. Defaults to the non-empty ranges of
+            `sobol.default_bounds(params)`.
+        samples (int, optional): Number of runs, including the held-out ones.
+            Defaults to 1024.
+        degree (int, optional): Total degree of the polynomials. Defaults to 2.
+        ridge (float, optional): Ridge penalty relative to the number of
+            training runs. Defaults to 1e-6.
+        test_fraction (float, optional): Share of the runs held out to
+            measure the error. Defaults to 0.2.
+        seed (int, optional): Seed of the sample
+        batch_size (int, optional): Runs per vectorized batch
+        n_jobs (int, optional): Worker processes running batches. Defaults to 1.
+
+    Returns:
+        Emulator: The fitted emulator and its held-out error
+
+    Raises:
+        ValueError: If `bounds` names a parameter the model never reads
+    """
+    unused = [name for name in bounds or ()
+              if name.rsplit('.', 1)[-1] in UNUSED_PARAMS]
+    if unused:
+        raise ValueError(f"The model never reads {unused}, which can't be emulated")
+    if bounds is None:
+        bounds = {name: (low, high) for name, (low, high) in default_bounds(params).items()
+                  if high > low}
+    names = list(bounds)
+    rows = latin_hypercube(bounds, samples, seed)
+    outputs, days_passed = training_runs(initial_state, params, names, rows, timesteps,
+                                         batch_size, n_jobs)
+    # Runs with diverging metrics can't be fitted
+    finite = np.isfinite(outputs).all(axis=(1, 2))
+    rows, outputs = rows[finite], outputs[finite]
+
+    n_test = int(len(rows) * test_fraction)
+    train, test = slice(n_test, None), slice(None, n_test)
+    log_scale = (outputs[train] > 0).all(axis=(0, 2))
+    targets = outputs.copy()
+    targets[:, log_scale] = np.log(targets[:, log_scale])
+    targets = targets.reshape(len(rows), -1)
+
+    terms = polynomial_terms(len(names), degree)
+    emulator = Emulator(params=params,
+                        bounds=bounds,
+                        terms=terms,
+                        coefficients=np.empty(0),
+                        log_scale=log_scale,
+                        days_passed=days_passed,
+                        training_runs=len(rows) - n_test,
+                        held_out_error={})
+    features = legendre_features(emulator._unit(rows[train]), terms)
+    penalty = np.sqrt(ridge * len(features)) * np.eye(len(terms))
+    emulator.coefficients = np.linalg.lstsq(
+        np.concatenate([features, penalty]),
+        np.concatenate([targets[train], np.zeros((len(terms), targets.shape[1]))]),
+        rcond=None)[0]
+
+    if n_test > 0:
+        test_params = [with_parameters(params, dict(zip(names, row))) for row in rows[test]]
+        exact = results_frame({name: outputs[test, i].T for i, name in enumerate(RESULT_METRICS)},
+                              days_passed, test_params)
+        emulator.held_out_error = relative_error(emulator.predict(test_params), exact)
+    return emulator
@@ -1,33 +1,78 @@
 import pandas as pd
-from consensus_pledge_model.params import INITIAL_STATE
-from consensus_pledge_model.params import SINGLE_RUN_PARAMS
-from consensus_pledge_model.structure import CONSENSUS_PLEDGE_DEMO_BLOCKS
-from cadCAD_tools import easy_run
+from consensus_pledge_model.params import INITIAL_STATE, TIMESTEPS
+from consensus_pledge_model.params import MULTI_RUN_PARAMS, SINGLE_RUN_PARAMS, STOCHASTIC_PARAMS
+from consensus_pledge_model.params import DAILY_INITIAL_STATE, DAILY_RUN_PARAMS, DAILY_TIMESTEPS
+from consensus_pledge_model.checkpoint import run_sweep
+from consensus_pledge_model.reduction import reduce_sweep
+from consensus_pledge_model.types import ConsensusPledgeParams
+from consensus_pledge_model.streaming import run_ensemble
+from consensus_pledge_model.vectorized import run_batch, run_monte_carlo
 from pandas import DataFrame
+from itertools import product
+from typing import Optional
 
 
-def standard_run() -> DataFrame:
-    """Function which runs the cadCAD simulations
+def sweep_run(resume: bool = False, kpis: bool = False) -> DataFrame:
+    """Function which runs every combination of `MULTI_RUN_PARAMS` with the
+    vectorized model, checkpointing the sweep under `data/checkpoints/`
+
+    Args:
+        resume (bool, optional): Continue an interrupted sweep from its last
+            checkpoint. Defaults to False.
+        kpis (bool, optional): Keep only the `DEFAULT_REDUCERS` KPIs of each
+            member instead of its trajectory, without checkpoints. Defaults to False.
+
+    Returns:
+        DataFrame: The results, with the sweep member as `subset`
+    """
+    params = [ConsensusPledgeParams(**dict(zip(MULTI_RUN_PARAMS, values)))
+              for values in product(*MULTI_RUN_PARAMS.values())]
+    if kpis:
+        return reduce_sweep(INITIAL_STATE, params, TIMESTEPS)
+    return run_sweep(INITIAL_STATE, params, TIMESTEPS, resume=resume)
+
+
+def stochastic_run(samples: int,
+                   seed: Optional[int] = None,
+                   compact: bool = False,
+                   batch_size: Optional[int] = None) -> DataFrame:
+    """Function which runs the default parameters with stochastic renewals
+    and onboarding, all samples advancing together in one vectorized pass
+
+    Args:
+        samples (int): The number of monte carlo samples
+        seed (int, optional): Seed for the random generator. Defaults to None.
+        compact (bool, optional): Store sectors in float32. Defaults to False.
+        batch_size (int, optional): If set, run the samples in batches of
+            this size and keep their streaming statistics instead
+
+    Returns:
+        DataFrame: Per-timestep quantiles of power_qa, circulating and
+            critical_cost, or their `StreamingStatistics` with `batch_size`
+    """
+    if batch_size is not None:
+        return run_ensemble(INITIAL_STATE,
+                            SINGLE_RUN_PARAMS,
+                            TIMESTEPS,
+                            samples,
+                            stochastic=STOCHASTIC_PARAMS,
+                            seed=seed,
+                            batch_size=batch_size,
+                            compact=compact).to_dataframe()
+    return run_monte_carlo(INITIAL_STATE,
+                           SINGLE_RUN_PARAMS,
+                           TIMESTEPS,
+                           samples,
+                           stochastic=STOCHASTIC_PARAMS,
+                           seed=seed,
+                           compact=compact)
+
+
+def daily_run() -> DataFrame:
+    """Function which runs the default parameters with daily timesteps over
+    six years with the vectorized model
 
     Returns:
-        DataFrame: A dataframe of simulation data
+        DataFrame: The results, see `TrajectoryRecorder.to_dataframe`
     """
-    # The number of timesteps for each simulation to run
-    N_timesteps = 360
-
-    # The number of monte carlo runs per set of parameters tested
-    N_samples = 1
-    # %%
-    # Get the sweep params in the form of single length arrays
-    sweep_params = {k: [v] for k, v in SINGLE_RUN_PARAMS.items()}
-
-    # Load simulation arguments
-    sim_args = (INITIAL_STATE,
-                sweep_params,
-                CONSENSUS_PLEDGE_DEMO_BLOCKS,
-                N_timesteps,
-                N_samples)
-
-    # Run simulation
-    sim_df = easy_run(*sim_args)
-    return sim_df
+    return run_batch(DAILY_INITIAL_STATE, [DAILY_RUN_PARAMS], DAILY_TIMESTEPS)
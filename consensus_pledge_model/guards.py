@@ -0,0 +1,140 @@
+"""Checks which stop batch members of a `VectorizedModel` run early.
+
+Guards are evaluated after each timestep. Members tripping one are recorded
+on that timestep, then leave the batch so that the rest of the run doesn't
+spend compute on them. `VectorizedModel.halted` reports when and why.
+
+cadCAD runs are guarded by `guarded_blocks`, which checks the state left by
+the previous timestep at the start of each timestep and stops the run by
+raising `RunHalted`.
+"""
+from dataclasses import dataclass, fields, is_dataclass
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Optional, Sequence
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from consensus_pledge_model.vectorized import VectorizedState
+
+
+@dataclass(frozen=True)
+class Halt():
+    # Timestep on which the guard tripped
+    timestep: int
+    reason: str
+
+
+class RunHalted(Exception):
+    """Raised from a cadCAD run of `guarded_blocks` once a guard trips
+
+    Args:
+        halt (Halt): When and why the run stopped
+    """
+
+    def __init__(self, halt: Halt):
+        super().__init__(halt)
+        self.halt = halt
+
+    def __str__(self) -> str:
+        return f"{self.halt.reason} on timestep {self.halt.timestep}"
+
+
+class Guard():
+    """Check of the state after each timestep"""
+    reason: str = 'guard tripped'
+
+    def check(self, state: 'VectorizedState') -> np.ndarray:
+        """Whether each batch member trips the guard, shape (batch,)"""
+        raise NotImplementedError
+
+
+class NaNGuard(Guard):
+    """Trips when any state variable of a member is NaN"""
+    reason = 'NaN in the state'
+
+    def check(self, state: 'VectorizedState') -> np.ndarray:
+        tripped = np.zeros(len(state.power_qa), dtype=bool)
+        for value in state.__dict__.values():
+            if isinstance(value, np.ndarray):
+                tripped |= np.isnan(value)
+        return tripped
+
+
+class NegativeCirculatingGuard(Guard):
+    """Trips when the circulating supply goes negative"""
+    reason = 'negative circulating supply'
+
+    def check(self, state: 'VectorizedState') -> np.ndarray:
+        return state.circulating < 0.0
+
+
+class ThresholdGuard(Guard):
+    """Trips when a metric leaves the `[low, high]` range. NaNs don't trip it.
+
+    Args:
+        variable (str): Metric of `VectorizedState`
+        low (float, optional): Lower bound. Defaults to None.
+        high (float, optional): Upper bound. Defaults to None.
+    """
+
+    def __init__(self, variable: str, low: Optional[float] = None, high: Optional[float] = None):
+        self.variable = variable
+        self.low = low
+        self.high = high
+        if low is None:
+            self.reason = f'{variable} above {high}'
+        elif high is None:
+            self.reason = f'{variable} below {low}'
+        else:
+            self.reason = f'{variable} outside [{low}, {high}]'
+
+    def check(self, state: 'VectorizedState') -> np.ndarray:
+        value = getattr(state, self.variable)
+        tripped = np.zeros(len(value), dtype=bool)
+        if self.low is not None:
+            tripped |= value < self.low
+        if self.high is not None:
+            tripped |= value > self.high
+        return tripped
+
+
+# Invariants every run should keep
+DEFAULT_GUARDS = (NaNGuard(), NegativeCirculatingGuard())
+
+
+def cadcad_state_view(state: dict) -> SimpleNamespace:
+    """A cadCAD state as the batch of one member which guards check, with
+    the numeric variables and the fields of the token distribution and
+    reward as arrays of shape (1,)
+    """
+    values = {}
+    for name, value in state.items():
+        if is_dataclass(value) and name in ('token_distribution', 'reward'):
+            values.update({field.name: np.array([getattr(value, field.name)], dtype=float)
+                           for field in fields(value)})
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[name] = np.array([value], dtype=float)
+    values['circulating'] = np.array([state['token_distribution'].circulating], dtype=float)
+    return SimpleNamespace(**values)
+
+
+def guarded_blocks(blocks: list[dict], guards: Sequence[Guard] = DEFAULT_GUARDS) -> list[dict]:
+    """`blocks` raising `RunHalted` at the start of a timestep once the state
+    left by the previous one trips any of `guards`
+
+    Args:
+        blocks (list[dict]): Partial state update blocks
+        guards (Sequence[Guard], optional): Guards checked on the state.
+            Defaults to `DEFAULT_GUARDS`.
+    """
+    def p_check_guards(_1, _2, _3, state) -> dict:
+        view = cadcad_state_view(state)
+        for guard in guards:
+            if guard.check(view)[0]:
+                raise RunHalted(Halt(int(state['timestep']), guard.reason))
+        return {}
+
+    first = {**blocks[0], 'policies': {**blocks[0]['policies'],
+                                       'check_guards': p_check_guards}}
+    return [first, *blocks[1:]]
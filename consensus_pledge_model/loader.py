@@ -0,0 +1,135 @@
+"""Loader of sector snapshots exported from the network.
+
+Snapshots are CSV or Parquet files with one row per sector, or per any
+finer grouping, which are aggregated into one cohort per remaining lifetime.
+Locked rewards come in an optional second file with one row per unlock.
+Aggregation is done with array operations, so that full-network snapshots of
+millions of rows load in seconds.
+"""
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from consensus_pledge_model.params import INITIAL_STATE
+from consensus_pledge_model.types import ConsensusPledgeDemoState, TokenDistribution
+from consensus_pledge_model.vectorized import SectorCohorts
+
+# Columns of the sector file
+SECTOR_COLUMNS = ('remaining_days', 'power_rb', 'power_qa', 'storage_pledge', 'consensus_pledge')
+# Columns of the reward file: rewards of the sectors with `remaining_days`
+# left, unlocking on simulation day `day`
+REWARD_COLUMNS = ('remaining_days', 'day', 'reward')
+
+
+def read_table(path, columns: tuple[str, ...]):
+    """Read the `columns` of a CSV or Parquet file as float64
+
+    Args:
+        path (str | Path): File path, Parquet if it ends with `.parquet`
+        columns (tuple[str, ...]): Required columns
+
+    Raises:
+        ValueError: If a column is missing
+
+    Returns:
+        DataFrame: The columns
+    """
+    import pandas as pd
+
+    path = Path(path)
+    if path.suffix == '.parquet':
+        import pyarrow.parquet as pq
+        available = pq.read_schema(path).names
+    else:
+        available = pd.read_csv(path, nrows=0).columns
+    missing = [c for c in columns if c not in available]
+    if missing:
+        raise ValueError(f"{path} lacks the columns {missing}")
+
+    if path.suffix == '.parquet':
+        df = pd.read_parquet(path, columns=list(columns))
+    else:
+        df = pd.read_csv(path, usecols=list(columns), engine='pyarrow')
+    return df.astype('float64')
+
+
+def load_sector_snapshot(path, rewards_path=None) -> SectorCohorts:
+    """Aggregate a sector snapshot into cohorts by remaining days
+
+    Args:
+        path (str | Path): Sector file with `SECTOR_COLUMNS`
+        rewards_path (str | Path, optional): Reward file with `REWARD_COLUMNS`.
+            Defaults to no locked rewards.
+
+    Returns:
+        SectorCohorts: One cohort per distinct remaining days
+    """
+    sectors = read_table(path, SECTOR_COLUMNS)
+    if rewards_path is None:
+        rewards = None
+        remaining_days = sectors.remaining_days.to_numpy()
+    else:
+        rewards = read_table(rewards_path, REWARD_COLUMNS)
+        remaining_days = np.concatenate([sectors.remaining_days.to_numpy(),
+                                         rewards.remaining_days.to_numpy()])
+
+    # Cohort of every row, with rewards of unknown sectors in powerless cohorts
+    cohort_days, cohort = np.unique(remaining_days, return_inverse=True)
+    n_sectors = len(sectors)
+
+    def total(column: str) -> np.ndarray:
+        return np.bincount(cohort[:n_sectors],
+                           weights=sectors[column].to_numpy(),
+                           minlength=len(cohort_days))
+
+    if rewards is None:
+        reward_cohort = np.zeros(0, dtype=np.int64)
+        reward_day = reward = np.zeros(0)
+    else:
+        # One entry per cohort and unlock day
+        days, day_index = np.unique(rewards.day.to_numpy(), return_inverse=True)
+        key = cohort[n_sectors:] * len(days) + day_index
+        keys, key_index = np.unique(key, return_inverse=True)
+        reward_cohort = keys // len(days)
+        reward_day = days[keys % len(days)]
+        reward = np.bincount(key_index, weights=rewards.reward.to_numpy())
+
+    return SectorCohorts(remaining_days=cohort_days,
+                         power_rb=total('power_rb'),
+                         power_qa=total('power_qa'),
+                         storage_pledge=total('storage_pledge'),
+                         consensus_pledge=total('consensus_pledge'),
+                         reward_cohort=reward_cohort,
+                         reward_day=reward_day,
+                         reward=reward)
+
+
+def snapshot_initial_state(cohorts: SectorCohorts,
+                           initial_state: Optional[ConsensusPledgeDemoState] = None
+                           ) -> ConsensusPledgeDemoState:
+    """Initial state whose sectors, power and locked tokens come from a snapshot
+
+    The vectorized model can take the cohorts directly through its `cohorts`
+    argument rather than converting the state's `aggregate_sectors` back.
+
+    Args:
+        cohorts (SectorCohorts): The snapshot, see `load_sector_snapshot`
+        initial_state (ConsensusPledgeDemoState, optional): Source of the
+            other variables. Defaults to `INITIAL_STATE`.
+
+    Returns:
+        ConsensusPledgeDemoState: The initial state
+    """
+    initial_state = INITIAL_STATE if initial_state is None else initial_state
+    distribution = initial_state['token_distribution']
+    return ConsensusPledgeDemoState(**{
+        **initial_state,
+        'aggregate_sectors': cohorts.to_aggregate_sectors(),
+        'power_rb': float(cohorts.power_rb.sum()),
+        'power_qa': float(cohorts.power_qa.sum()),
+        'token_distribution': TokenDistribution(minted=distribution.minted,
+                                                vested=distribution.vested,
+                                                collateral=cohorts.collateral,
+                                                locked_rewards=cohorts.locked_rewards,
+                                                burnt=distribution.burnt)})
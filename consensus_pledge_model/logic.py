@@ -1,5 +1,6 @@
 from cadCAD_tools.types import Signal, VariableUpdate
 from consensus_pledge_model.params import YEAR
+from consensus_pledge_model.scheduler import reads
 from collections import defaultdict
 from copy import copy
 from consensus_pledge_model.types import *
@@ -7,6 +8,7 @@ from consensus_pledge_model.types import *
 # ## Time Tracking
 
 
+@reads()
 def p_evolve_time(params: ConsensusPledgeParams,
                   _2,
                   _3,
@@ -25,6 +27,7 @@ def p_evolve_time(params: ConsensusPledgeParams,
     return {'delta_in_days': params['timestep_in_days']}
 
 
+@reads('days_passed')
 def s_days_passed(_1,
                   _2,
                   _3,
@@ -47,6 +50,7 @@ def s_days_passed(_1,
     return ('days_passed', value)
 
 
+@reads()
 def s_delta_days(_1,
                  _2,
                  _3,
@@ -69,6 +73,7 @@ def s_delta_days(_1,
     return ('delta_days', value)
 
 
+@reads('days_passed')
 def s_behaviour(params: ConsensusPledgeParams,
                 _2,
                 _3,
@@ -102,6 +107,7 @@ def s_behaviour(params: ConsensusPledgeParams,
 # ## Network
 
 
+@reads('aggregate_sectors')
 def s_power_qa(params: ConsensusPledgeParams,
                _2,
                _3,
@@ -123,6 +129,7 @@ def s_power_qa(params: ConsensusPledgeParams,
     return ('power_qa', value)
 
 
+@reads('aggregate_sectors')
 def s_power_rb(params: ConsensusPledgeParams,
                _2,
                _3,
@@ -144,6 +151,53 @@ def s_power_rb(params: ConsensusPledgeParams,
     return ('power_rb', value)
 
 
+@reads('network_power', 'days_passed')
+def s_network_power(params: TopDownParams,
+                    _2,
+                    _3,
+                    state: TopDownState,
+                    signal: Signal) -> VariableUpdate:
+    """State update for an exogenous network power, growing at the rate of
+    the `network_power_scenario` phase at the start of the timestep
+
+    Args:
+        params (TopDownParams): System parameters
+        _2
+        _3
+        state (TopDownState): The current state of the system
+        signal (Signal): The signal created from policies in this substep
+
+    Returns:
+        VariableUpdate: The update to the network_power variable
+    """
+    scenario: NetworkPowerScenario = params['network_power_scenario']
+    rate = scenario.growth_rate(state['days_passed'])
+    growth = (1 + rate) ** (params['timestep_in_days'] / YEAR)
+    return ('network_power', float(state['network_power'] * growth))
+
+
+@reads('network_power')
+def s_exogenous_power_rb(params: TopDownParams,
+                         _2,
+                         _3,
+                         state: TopDownState,
+                         signal: Signal) -> VariableUpdate:
+    """State update for the current power, following the exogenous network power
+
+    Args:
+        params (TopDownParams): System parameters
+        _2
+        _3
+        state (TopDownState): The current state of the system
+        signal (Signal): The signal created from policies in this substep
+
+    Returns:
+        VariableUpdate: The update to the power_rb variable
+    """
+    return ('power_rb', state['network_power'])
+
+
+@reads('days_passed')
 def s_baseline(params: ConsensusPledgeParams,
                _2,
                _3,
@@ -172,6 +226,7 @@ def s_baseline(params: ConsensusPledgeParams,
     return ('baseline', value)
 
 
+@reads('power_rb', 'baseline', 'cumm_capped_power')
 def s_cumm_capped_power(params: ConsensusPledgeParams,
                         _2,
                         _3,
@@ -206,6 +261,7 @@ def s_cumm_capped_power(params: ConsensusPledgeParams,
     return ('cumm_capped_power', new_cumm_capped_power)
 
 
+@reads('cumm_capped_power')
 def s_effective_network_time(params: ConsensusPledgeParams,
                              _2,
                              history: list[list[ConsensusPledgeDemoState]],
@@ -230,6 +286,7 @@ def s_effective_network_time(params: ConsensusPledgeParams,
     return ('effective_network_time', value)
 
 
+@reads('days_passed', 'effective_network_time', history=True)
 def s_reward(params: ConsensusPledgeParams,
              _2,
              history: list[list[ConsensusPledgeDemoState]],
@@ -270,6 +327,7 @@ def s_reward(params: ConsensusPledgeParams,
     return ('reward', reward)
 
 
+@reads('token_distribution', 'baseline', 'power_qa')
 def s_consensus_pledge_per_new_qa_power(params: ConsensusPledgeParams,
                                         _2,
                                         _3,
@@ -297,6 +355,7 @@ def s_consensus_pledge_per_new_qa_power(params: ConsensusPledgeParams,
     return ('consensus_pledge_per_new_qa_power', value)
 
 
+@reads('reward', 'delta_days', 'power_qa')
 def s_storage_pledge_per_new_qa_power(params: ConsensusPledgeParams,
                                       _2,
                                       history: dict[list, dict[list, ConsensusPledgeDemoState]],
@@ -329,6 +388,8 @@ def s_storage_pledge_per_new_qa_power(params: ConsensusPledgeParams,
     return ('storage_pledge_per_new_qa_power', value)
 
 
+@reads('aggregate_sectors', 'behaviour', 'delta_days',
+       'storage_pledge_per_new_qa_power', 'consensus_pledge_per_new_qa_power')
 def s_sectors_onboard(params: ConsensusPledgeParams,
                       _2,
                       _3,
@@ -374,6 +435,8 @@ def s_sectors_onboard(params: ConsensusPledgeParams,
     return ('aggregate_sectors', current_sectors_list)
 
 
+@reads('aggregate_sectors', 'behaviour', 'delta_days',
+       'storage_pledge_per_new_qa_power', 'consensus_pledge_per_new_qa_power')
 def s_sectors_renew(params,
                     _2,
                     _3,
@@ -473,6 +536,7 @@ def s_sectors_renew(params,
     return ('aggregate_sectors', current_sectors_list)
 
 
+@reads('aggregate_sectors', 'delta_days')
 def s_sectors_expire(_1,
                      _2,
                      _3,
@@ -510,6 +574,7 @@ def s_sectors_expire(_1,
     return ('aggregate_sectors', current_sectors_list)
 
 
+@reads('reward', 'aggregate_sectors', 'power_qa', 'days_passed')
 def s_sectors_rewards(params: ConsensusPledgeParams,
                       _2,
                       _3,
@@ -588,6 +653,7 @@ def s_sectors_rewards(params: ConsensusPledgeParams,
     return ('aggregate_sectors', current_sector_list)
 
 
+@reads('days_passed')
 def p_vest_fil(params: ConsensusPledgeParams,
                _2,
                _3,
@@ -608,6 +674,7 @@ def p_vest_fil(params: ConsensusPledgeParams,
     return {'fil_to_vest': value}
 
 
+@reads()
 def p_burn_fil(_1,
                _2,
                _3,
@@ -626,6 +693,7 @@ def p_burn_fil(_1,
     return {'fil_to_burn': 0.0}
 
 
+@reads('effective_network_time')
 def p_minted_fil(params: ConsensusPledgeParams,
                  _2,
                  _3,
@@ -649,6 +717,7 @@ def p_minted_fil(params: ConsensusPledgeParams,
     return {'fil_minted': value}
 
 
+@reads('token_distribution', 'reward', 'aggregate_sectors')
 def s_token_distribution(params: ConsensusPledgeParams,
                          _2,
                          _3,
@@ -3,19 +3,22 @@ from consensus_pledge_model.types import BaselineMinting, Reward, SimpleMinting
 from consensus_pledge_model.types import ConsensusPledgeDemoState, ConsensusPledgeParams, ConsensusPledgeSweepParams
 from consensus_pledge_model.types import QA_PiB, PiB, Days, FIL, FIL_per_QA_PiB
 from consensus_pledge_model.types import TokenDistribution, BehaviouralParams, AggregateSector
+from consensus_pledge_model.types import StochasticParams
 
 # TODO: Upgrade to the Consensus Pledge Model
 # TODO: pinpoint the sources for the numerical constants
 
 # TODO: refactor
-# DAYS_PER_TIMESTEP = 1
 YEAR = 365.25
-# SIMULATION_TIME_IN_YEARS = 6
 TIMESTEP_IN_DAYS = 7
-# TIMESTEPS = int(ceil(SIMULATION_TIME_IN_YEARS * YEAR) / DAYS_PER_TIMESTEP)
 TIMESTEPS = int(800 / TIMESTEP_IN_DAYS)
 #TIMESTEPS = 35
 
+# Daily resolution over six years, run with the vectorized model
+SIMULATION_TIME_IN_YEARS = 6
+DAYS_PER_TIMESTEP = 1
+DAILY_TIMESTEPS = int(SIMULATION_TIME_IN_YEARS * YEAR / DAYS_PER_TIMESTEP)
+
 # BLOCKS_SINCE_LAUNCH = 2_563_129  # Block height used as an reference point
 # DAYS_AFTER_LAUNCH = (BLOCKS_SINCE_LAUNCH * 30) / \
 #     (60 * 60 * 24)  # Days after launch
@@ -47,6 +50,11 @@ LINEAR_DURATION: Days = 180  # Source: Spec
 
 SAMPLES = 1
 
+# Monte Carlo samples drawn by the stochastic mode
+STOCHASTIC_SAMPLES = 1_000
+STOCHASTIC_PARAMS = StochasticParams(renewal_unit=1.0,  # Source: Guess
+                                     onboarding_noise=0.25)  # Source: Guess
+
 """
 Note: the previous code from the Baseline Edu Calculator ends here.
 """
@@ -164,6 +172,12 @@ SINGLE_RUN_PARAMS = ConsensusPledgeParams(
 )
 
 
+DAILY_INITIAL_STATE = ConsensusPledgeDemoState(**{**INITIAL_STATE,
+                                                  'delta_days': DAYS_PER_TIMESTEP})
+DAILY_RUN_PARAMS = ConsensusPledgeParams(**{**SINGLE_RUN_PARAMS,
+                                            'timestep_in_days': DAYS_PER_TIMESTEP})
+
+
 MULTI_RUN_PARAMS = ConsensusPledgeSweepParams(
     **{k: [v] for k, v in SINGLE_RUN_PARAMS.items()})
 MULTI_RUN_PARAMS['target_locked_supply'] = [0.3, 0.0]
\ No newline at end of file
@@ -0,0 +1,167 @@
+"""Sweeps returning one row of KPIs per member instead of trajectories.
+
+A reducer spec names each KPI and maps it to a metric and a reduction over the
+timesteps, e.g. `{'min_circulating_surplus': ('circulating_surplus', 'min')}`.
+`ReducingRecorder` folds every timestep into running reductions, so that a
+batch keeps one value per member and KPI. Batches run on worker processes and
+only these rows are sent back to the parent.
+"""
+from typing import Optional, Sequence
+
+import numpy as np
+
+from consensus_pledge_model.guards import Guard
+from consensus_pledge_model.sensitivity import scalar_parameters
+from consensus_pledge_model.types import ConsensusPledgeDemoState, ConsensusPledgeParams
+from consensus_pledge_model.vectorized import METRICS, Recorder, VectorizedModel
+
+# Reductions of a metric over the timesteps, the day_of_ ones giving the day
+# on which the extreme is first reached
+REDUCTIONS = ('min', 'max', 'mean', 'initial', 'final', 'day_of_min', 'day_of_max')
+
+DEFAULT_REDUCERS = {'min_circulating_surplus': ('circulating_surplus', 'min'),
+                    'day_of_min_circulating_surplus': ('circulating_surplus', 'day_of_min'),
+                    'peak_locked': ('locked', 'max'),
+                    'final_power_qa': ('power_qa', 'final'),
+                    'final_critical_cost': ('critical_cost', 'final')}
+
+
+def validate_reducers(reducers: dict[str, tuple[str, str]]) -> None:
+    """Check that a reducer spec names known metrics and reductions
+
+    Raises:
+        ValueError: If a metric is not in `METRICS` or a reduction not in `REDUCTIONS`
+    """
+    for name, (metric, reduction) in reducers.items():
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r} for {name!r}")
+        if reduction not in REDUCTIONS:
+            raise ValueError(f"Unknown reduction {reduction!r} for {name!r}, "
+                             f"expected one of {REDUCTIONS}")
+
+
+class ReducingRecorder(Recorder):
+    """Running reductions of the metrics of each batch member
+
+    NaN values are skipped, and members halted by a guard keep the reductions
+    of the timesteps they ran.
+
+    Args:
+        reducers (dict[str, tuple[str, str]]): Metric and reduction by KPI name
+    """
+
+    def __init__(self, reducers: dict[str, tuple[str, str]] = DEFAULT_REDUCERS):
+        validate_reducers(reducers)
+        self.reducers = dict(reducers)
+        self.batch_size: Optional[int] = None
+        # Running values by KPI, shape (batch,) each
+        self.values: dict[str, np.ndarray] = {}
+        # Number of non-NaN values by KPI, for the means
+        self.counts: dict[str, np.ndarray] = {}
+        # Running extreme of the day_of_ KPIs
+        self.extremes: dict[str, np.ndarray] = {}
+
+    def _start(self, batch_size: int) -> None:
+        self.batch_size = batch_size
+        for name, (_, reduction) in self.reducers.items():
+            self.values[name] = np.full(batch_size, np.nan)
+            if reduction == 'mean':
+                self.values[name][:] = 0.0
+                self.counts[name] = np.zeros(batch_size)
+            elif reduction in ('day_of_min', 'day_of_max'):
+                self.extremes[name] = np.full(batch_size, np.nan)
+
+    def record(self, model: VectorizedModel) -> None:
+        if self.batch_size is None:
+            self._start(model.batch_size)
+        members = model.members
+        metrics = model.metrics()
+        for name, (metric, reduction) in self.reducers.items():
+            x = np.asarray(metrics[metric], dtype=np.float64)
+            values = self.values[name]
+            if reduction == 'min':
+                values[members] = np.fmin(values[members], x)
+            elif reduction == 'max':
+                values[members] = np.fmax(values[members], x)
+            elif reduction == 'mean':
+                finite = ~np.isnan(x)
+                values[members[finite]] += x[finite]
+                self.counts[name][members[finite]] += 1
+            elif reduction == 'initial':
+                if model.state.timestep == 0:
+                    values[members] = x
+            elif reduction == 'final':
+                values[members] = np.where(np.isnan(x), values[members], x)
+            else:
+                extremes = self.extremes[name]
+                previous = extremes[members]
+                if reduction == 'day_of_min':
+                    improved = (x < previous) | (np.isnan(previous) & ~np.isnan(x))
+                else:
+                    improved = (x > previous) | (np.isnan(previous) & ~np.isnan(x))
+                extremes[members[improved]] = x[improved]
+                values[members[improved]] = model.state.days_passed
+
+    def kpis(self) -> dict[str, np.ndarray]:
+        """The reduced KPIs, shape (batch,) each"""
+        kpis = dict(self.values)
+        for name, counts in self.counts.items():
+            with np.errstate(invalid='ignore'):
+                kpis[name] = self.values[name] / counts
+        return kpis
+
+
+def _reduce_batch(initial_state: ConsensusPledgeDemoState,
+                  params: Sequence[ConsensusPledgeParams],
+                  timesteps: int,
+                  reducers: dict[str, tuple[str, str]],
+                  guards: Sequence[Guard]) -> dict[str, np.ndarray]:
+    model = VectorizedModel(initial_state, params)
+    return model.run(timesteps, ReducingRecorder(reducers), guards).kpis()
+
+
+def reduce_sweep(initial_state: ConsensusPledgeDemoState,
+                 params: Sequence[ConsensusPledgeParams],
+                 timesteps: int,
+                 reducers: dict[str, tuple[str, str]] = DEFAULT_REDUCERS,
+                 batch_size: int = 64,
+                 n_jobs: int = 1,
+                 guards: Sequence[Guard] = ()):
+    """Run a sweep in batches, keeping the reduced KPIs of each member only
+
+    Args:
+        initial_state (ConsensusPledgeDemoState): Initial state
+        params (Sequence[ConsensusPledgeParams]): Sweep members
+        timesteps (int): Number of timesteps
+        reducers (dict[str, tuple[str, str]], optional): Metric and reduction
+            by KPI name. Defaults to `DEFAULT_REDUCERS`.
+        batch_size (int, optional): Members per vectorized batch. Defaults to 64.
+        n_jobs (int, optional): Worker processes running batches. Defaults to 1.
+        guards (Sequence[Guard], optional): Checks halting members early
+
+    Returns:
+        DataFrame: One row per member, which is the `subset`, with the scalar
+            parameters varying across the sweep and a column per KPI
+
+    Raises:
+        ValueError: If the reducer spec is invalid
+    """
+    import pandas as pd
+
+    validate_reducers(reducers)
+    batches = [params[i:i + batch_size] for i in range(0, len(params), batch_size)]
+    if n_jobs == 1:
+        rows = [_reduce_batch(initial_state, batch, timesteps, reducers, guards)
+                for batch in batches]
+    else:
+        from joblib import Parallel, delayed
+        rows = Parallel(n_jobs=n_jobs)(
+            delayed(_reduce_batch)(initial_state, batch, timesteps, reducers, guards)
+            for batch in batches)
+
+    parameters = pd.DataFrame([scalar_parameters(p) for p in params])
+    varying = parameters.loc[:, parameters.nunique(dropna=False) > 1]
+    return pd.DataFrame({'subset': np.arange(len(params)),
+                         **{name: varying[name].to_numpy() for name in varying.columns},
+                         **{name: np.concatenate([kpis[name] for kpis in rows])
+                            for name in reducers}})
@@ -0,0 +1,299 @@
+"""Registry of simulation runs, indexed by their parameters.
+
+Runs are identified by a canonical hash of the initial state, parameters,
+number of timesteps and engine. An SQLite table keeps one row per run with
+one indexed column per scalar parameter, so that runs can be found by
+parameter ranges, while the trajectories themselves are stored as Parquet,
+one file per batch of runs.
+"""
+import json
+import re
+import sqlite3
+import uuid
+from dataclasses import fields, is_dataclass
+from datetime import datetime
+from hashlib import sha1
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+
+from consensus_pledge_model.sensitivity import scalar_parameters
+from consensus_pledge_model.types import ConsensusPledgeDemoState, ConsensusPledgeParams
+from consensus_pledge_model.vectorized import VectorizedModel
+
+# Engine name of runs computed by `VectorizedModel`
+VECTORIZED_ENGINE = 'vectorized'
+RUN_COLUMNS = ('run_hash', 'engine', 'timesteps', 'created', 'path', 'params')
+
+
+def _canonical(value: object) -> object:
+    """JSON-compatible form of `value` which is equal for equal values"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        # 180 and 180.0 are the same parameter, and JSON has no infinity
+        return repr(float(value))
+    if is_dataclass(value):
+        return {'__type__': type(value).__name__,
+                **{f.name: _canonical(getattr(value, f.name)) for f in fields(value)}}
+    if isinstance(value, dict):
+        return sorted([_canonical(k), _canonical(v)] for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    raise TypeError(f"Can't canonicalize {type(value).__name__}")
+
+
+def canonical_hash(value: object) -> str:
+    """Hash of `value` which doesn't depend on dict ordering or number types"""
+    encoded = json.dumps(_canonical(value), sort_keys=True, separators=(',', ':'))
+    return sha1(encoded.encode()).hexdigest()
+
+
+def run_hash(state_hash: str,
+             params: ConsensusPledgeParams,
+             timesteps: int,
+             engine: str = VECTORIZED_ENGINE) -> str:
+    """Identifier of a run
+
+    Args:
+        state_hash (str): `canonical_hash` of the initial state
+        params (ConsensusPledgeParams): System parameters
+        timesteps (int): Number of timesteps
+        engine (str, optional): The simulation engine
+
+    Returns:
+        str: The run hash
+    """
+    return canonical_hash([state_hash, params, timesteps, engine])
+
+
+def parameter_columns(params: ConsensusPledgeParams) -> dict[str, float]:
+    """The indexed columns of a run, see `scalar_parameters`
+
+    Behavioural params are named by phase number rather than by the day their
+    phase ends, as `phase_<n>.<field>`, so that runs with different phase
+    layouts are queried alike. `phase_<n>.end` is the day phase n ends and
+    `phase_count` the number of phases.
+    """
+    phase_ends = sorted(params['behavioural_params'])
+    phase_numbers = {str(phase_end): n for n, phase_end in enumerate(phase_ends, start=1)}
+    columns = {}
+    for name, value in scalar_parameters(params).items():
+        if name.startswith('behavioural_params['):
+            phase_end, field_name = name[len('behavioural_params['):].split('].')
+            name = f'phase_{phase_numbers[phase_end]}.{field_name}'
+        columns[name] = value
+    columns['phase_count'] = float(len(phase_ends))
+    for n, phase_end in enumerate(phase_ends, start=1):
+        columns[f'phase_{n}.end'] = float(phase_end)
+    columns['timestep_in_days'] = float(params['timestep_in_days'])
+    columns['baseline_activated'] = float(params['baseline_activated'])
+    return columns
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _quoted_names(condition: str) -> set[str]:
+    """Double-quoted identifiers of an SQL condition, which SQLite would
+    otherwise read as string literals if no such column exists
+    """
+    return {name.replace('""', '"') for name in re.findall(r'"((?:[^"]|"")*)"', condition)}
+
+
+class RunRegistry():
+    """Stores runs under `root` and skips those which were already computed
+
+    Args:
+        root (str | Path, optional): Directory holding the SQLite index and
+            the Parquet results. Defaults to 'data/registry'.
+    """
+
+    def __init__(self, root='data/registry'):
+        self.root = Path(root)
+        (self.root / 'results').mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.root / 'runs.sqlite')
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_hash TEXT PRIMARY KEY,
+                engine TEXT NOT NULL,
+                timesteps INTEGER NOT NULL,
+                created TEXT NOT NULL,
+                path TEXT NOT NULL,
+                params TEXT NOT NULL)""")
+        self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> 'RunRegistry':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __contains__(self, run_hash: str) -> bool:
+        return self.connection.execute("SELECT 1 FROM runs WHERE run_hash = ?",
+                                       (run_hash,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    @property
+    def parameters(self) -> list[str]:
+        """Names of the indexed parameter columns"""
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(runs)")]
+        return [c for c in columns if c not in RUN_COLUMNS]
+
+    def _add_parameter_columns(self, names: Sequence[str]) -> None:
+        existing = set(self.parameters)
+        for name in names:
+            if name in existing:
+                continue
+            existing.add(name)
+            index = _quote(f'runs_{sha1(name.encode()).hexdigest()[:12]}')
+            self.connection.execute(f"ALTER TABLE runs ADD COLUMN {_quote(name)} REAL")
+            self.connection.execute(f"CREATE INDEX {index} ON runs ({_quote(name)})")
+
+    def existing(self, run_hashes: Sequence[str]) -> set[str]:
+        """The subset of `run_hashes` which is stored"""
+        found = set()
+        run_hashes = list(run_hashes)
+        # Stay below SQLite's limit of bound variables
+        for i in range(0, len(run_hashes), 500):
+            chunk = run_hashes[i:i + 500]
+            query = f"SELECT run_hash FROM runs WHERE run_hash IN ({','.join('?' * len(chunk))})"
+            found.update(row[0] for row in self.connection.execute(query, chunk))
+        return found
+
+    def put(self,
+            run_hashes: Sequence[str],
+            params: Sequence[ConsensusPledgeParams],
+            timesteps: int,
+            df,
+            engine: str = VECTORIZED_ENGINE) -> None:
+        """Store a batch of runs
+
+        Args:
+            run_hashes (Sequence[str]): Hash of each run
+            params (Sequence[ConsensusPledgeParams]): Parameters of each run
+            timesteps (int): Number of timesteps of the runs
+            df (DataFrame): Results with a `run_hash` column
+            engine (str, optional): The simulation engine
+        """
+        path = Path('results') / f'{uuid.uuid4().hex}.parquet'
+        tmp_path = self.root / path.with_suffix('.tmp')
+        df.to_parquet(tmp_path, index=False)
+        tmp_path.replace(self.root / path)
+
+        columns = [parameter_columns(p) for p in params]
+        names = sorted({name for c in columns for name in c})
+        created = datetime.now().isoformat(timespec='seconds')
+        with self.connection:
+            self._add_parameter_columns(names)
+            query = (f"INSERT OR REPLACE INTO runs "
+                     f"({', '.join(_quote(c) for c in (*RUN_COLUMNS, *names))}) "
+                     f"VALUES ({', '.join('?' * (len(RUN_COLUMNS) + len(names)))})")
+            self.connection.executemany(query, [
+                (h, engine, timesteps, created, str(path),
+                 json.dumps(_canonical(p)), *(c.get(name) for name in names))
+                for h, p, c in zip(run_hashes, params, columns)])
+
+    def find(self, where: Optional[str] = None, *args, **ranges):
+        """Runs whose parameters lie in the given ranges
+
+        Ranges are inclusive `(low, high)` pairs, either end may be None.
+        Phase parameter names go through dict unpacking, e.g.
+        `registry.find(target_locked_supply=(0.2, 0.3),
+        **{'phase_2.new_sector_quality_factor': (4, None)})`.
+
+        Args:
+            where (str, optional): Extra SQL condition on the `runs` table
+            *args: Values bound to the placeholders of `where`
+            **ranges: Range by parameter name, see `parameter_columns`
+
+        Raises:
+            ValueError: If a range or `where` refers to a column which no
+                stored run has, or `where` isn't a valid condition
+
+        Returns:
+            DataFrame: One row per run with its hash and parameter columns
+        """
+        import pandas as pd
+
+        referenced = set(ranges) | (set() if where is None else _quoted_names(where))
+        unknown = sorted(referenced - {*RUN_COLUMNS, *self.parameters})
+        if unknown:
+            raise ValueError(f"No stored run has the parameters {unknown}")
+        conditions, values = [], []
+        for name, (low, high) in ranges.items():
+            if low is not None:
+                conditions.append(f"{_quote(name)} >= ?")
+                values.append(low)
+            if high is not None:
+                conditions.append(f"{_quote(name)} <= ?")
+                values.append(high)
+        if where is not None:
+            conditions.append(f"({where})")
+            values.extend(args)
+        query = "SELECT * FROM runs"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        try:
+            return pd.read_sql_query(query, self.connection, params=values)
+        except pd.errors.DatabaseError as error:
+            raise ValueError(f"Invalid condition {where!r}: {error.__cause__ or error}") from error
+
+    def load(self, run_hashes: Sequence[str]):
+        """Trajectories of the given runs, with a `run_hash` column"""
+        import pandas as pd
+
+        run_hashes = list(run_hashes)
+        paths: dict[str, list[str]] = {}
+        for i in range(0, len(run_hashes), 500):
+            chunk = run_hashes[i:i + 500]
+            query = f"SELECT run_hash, path FROM runs WHERE run_hash IN ({','.join('?' * len(chunk))})"
+            for h, path in self.connection.execute(query, chunk):
+                paths.setdefault(path, []).append(h)
+        missing = set(run_hashes) - {h for hs in paths.values() for h in hs}
+        if missing:
+            raise KeyError(f"Runs not in the registry: {sorted(missing)}")
+        return pd.concat([pd.read_parquet(self.root / path, filters=[('run_hash', 'in', hs)])
+                          for path, hs in paths.items()],
+                         ignore_index=True)
+
+    def run_batch(self,
+                  initial_state: ConsensusPledgeDemoState,
+                  params: Sequence[ConsensusPledgeParams],
+                  timesteps: int,
+                  batch_size: int = 1024) -> list[str]:
+        """Run the parameter sets which aren't stored yet with `VectorizedModel`
+
+        Args:
+            initial_state (ConsensusPledgeDemoState): Initial state
+            params (Sequence[ConsensusPledgeParams]): Parameter sets to run
+            timesteps (int): Number of timesteps
+            batch_size (int, optional): Runs per vectorized batch
+
+        Returns:
+            list[str]: The run hash of each parameter set, in order
+        """
+        state_hash = canonical_hash(initial_state)
+        run_hashes = [run_hash(state_hash, p, timesteps) for p in params]
+        existing = self.existing(run_hashes)
+        missing = {}
+        for h, p in zip(run_hashes, params):
+            if h not in existing:
+                missing.setdefault(h, p)
+
+        pending = list(missing.items())
+        for i in range(0, len(pending), batch_size):
+            hashes, batch = zip(*pending[i:i + batch_size])
+            df = VectorizedModel(initial_state, batch).run(timesteps).to_dataframe()
+            df.insert(0, 'run_hash', np.asarray(hashes)[df['subset'].to_numpy()])
+            self.put(hashes, batch, timesteps, df.drop(columns='subset'))
+        return run_hashes
@@ -0,0 +1,184 @@
+"""Vectorized runs in the schema of the calculator's results.
+
+The calculator post-processes its cadCAD runs with `post_process_results` in
+`app/simulation.py`. `results_frame` derives the same columns from metric
+trajectories of the vectorized engine, so that previews and emulators can
+stand in for the exact runs. Both derive their columns with `derive_results`.
+"""
+import operator
+from collections import namedtuple
+from typing import Optional, Sequence
+
+import numpy as np
+
+from consensus_pledge_model.params import YEAR
+from consensus_pledge_model.types import ConsensusPledgeParams
+
+# Metrics the results are derived from
+RESULT_METRICS = ('power_qa',
+                  'power_rb',
+                  'baseline',
+                  'cumm_capped_power',
+                  'effective_network_time',
+                  'storage_pledge_per_new_qa_power',
+                  'consensus_pledge_per_new_qa_power',
+                  'simple_reward',
+                  'baseline_reward',
+                  'minted',
+                  'vested',
+                  'burnt',
+                  'collateral',
+                  'locked_rewards')
+
+# Parameters which cadCAD repeats on every row and which are kept
+PARAM_COLUMNS = ('timestep_in_days',
+                 'target_locked_supply',
+                 'storage_pledge_factor',
+                 'baseline_activated',
+                 'linear_duration',
+                 'immediate_release_fraction')
+
+# Share of the network power an attacker needs
+ATTACK_POWER_SHARE = 0.33
+
+# Operations the derived columns are computed with
+Arithmetic = namedtuple('Arithmetic', ['add', 'multiply', 'divide'])
+# Operations of arrays and Series
+OPERATORS = Arithmetic(operator.add, operator.mul, operator.truediv)
+
+# Values of each row which the derived columns are computed from: the
+# scalar ones of a cadCAD run, and the fields of its `reward` and
+# `token_distribution`
+SOURCE_COLUMNS = ('power_qa',
+                  'power_rb',
+                  'storage_pledge_per_new_qa_power',
+                  'consensus_pledge_per_new_qa_power',
+                  'days_passed',
+                  'simple_reward',
+                  'baseline_reward',
+                  'locked',
+                  'collateral',
+                  'locked_rewards',
+                  'circulating',
+                  'available',
+                  'vested',
+                  'minted')
+
+
+def derive_results(sources: dict,
+                   timestep_in_days,
+                   days_per_year: float,
+                   ops: Arithmetic = OPERATORS) -> dict:
+    """The columns the calculator derives from its runs, in its order
+
+    This is the only definition of the derived columns. `post_process_results`
+    and `result_expressions` in `app/simulation.py` compute them on pandas and
+    Arrow, and `derived_columns` on vectorized runs, all with the same
+    operations in the same order so that their floats are identical.
+
+    Args:
+        sources (dict): Each of `SOURCE_COLUMNS`
+        timestep_in_days: Timestep length, of all rows or of each
+        days_per_year (float): Length of a year in days
+        ops (Arithmetic, optional): Operations on the columns. Defaults to
+            `OPERATORS`.
+
+    Returns:
+        dict: The derived columns
+    """
+    add, mul, div = ops
+    s = sources
+    c = {}
+    c['initial_pledge_per_new_qa_power'] = add(s['storage_pledge_per_new_qa_power'],
+                                               s['consensus_pledge_per_new_qa_power'])
+    c['storage_pledge_per_new_rb_power'] = div(
+        mul(s['storage_pledge_per_new_qa_power'], s['power_qa']), s['power_rb'])
+    c['consensus_pledge_per_new_rb_power'] = div(
+        mul(s['consensus_pledge_per_new_qa_power'], s['power_qa']), s['power_rb'])
+    c['initial_pledge_per_new_rb_power'] = div(
+        mul(c['initial_pledge_per_new_qa_power'], s['power_qa']), s['power_rb'])
+    c['daily_simple_reward'] = div(s['simple_reward'], timestep_in_days)
+    c['daily_baseline_reward'] = div(s['baseline_reward'], timestep_in_days)
+    c['fil_locked'] = s['locked']
+    c['fil_collateral'] = s['collateral']
+    c['fil_locked_reward'] = s['locked_rewards']
+    c['fil_circulating'] = s['circulating']
+    c['fil_available'] = s['available']
+    c['fil_vested'] = s['vested']
+    c['fil_minted'] = s['minted']
+    c['years_passed'] = div(s['days_passed'], days_per_year)
+    c['critical_cost'] = mul(mul(s['power_qa'], ATTACK_POWER_SHARE),
+                             c['initial_pledge_per_new_qa_power'])
+    c['circulating_surplus'] = div(c['fil_circulating'], c['critical_cost'])
+    c['circulating_supply'] = div(c['fil_circulating'], c['fil_available'])
+    c['locked_supply'] = div(c['fil_locked'], c['fil_available'])
+    c['daily_reward'] = add(c['daily_simple_reward'], c['daily_baseline_reward'])
+    c['daily_reward_per_rbp'] = div(c['daily_reward'], s['power_rb'])
+    c['daily_reward_per_qap'] = div(c['daily_reward'], s['power_qa'])
+    return c
+
+
+def derived_columns(metrics: dict[str, np.ndarray],
+                    timestep_in_days: np.ndarray,
+                    days_passed: np.ndarray) -> dict[str, np.ndarray]:
+    """The columns `post_process_results` adds, in its order
+
+    Args:
+        metrics (dict[str, np.ndarray]): `RESULT_METRICS` of each row
+        timestep_in_days (np.ndarray): Timestep length of each row
+        days_passed (np.ndarray): Day of each row
+
+    Returns:
+        dict[str, np.ndarray]: The derived columns
+    """
+    m = metrics
+    # As the properties of `TokenDistribution`
+    locked = m['locked_rewards'] + m['collateral']
+    available = m['minted'] + m['vested'] - m['burnt']
+    sources = {**{name: m[name] for name in SOURCE_COLUMNS if name in m},
+               'days_passed': days_passed,
+               'locked': locked,
+               'available': available,
+               'circulating': available - locked}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return derive_results(sources, timestep_in_days, YEAR)
+
+
+def results_frame(arrays: dict[str, np.ndarray],
+                  days_passed: np.ndarray,
+                  params: Sequence[ConsensusPledgeParams],
+                  scenarios: Optional[Sequence[str]] = None):
+    """Long-format results with the columns of `post_process_results`
+
+    Args:
+        arrays (dict[str, np.ndarray]): `RESULT_METRICS` with shape
+            (timesteps + 1, batch), eg. from `TrajectoryRecorder.arrays`
+        days_passed (np.ndarray): Day of each timestep
+        params (Sequence[ConsensusPledgeParams]): Parameters of each member
+        scenarios (Sequence[str], optional): Scenario name of each member.
+            Defaults to no `scenario` column.
+
+    Returns:
+        DataFrame: One row per timestep and member, with the member as `subset`
+    """
+    import pandas as pd
+
+    n_timesteps, batch_size = arrays['power_qa'].shape
+    timestep = np.repeat(np.arange(n_timesteps), batch_size)
+    subset = np.tile(np.arange(batch_size), n_timesteps)
+    days = np.repeat(np.asarray(days_passed), batch_size)
+    member_params = {name: np.array([p[name] for p in params])[subset] for name in PARAM_COLUMNS}
+    metrics = {name: arrays[name].ravel() for name in RESULT_METRICS}
+
+    columns = {'days_passed': days,
+               'delta_days': member_params['timestep_in_days'],
+               **{name: metrics[name] for name in RESULT_METRICS[:7]},
+               'simulation': np.zeros_like(subset),
+               'subset': subset,
+               'run': np.ones_like(subset),
+               'timestep': timestep,
+               **member_params}
+    if scenarios is not None:
+        columns['scenario'] = np.asarray(scenarios, dtype=object)[subset]
+    columns.update(derived_columns(metrics, member_params['timestep_in_days'], days))
+    return pd.DataFrame(columns)
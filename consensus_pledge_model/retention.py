@@ -0,0 +1,96 @@
+"""Retention policies for the records of cadCAD runs.
+
+cadCAD returns every substep of every timestep with every state variable.
+`easy_run` turns all of them into a DataFrame before dropping the
+intermediate substeps, and assigns every parameter to every row. `run_retained`
+applies a `RetentionPolicy` to the raw records instead, so that the rows and
+columns it discards never reach a DataFrame.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+from consensus_pledge_model.types import ConsensusPledgeDemoState, ConsensusPledgeSweepParams
+
+
+@dataclass(frozen=True)
+class RetentionPolicy():
+    # Keep every `every`th timestep, counting from `start`
+    every: int = 1
+    # First timestep kept, eg. 2 to skip the initial state and the first step
+    start: int = 0
+    # Keep only the last substep of each timestep, as `easy_run` does
+    last_substep_only: bool = True
+    # State variables and parameters kept as columns. Defaults to all of them.
+    variables: Optional[tuple[str, ...]] = None
+
+    def __post_init__(self):
+        if self.every < 1 or self.start < 0:
+            raise ValueError("every must be positive and start non-negative")
+
+    def keeps(self, timestep: int) -> bool:
+        """Whether the records of `timestep` are kept"""
+        return timestep >= self.start and (timestep - self.start) % self.every == 0
+
+
+def run_retained(initial_state: ConsensusPledgeDemoState,
+                 params: ConsensusPledgeSweepParams,
+                 psubs: list[dict],
+                 timesteps: int,
+                 samples: int = 1,
+                 retention: RetentionPolicy = RetentionPolicy()):
+    """Run a cadCAD simulation like `easy_run`, keeping what `retention`
+    retains only
+
+    With the default policy the result equals `easy_run`'s, down to the index,
+    which is the position of each record in cadCAD's output.
+
+    Args:
+        initial_state (ConsensusPledgeDemoState): Initial state
+        params (ConsensusPledgeSweepParams): Swept parameters, as for `easy_run`
+        psubs (list[dict]): Partial state update blocks
+        timesteps (int): Number of timesteps
+        samples (int, optional): Monte Carlo runs per parameter set. Defaults to 1.
+        retention (RetentionPolicy, optional): Rows and columns to keep.
+            Defaults to the last substep of every timestep and every column.
+
+    Returns:
+        DataFrame: One row per kept record, with the state variables, the
+            `simulation`, `subset`, `run` and `timestep` (and `substep` unless
+            `last_substep_only`) and the parameters as columns
+    """
+    import pandas as pd
+    from cadCAD.configuration import Experiment
+    from cadCAD.configuration.utils import config_sim
+    from cadCAD.engine import ExecutionContext, ExecutionMode, Executor
+
+    experiment = Experiment()
+    experiment.append_configs(sim_configs=config_sim({'N': samples,
+                                                      'T': range(timesteps),
+                                                      'M': params}),
+                              initial_state=initial_state,
+                              partial_state_update_blocks=psubs)
+    executor = Executor(exec_context=ExecutionContext(ExecutionMode().local_mode),
+                        configs=experiment.configs)
+    records, _, _ = executor.execute()
+
+    last_substep = len(psubs)
+    index = [i for i, record in enumerate(records)
+             if retention.keeps(record['timestep'])
+             and (not retention.last_substep_only
+                  or record['substep'] == (0 if record['timestep'] == 0 else last_substep))]
+
+    # Parameters of each (simulation, subset), as cadCAD numbers them
+    subset_params = {(config.simulation_id, config.subset_id): config.sim_config['M']
+                     for config in experiment.configs}
+    bookkeeping = ('simulation', 'subset', 'run', 'timestep')
+    wanted = retention.variables
+    columns = [name for name in records[0]
+               if (wanted is None or name in wanted or name in bookkeeping)
+               and not (name == 'substep' and retention.last_substep_only)]
+    param_names = [name for name in params if wanted is None or name in wanted]
+
+    data = {name: [records[i][name] for i in index] for name in columns}
+    keys = [(records[i]['simulation'], records[i]['subset']) for i in index]
+    for name in param_names:
+        data[name] = [subset_params[key][name] for key in keys]
+    return pd.DataFrame(data, index=index)
@@ -0,0 +1,215 @@
+"""Dependency-aware scheduling of partial state update blocks.
+
+Policies and state update functions declare the state variables they read
+with `reads`, and write the variables their block assigns them to. From
+these, `schedule` orders the updates by their dependencies: each one moves
+to the earliest level after the updates whose outputs it reads, and the
+levels of declared updates are fused into one cadCAD substep which runs
+them in order. Within the substep, an update whose inputs are the same as
+on its last evaluation returns its last result instead of running again.
+Since the fused blocks keep these evaluations, each run schedules its own.
+
+Each timestep then records one substep instead of one per block, and its
+last state is that of the original blocks.
+"""
+from dataclasses import dataclass, field
+from functools import reduce
+from typing import Callable, Optional
+
+# Signal of a fused block, carrying the variables its levels updated
+FUSED_SIGNAL = 'fused_updates'
+
+
+def reads(*variables: str, history: bool = False) -> Callable:
+    """Declare the state variables a policy or state update function reads
+
+    The function itself is returned, as cadCAD inspects its arguments.
+
+    Args:
+        *variables (str): State variables read from `state`
+        history (bool, optional): Whether it also reads the last state of the
+            previous timestep, as `history[-1][-1]`. Defaults to False.
+    """
+    def declare(f: Callable) -> Callable:
+        f.reads = frozenset(variables)
+        f.reads_history = history
+        return f
+    return declare
+
+
+def declared(f: Callable) -> bool:
+    return hasattr(f, 'reads')
+
+
+@dataclass
+class Update():
+    """Policies and state update functions which run together, as a block
+    with policies does or as one state update function of a block without
+    """
+    label: str
+    policies: dict[str, Callable]
+    variables: dict[str, Callable]
+    # State variables read, or None if any function is undeclared
+    inputs: Optional[frozenset[str]] = field(init=False)
+
+    def __post_init__(self):
+        functions = [*self.policies.values(), *self.variables.values()]
+        if all(declared(f) for f in functions):
+            self.inputs = frozenset().union(*(f.reads for f in functions))
+        else:
+            self.inputs = None
+
+    @property
+    def outputs(self) -> frozenset[str]:
+        return frozenset(self.variables)
+
+
+def split_blocks(blocks: list[dict]) -> list[Update]:
+    """Updates of `blocks`, in order. Blocks without policies are split into
+    one update per state update function.
+    """
+    updates = []
+    for block in blocks:
+        label = block.get('label', '')
+        if block['policies']:
+            updates.append(Update(label, dict(block['policies']), dict(block['variables'])))
+        else:
+            updates.extend(Update(label, {}, {variable: suf})
+                           for variable, suf in block['variables'].items())
+    return updates
+
+
+def dependency_levels(updates: list[Update], variables: frozenset[str]) -> list[list[Update]]:
+    """Group updates into levels, each reading the state left by the previous
+    ones, with the same final state as running them one after another
+
+    An update comes after the updates writing what it reads or writes, and
+    no earlier than those reading what it writes. Undeclared updates read
+    every variable in `variables`.
+    """
+    levels: list[int] = []
+    for j, update in enumerate(updates):
+        inputs = variables if update.inputs is None else update.inputs
+        level = 0
+        for i in range(j):
+            earlier = updates[i]
+            earlier_inputs = variables if earlier.inputs is None else earlier.inputs
+            if earlier.outputs & (inputs | update.outputs):
+                level = max(level, levels[i] + 1)
+            elif earlier_inputs & update.outputs:
+                level = max(level, levels[i])
+        levels.append(level)
+    return [[update for update, level in zip(updates, levels) if level == n]
+            for n in range(max(levels, default=-1) + 1)]
+
+
+def _same(a: object, b: object) -> bool:
+    return a is b or (type(a) is type(b) and isinstance(a, (int, float, str)) and a == b)
+
+
+class FusedLevels():
+    """Policy running levels of updates on a copy of the state
+
+    Args:
+        levels (list[list[Update]]): Levels of declared updates
+    """
+
+    def __init__(self, levels: list[list[Update]]):
+        self.levels = levels
+        # Inputs and result of the last evaluation of each function
+        self.memo: dict[Callable, tuple[list, object]] = {}
+        # Number of evaluations run and skipped
+        self.evaluations = 0
+        self.skipped = 0
+
+    def _evaluate(self, f: Callable, args: tuple, signal: Optional[dict] = None) -> object:
+        params, _, history, state = args[:4]
+        inputs = [params, *(state[name] for name in sorted(f.reads))]
+        if f.reads_history:
+            inputs.append(history[-1][-1])
+        if signal is not None:
+            inputs.extend(item for pair in sorted(signal.items()) for item in pair)
+        last = self.memo.get(f)
+        if (last is not None and len(last[0]) == len(inputs)
+                and all(_same(a, b) for a, b in zip(last[0], inputs))):
+            self.skipped += 1
+            return last[1]
+        self.evaluations += 1
+        result = f(*args)
+        self.memo[f] = (inputs, result)
+        return result
+
+    def policy(self, params, substep, history, state) -> dict:
+        state = dict(state)
+        for level in self.levels:
+            updated = {}
+            for update in level:
+                signals = [self._evaluate(policy, (params, substep, history, state))
+                           for policy in update.policies.values()]
+                signal = {}
+                for label in {label for s in signals for label in s}:
+                    signal[label] = reduce(lambda a, b: a + b,
+                                           [s[label] for s in signals if label in s])
+                for variable, suf in update.variables.items():
+                    _, updated[variable] = self._evaluate(
+                        suf, (params, substep, history, state, signal), signal)
+            state.update(updated)
+        return {FUSED_SIGNAL: {variable: state[variable]
+                               for level in self.levels for update in level
+                               for variable in update.variables}}
+
+
+def _fused_suf(variable: str) -> Callable:
+    return lambda _1, _2, _3, _4, signal: (variable, signal[FUSED_SIGNAL][variable])
+
+
+def fuse(levels: list[list[Update]]) -> dict:
+    """One block running `levels` of declared updates in order"""
+    fused = FusedLevels(levels)
+    variables = dict.fromkeys(variable for level in levels for update in level
+                              for variable in update.variables)
+    return {
+        'label': ' / '.join(dict.fromkeys(update.label for level in levels for update in level)),
+        'desc': 'Fused levels of dependent updates',
+        'policies': {'fused': fused.policy},
+        'variables': {variable: _fused_suf(variable) for variable in variables},
+    }
+
+
+def schedule(blocks: list[dict], variables: Optional[frozenset[str]] = None) -> list[dict]:
+    """Blocks with the final state of `blocks` on every timestep, running
+    their updates by dependency level and fused into as few blocks as possible
+
+    Consecutive levels of declared updates fuse into one block. Updates with
+    undeclared functions can't be moved or fused, so they run as blocks of
+    their own and split the fused levels around them.
+
+    Args:
+        blocks (list[dict]): Partial state update blocks
+        variables (frozenset[str], optional): State variables, which undeclared
+            updates are assumed to read. Defaults to those the blocks write.
+
+    Returns:
+        list[dict]: The scheduled blocks
+    """
+    updates = split_blocks(blocks)
+    if variables is None:
+        variables = frozenset().union(*(update.outputs for update in updates))
+    scheduled, pending = [], []
+    for level in dependency_levels(updates, variables):
+        undeclared = [update for update in level if update.inputs is None]
+        if undeclared:
+            # Its declared updates neither read nor overwrite what the
+            # undeclared ones write, so they may run after them
+            if pending:
+                scheduled.append(fuse(pending))
+                pending = []
+            scheduled.extend({'label': update.label,
+                              'policies': update.policies,
+                              'variables': update.variables} for update in undeclared)
+        declared_updates = [update for update in level if update.inputs is not None]
+        if declared_updates:
+            pending.append(declared_updates)
+    if pending:
+        scheduled.append(fuse(pending))
+    return scheduled
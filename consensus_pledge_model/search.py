@@ -0,0 +1,153 @@
+"""Search for the parameter value at which a KPI constraint starts to hold.
+
+Instead of sweeping a grid, each round runs a handful of points inside the
+current bracket as one vectorized batch and keeps the sub-interval where the
+constraint flips, assuming it holds on one side of a single threshold value.
+Runs leave the batch on the first timestep violating the constraint.
+"""
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+from consensus_pledge_model.guards import NaNGuard, ThresholdGuard
+from consensus_pledge_model.sensitivity import with_parameter
+from consensus_pledge_model.types import ConsensusPledgeDemoState, ConsensusPledgeParams
+from consensus_pledge_model.vectorized import VectorizedModel
+
+
+@dataclass
+class Evaluation():
+    value: float
+    feasible: bool
+    # First timestep violating the constraint
+    violated_at: Optional[int]
+
+
+@dataclass
+class SearchResult():
+    parameter: str
+    # The feasible value closest to the threshold
+    value: float
+    # Final bracket around the threshold, as (feasible, infeasible) ends
+    bracket: tuple[float, float]
+    # Number of simulations and of simulated timesteps, over all batch members
+    simulations: int
+    timesteps_simulated: int
+    evaluations: list[Evaluation] = field(default_factory=list)
+
+
+def evaluate_constraint(initial_state: ConsensusPledgeDemoState,
+                        params: list[ConsensusPledgeParams],
+                        timesteps: int,
+                        kpi: str,
+                        threshold: float,
+                        below: bool = True) -> tuple[np.ndarray, int]:
+    """Run a batch until each member violates the constraint or the horizon ends
+
+    The constraint is checked on every timestep after the initial state. NaN
+    values violate it.
+
+    Args:
+        initial_state (ConsensusPledgeDemoState): Initial state
+        params (list[ConsensusPledgeParams]): Batch members
+        timesteps (int): Number of timesteps
+        kpi (str): Metric of `VectorizedState` to check
+        threshold (float): Bound on the metric
+        below (bool, optional): Whether the metric must stay at or below the
+            threshold, rather than at or above it. Defaults to True.
+
+    Returns:
+        tuple[np.ndarray, int]: First violating timestep of each member, -1
+            if none, and the number of simulated timesteps over all members
+    """
+    guards = [NaNGuard(),
+              ThresholdGuard(kpi, high=threshold) if below else ThresholdGuard(kpi, low=threshold)]
+    model = VectorizedModel(initial_state, params)
+    timesteps_simulated = 0
+    for _ in range(timesteps):
+        model.step()
+        timesteps_simulated += model.batch_size
+        tripped = model.check_guards(guards)
+        if tripped.all():
+            break
+        if tripped.any():
+            model.take(np.flatnonzero(~tripped))
+    violated_at = np.full(len(params), -1)
+    for member, halt in model.halted.items():
+        violated_at[member] = halt.timestep
+    return violated_at, timesteps_simulated
+
+
+def search_parameter(initial_state: ConsensusPledgeDemoState,
+                     params: ConsensusPledgeParams,
+                     timesteps: int,
+                     kpi: str,
+                     threshold: float,
+                     below: bool = True,
+                     parameter: str = 'target_locked_supply',
+                     bounds: tuple[float, float] = (0.0, 1.0),
+                     tolerance: float = 1e-4,
+                     points_per_round: int = 8) -> SearchResult:
+    """Find where a KPI constraint starts to hold over the whole horizon
+
+    Eg. the smallest `target_locked_supply` which keeps `circulating_surplus`
+    at or below `threshold` on every timestep.
+
+    Args:
+        initial_state (ConsensusPledgeDemoState): Initial state
+        params (ConsensusPledgeParams): Parameters the searched one replaces
+        timesteps (int): Number of timesteps
+        kpi (str): Metric of `VectorizedState` to constrain
+        threshold (float): Bound on the metric
+        below (bool, optional): Whether the metric must stay at or below the
+            threshold, rather than at or above it. Defaults to True.
+        parameter (str, optional): Name of the searched parameter, see
+            `scalar_parameters`. Defaults to 'target_locked_supply'.
+        bounds (tuple[float, float], optional): Search range. Defaults to (0, 1).
+        tolerance (float, optional): Width of the final bracket
+        points_per_round (int, optional): Points run as one batch per round
+
+    Raises:
+        ValueError: If the constraint holds at both or neither bound
+
+    Returns:
+        SearchResult: The threshold value and the search trace
+    """
+    evaluations: list[Evaluation] = []
+    timesteps_simulated = 0
+
+    def evaluate(values: np.ndarray) -> np.ndarray:
+        nonlocal timesteps_simulated
+        batch = [with_parameter(params, parameter, value) for value in values]
+        violated_at, simulated = evaluate_constraint(initial_state, batch, timesteps,
+                                                     kpi, threshold, below)
+        timesteps_simulated += simulated
+        evaluations.extend(Evaluation(float(v), bool(t < 0), None if t < 0 else int(t))
+                           for v, t in zip(values, violated_at))
+        return violated_at < 0
+
+    low, high = bounds
+    feasible_low, feasible_high = evaluate(np.array([low, high]))
+    if feasible_low == feasible_high:
+        state = 'holds' if feasible_low else 'is violated'
+        raise ValueError(f"The constraint {state} at both ends of {bounds}")
+    # Keep the bracket as (feasible end, infeasible end)
+    feasible, infeasible = (low, high) if feasible_low else (high, low)
+
+    while abs(infeasible - feasible) > tolerance:
+        values = np.linspace(feasible, infeasible, points_per_round + 2)[1:-1]
+        ok = evaluate(values)
+        # Last feasible point before the first infeasible one
+        first_infeasible = np.argmin(ok) if not ok.all() else len(values)
+        if first_infeasible > 0:
+            feasible = values[first_infeasible - 1]
+        if first_infeasible < len(values):
+            infeasible = values[first_infeasible]
+
+    return SearchResult(parameter=parameter,
+                        value=float(feasible),
+                        bracket=(float(feasible), float(infeasible)),
+                        simulations=len(evaluations),
+                        timesteps_simulated=timesteps_simulated,
+                        evaluations=evaluations)
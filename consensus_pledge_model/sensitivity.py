@@ -0,0 +1,188 @@
+"""Local sensitivity of the key KPIs to every continuous scalar parameter.
+
+The central run and one perturbed run per parameter advance together as a
+single `VectorizedModel` batch, so a full sensitivity table costs about one
+batched run.
+"""
+from dataclasses import dataclass, fields, replace
+from typing import Sequence
+
+import numpy as np
+
+from consensus_pledge_model.types import BehaviouralParams, ConsensusPledgeDemoState
+from consensus_pledge_model.types import ConsensusPledgeParams
+from consensus_pledge_model.vectorized import VectorizedModel
+
+SENSITIVITY_KPIS = ('critical_cost', 'circulating_surplus')
+
+# Scalar params which can't differ across a batch
+FIXED_PARAMS = {'timestep_in_days'}
+# Params the model only uses in whole days or timesteps, whose finite
+# differences are either zero or a jump to the next day or timestep
+DISCRETE_PARAMS = {'linear_duration', 'new_sector_lifetime', 'renewal_lifetime'}
+# Params the mechanism never reads
+UNUSED_PARAMS = {'storage_pledge_factor'}
+
+
+def _is_scalar(value: object) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def scalar_parameters(params: ConsensusPledgeParams) -> dict[str, float]:
+    """All scalar parameters by name, including each phase's behavioural params
+
+    Behavioural params are named `behavioural_params[<phase end>].<field>`.
+
+    Args:
+        params (ConsensusPledgeParams): System parameters
+
+    Returns:
+        dict[str, float]: Parameter values by name
+    """
+    values = {k: float(v) for k, v in params.items()
+              if _is_scalar(v) and k not in FIXED_PARAMS}
+    for phase_end, behaviour in params['behavioural_params'].items():
+        for f in fields(BehaviouralParams):
+            value = getattr(behaviour, f.name)
+            if _is_scalar(value):
+                values[f'behavioural_params[{phase_end}].{f.name}'] = float(value)
+    return values
+
+
+def differentiable_parameters(params: ConsensusPledgeParams) -> dict[str, float]:
+    """The `scalar_parameters` which the KPIs depend on continuously
+
+    Args:
+        params (ConsensusPledgeParams): System parameters
+
+    Returns:
+        dict[str, float]: Parameter values by name
+    """
+    return {name: value for name, value in scalar_parameters(params).items()
+            if name.rsplit('.', 1)[-1] not in DISCRETE_PARAMS | UNUSED_PARAMS}
+
+
+def with_parameter(params: ConsensusPledgeParams,
+                   name: str,
+                   value: float) -> ConsensusPledgeParams:
+    """Copy of `params` with the parameter `name` set to `value`
+
+    Args:
+        params (ConsensusPledgeParams): System parameters
+        name (str): A name as returned by `scalar_parameters`
+        value (float): The new value
+
+    Returns:
+        ConsensusPledgeParams: The updated copy
+    """
+    params = ConsensusPledgeParams(**params)
+    if name.startswith('behavioural_params['):
+        phase, field_name = name[len('behavioural_params['):].split('].')
+        behavioural_params = dict(params['behavioural_params'])
+        phase_end = next(k for k in behavioural_params if str(k) == phase)
+        behavioural_params[phase_end] = replace(behavioural_params[phase_end],
+                                                **{field_name: value})
+        params['behavioural_params'] = behavioural_params
+    else:
+        params[name] = value
+    return params
+
+
+def with_parameters(params: ConsensusPledgeParams,
+                    values: dict[str, float]) -> ConsensusPledgeParams:
+    """Copy of `params` with several parameters set, see `with_parameter`"""
+    for name, value in values.items():
+        params = with_parameter(params, name, value)
+    return params
+
+
+@dataclass
+class LocalSensitivity():
+    # Names of the perturbed parameters
+    parameters: list[str]
+    # Central parameter values, shape (parameters,)
+    values: np.ndarray
+    kpis: tuple[str, ...]
+    timesteps: np.ndarray
+    days_passed: np.ndarray
+    # KPIs of the central run, shape (timesteps, kpis)
+    central: np.ndarray
+    # Derivative of each KPI against each parameter, shape (timesteps, kpis, parameters)
+    jacobian: np.ndarray
+
+    @property
+    def elasticities(self) -> np.ndarray:
+        """Relative sensitivities, d(log KPI) / d(log parameter)"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.jacobian * self.values / self.central[:, :, None]
+
+    def to_dataframe(self):
+        """Long-format table, one row per timestep, KPI and parameter"""
+        import pandas as pd
+
+        n_timesteps, n_kpis, n_parameters = self.jacobian.shape
+        return pd.DataFrame({
+            'timestep': np.repeat(self.timesteps, n_kpis * n_parameters),
+            'days_passed': np.repeat(self.days_passed, n_kpis * n_parameters),
+            'kpi': np.tile(np.repeat(self.kpis, n_parameters), n_timesteps),
+            'parameter': np.tile(self.parameters, n_timesteps * n_kpis),
+            'value': np.tile(self.values, n_timesteps * n_kpis),
+            'derivative': self.jacobian.ravel(),
+            'elasticity': self.elasticities.ravel()})
+
+
+def local_sensitivity(initial_state: ConsensusPledgeDemoState,
+                      params: ConsensusPledgeParams,
+                      timesteps: int,
+                      relative_step: float = 1e-4,
+                      central_differences: bool = False,
+                      kpis: Sequence[str] = SENSITIVITY_KPIS) -> LocalSensitivity:
+    """Jacobian of the KPIs against every `differentiable_parameters`, over time
+
+    Args:
+        initial_state (ConsensusPledgeDemoState): Initial state
+        params (ConsensusPledgeParams): Central parameters
+        timesteps (int): Number of timesteps
+        relative_step (float, optional): Perturbation relative to each
+            parameter's value (absolute for zero values). Defaults to 1e-4.
+        central_differences (bool, optional): Also run backward perturbations
+            for second-order accurate derivatives. Defaults to False.
+        kpis (Sequence[str], optional): Metrics to differentiate
+
+    Returns:
+        LocalSensitivity: The Jacobian and the central trajectory
+    """
+    central_values = differentiable_parameters(params)
+    names = list(central_values)
+    values = np.array([central_values[name] for name in names])
+    steps = relative_step * np.where(values != 0.0, np.abs(values), 1.0)
+
+    batch = [params]
+    batch += [with_parameter(params, name, value + step)
+              for name, value, step in zip(names, values, steps)]
+    if central_differences:
+        batch += [with_parameter(params, name, value - step)
+                  for name, value, step in zip(names, values, steps)]
+
+    recorder = VectorizedModel(initial_state, batch).run(timesteps)
+    arrays = recorder.arrays()
+    # shape (timesteps, kpis, batch)
+    outputs = np.stack([arrays[kpi] for kpi in kpis], axis=1)
+
+    n = len(names)
+    forward = outputs[:, :, 1:n + 1]
+    # The surplus is infinite before the first pledge is set, giving NaNs
+    with np.errstate(invalid='ignore'):
+        if central_differences:
+            backward = outputs[:, :, n + 1:]
+            jacobian = (forward - backward) / (2 * steps)
+        else:
+            jacobian = (forward - outputs[:, :, :1]) / steps
+
+    return LocalSensitivity(parameters=names,
+                            values=values,
+                            kpis=tuple(kpis),
+                            timesteps=np.array(recorder.timesteps),
+                            days_passed=np.array(recorder.days_passed),
+                            central=outputs[:, :, 0],
+                            jacobian=jacobian)
@@ -0,0 +1,215 @@
+"""Global variance-based (Sobol) sensitivity of the pledge KPIs.
+
+Follows Saltelli's scheme: two independent sample matrices A and B plus one
+matrix per parameter, A with that parameter's column taken from B, for
+N * (D + 2) model evaluations. Evaluations run through the vectorized model
+in batches, optionally spread over worker processes.
+"""
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+
+from consensus_pledge_model.sensitivity import scalar_parameters, with_parameters
+from consensus_pledge_model.types import ConsensusPledgeDemoState, ConsensusPledgeParams
+from consensus_pledge_model.vectorized import TrajectoryRecorder, VectorizedModel
+
+SOBOL_KPIS = ('critical_cost', 'locked')
+
+# Parameters analysed by default, plus each phase's behavioural params below.
+# `storage_pledge_factor` is left out as the mechanism doesn't read it.
+SOBOL_PARAMETERS = ('target_locked_supply',
+                    'immediate_release_fraction',
+                    'linear_duration')
+SOBOL_BEHAVIOURAL_PARAMETERS = ('new_sector_rb_onboarding_rate',
+                                'new_sector_quality_factor',
+                                'daily_renewal_probability')
+# Parameters which are fractions
+UNIT_INTERVAL_PARAMETERS = ('target_locked_supply',
+                            'immediate_release_fraction',
+                            'daily_renewal_probability')
+
+
+def default_bounds(params: ConsensusPledgeParams,
+                   spread: float = 0.5) -> dict[str, tuple[float, float]]:
+    """Uniform ranges of +/- `spread` around the central parameter values
+
+    Args:
+        params (ConsensusPledgeParams): Central parameters
+        spread (float, optional): Relative half-width. Defaults to 0.5.
+
+    Returns:
+        dict[str, tuple[float, float]]: Lower and upper bound by parameter name
+    """
+    bounds = {}
+    for name, value in scalar_parameters(params).items():
+        field_name = name.split('.')[-1]
+        if name not in SOBOL_PARAMETERS and field_name not in SOBOL_BEHAVIOURAL_PARAMETERS:
+            continue
+        low, high = value * (1 - spread), value * (1 + spread)
+        if field_name in UNIT_INTERVAL_PARAMETERS:
+            low, high = max(low, 0.0), min(high, 1.0)
+        bounds[name] = (low, high)
+    return bounds
+
+
+def saltelli_sample(bounds: dict[str, tuple[float, float]],
+                    samples: int,
+                    seed: Optional[int] = None) -> np.ndarray:
+    """Saltelli sample matrix, stacked as [A, B, AB_1, ..., AB_D]
+
+    Args:
+        bounds (dict[str, tuple[float, float]]): Uniform range by parameter
+        samples (int): Base sample size N
+        seed (int, optional): Seed of the random generator
+
+    Returns:
+        np.ndarray: Parameter values, shape (N * (D + 2), D)
+    """
+    low, high = np.array(list(bounds.values())).T
+    n_parameters = len(bounds)
+    base = np.random.default_rng(seed).random((samples, 2 * n_parameters))
+    a = low + (high - low) * base[:, :n_parameters]
+    b = low + (high - low) * base[:, n_parameters:]
+    ab = np.repeat(a[None], n_parameters, axis=0)
+    for i in range(n_parameters):
+        ab[i, :, i] = b[:, i]
+    return np.concatenate([a, b, ab.reshape(-1, n_parameters)])
+
+
+def sobol_indices(f_a: np.ndarray,
+                  f_b: np.ndarray,
+                  f_ab: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """First-order (Saltelli 2010) and total (Jansen) Sobol indices
+
+    Args:
+        f_a (np.ndarray): Outputs on A, shape (N, ...)
+        f_b (np.ndarray): Outputs on B, shape (N, ...)
+        f_ab (np.ndarray): Outputs on each AB_i, shape (D, N, ...)
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: First-order and total indices, shape (..., D)
+    """
+    variance = np.var(np.concatenate([f_a, f_b]), axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        first_order = np.mean(f_b * (f_ab - f_a), axis=1) / variance
+        total = 0.5 * np.mean((f_a - f_ab) ** 2, axis=1) / variance
+    return np.moveaxis(first_order, 0, -1), np.moveaxis(total, 0, -1)
+
+
+@dataclass
+class SobolIndices():
+    parameters: list[str]
+    bounds: dict[str, tuple[float, float]]
+    kpis: tuple[str, ...]
+    timesteps: np.ndarray
+    days_passed: np.ndarray
+    # Number of model evaluations
+    evaluations: int
+    # Indices and their 95% bootstrap half-widths, shape (timesteps, kpis, parameters)
+    first_order: np.ndarray
+    total: np.ndarray
+    first_order_conf: np.ndarray
+    total_conf: np.ndarray
+
+    def to_dataframe(self):
+        """Long-format table, one row per timestep, KPI and parameter"""
+        import pandas as pd
+
+        n_timesteps, n_kpis, n_parameters = self.first_order.shape
+        return pd.DataFrame({
+            'timestep': np.repeat(self.timesteps, n_kpis * n_parameters),
+            'days_passed': np.repeat(self.days_passed, n_kpis * n_parameters),
+            'kpi': np.tile(np.repeat(self.kpis, n_parameters), n_timesteps),
+            'parameter': np.tile(self.parameters, n_timesteps * n_kpis),
+            'S1': self.first_order.ravel(),
+            'S1_conf': self.first_order_conf.ravel(),
+            'ST': self.total.ravel(),
+            'ST_conf': self.total_conf.ravel()})
+
+
+def _evaluate(initial_state: ConsensusPledgeDemoState,
+              params: ConsensusPledgeParams,
+              names: Sequence[str],
+              rows: np.ndarray,
+              timesteps: int,
+              kpis: Sequence[str]) -> TrajectoryRecorder:
+    batch = [with_parameters(params, dict(zip(names, row))) for row in rows]
+    recorder = TrajectoryRecorder(kpis)
+    return VectorizedModel(initial_state, batch).run(timesteps, recorder)
+
+
+def sobol_analysis(initial_state: ConsensusPledgeDemoState,
+                   params: ConsensusPledgeParams,
+                   timesteps: int,
+                   samples: int = 1024,
+                   bounds: Optional[dict[str, tuple[float, float]]] = None,
+                   kpis: Sequence[str] = SOBOL_KPIS,
+                   seed: Optional[int] = None,
+                   batch_size: int = 1024,
+                   n_jobs: int = 1,
+                   num_resamples: int = 100) -> SobolIndices:
+    """First-order and total Sobol indices of the KPIs over time
+
+    Args:
+        initial_state (ConsensusPledgeDemoState): Initial state
+        params (ConsensusPledgeParams): Parameters the sampled ones replace
+        timesteps (int): Number of timesteps
+        samples (int, optional): Base sample size N. Defaults to 1024.
+        bounds (dict[str, tuple[float, float]], optional): Uniform range by
+            parameter name. Defaults to `default_bounds(params)`.
+        kpis (Sequence[str], optional): Metrics to analyse
+        seed (int, optional): Seed for the samples and the bootstrap
+        batch_size (int, optional): Evaluations per vectorized batch
+        n_jobs (int, optional): Worker processes running batches. Defaults to 1.
+        num_resamples (int, optional): Bootstrap resamples for the
+            confidence half-widths, 0 to skip them. Defaults to 100.
+
+    Returns:
+        SobolIndices: The indices
+    """
+    bounds = default_bounds(params) if bounds is None else bounds
+    names = list(bounds)
+    rows = saltelli_sample(bounds, samples, seed)
+    chunks = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+
+    if n_jobs == 1:
+        recorders = [_evaluate(initial_state, params, names, chunk, timesteps, kpis)
+                     for chunk in chunks]
+    else:
+        from joblib import Parallel, delayed
+        recorders = Parallel(n_jobs=n_jobs)(
+            delayed(_evaluate)(initial_state, params, names, chunk, timesteps, kpis)
+            for chunk in chunks)
+
+    # shape (evaluations, timesteps, kpis)
+    outputs = np.concatenate([
+        np.stack([recorder.arrays()[kpi] for kpi in kpis], axis=-1).swapaxes(0, 1)
+        for recorder in recorders])
+    f_a, f_b = outputs[:samples], outputs[samples:2 * samples]
+    f_ab = outputs[2 * samples:].reshape(len(names), samples, *outputs.shape[1:])
+    first_order, total = sobol_indices(f_a, f_b, f_ab)
+
+    first_order_conf = np.full_like(first_order, np.nan)
+    total_conf = np.full_like(total, np.nan)
+    if num_resamples > 0:
+        rng = np.random.default_rng(seed)
+        resampled_first_order = np.empty((num_resamples, *first_order.shape))
+        resampled_total = np.empty((num_resamples, *total.shape))
+        for i in range(num_resamples):
+            r = rng.integers(samples, size=samples)
+            resampled_first_order[i], resampled_total[i] = sobol_indices(
+                f_a[r], f_b[r], f_ab[:, r])
+        first_order_conf = 1.96 * np.std(resampled_first_order, axis=0)
+        total_conf = 1.96 * np.std(resampled_total, axis=0)
+
+    return SobolIndices(parameters=names,
+                        bounds=bounds,
+                        kpis=tuple(kpis),
+                        timesteps=np.array(recorders[0].timesteps),
+                        days_passed=np.array(recorders[0].days_passed),
+                        evaluations=len(rows),
+                        first_order=first_order,
+                        total=total,
+                        first_order_conf=first_order_conf,
+                        total_conf=total_conf)
@@ -0,0 +1,244 @@
+"""Streaming statistics of ensembles of runs.
+
+`StreamingStatistics` is a recorder which, on every timestep, folds the batch
+into running counts, means and variances (Welford's algorithm, merged with
+Chan's formula), extremes and t-digest quantile sketches. Its memory grows
+with the horizon only, so ensembles of any size run in chunks, possibly on
+worker processes whose statistics are then merged.
+"""
+from typing import Optional, Sequence
+
+import numpy as np
+
+from consensus_pledge_model.types import ConsensusPledgeDemoState, ConsensusPledgeParams
+from consensus_pledge_model.types import Days, StochasticParams
+from consensus_pledge_model.vectorized import Recorder, VectorizedModel
+
+STREAMING_VARIABLES = ('power_qa', 'circulating', 'critical_cost')
+STREAMING_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+class TDigest():
+    """Mergeable sketch of a distribution's quantiles (Dunning's merging
+    t-digest)
+
+    Centroids are merged in bulk: sorted values fall in the same centroid
+    when their quantiles are within one unit of the arcsine scale function,
+    which keeps the tails finely resolved.
+
+    Args:
+        compression (float, optional): Bounds the number of centroids to
+            about half of it. Defaults to 200.
+    """
+
+    def __init__(self, compression: float = 200):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def update(self, values: np.ndarray, weights: Optional[np.ndarray] = None) -> None:
+        """Add values, with unit weights by default"""
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return
+        weights = np.ones_like(values) if weights is None else np.asarray(weights, dtype=np.float64)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        means = np.concatenate([self.means, values])
+        weights = np.concatenate([self.weights, weights])
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+
+        total = weights.sum()
+        q = (np.cumsum(weights) - weights / 2) / total
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+        _, starts = np.unique(np.floor(k), return_index=True)
+        merged_weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / merged_weights
+        self.weights = merged_weights
+
+    def merge(self, other: 'TDigest') -> None:
+        if other.weights.size:
+            self.update(other.means, other.weights)
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+
+    def quantile(self, q) -> np.ndarray:
+        """Estimated quantiles, interpolating between the centroids and the extremes"""
+        if self.weights.size == 0:
+            return np.full(np.shape(q), np.nan)
+        positions = (np.cumsum(self.weights) - self.weights / 2) / self.weights.sum()
+        return np.interp(q,
+                         np.concatenate([[0.0], positions, [1.0]]),
+                         np.concatenate([[self.min], self.means, [self.max]]))
+
+
+class StreamingStatistics(Recorder):
+    """Per-timestep count, mean, variance, extremes and quantiles across the
+    batch, accumulated over any number of runs
+
+    Runs of several batches can record into the same instance one after the
+    other, and instances of separate workers can be merged. Non-finite values
+    are skipped.
+
+    Args:
+        variables (Sequence[str], optional): Metrics to summarize
+        quantiles (Sequence[float], optional): Quantiles to estimate
+        compression (float, optional): Compression of the `TDigest`s
+    """
+
+    def __init__(self,
+                 variables: Sequence[str] = STREAMING_VARIABLES,
+                 quantiles: Sequence[float] = STREAMING_QUANTILES,
+                 compression: float = 200):
+        self.variables = tuple(variables)
+        self.quantiles = np.asarray(quantiles, dtype=float)
+        self.compression = compression
+        self.timesteps: list[int] = []
+        self.days_passed: list[Days] = []
+        # Running statistics by timestep, shape (variables,) each
+        self.count: list[np.ndarray] = []
+        self.mean: list[np.ndarray] = []
+        self.m2: list[np.ndarray] = []
+        self.digests: list[list[TDigest]] = []
+
+    def _row(self, timestep: int, days_passed: Days) -> int:
+        if timestep in self.timesteps:
+            return self.timesteps.index(timestep)
+        n_variables = len(self.variables)
+        self.timesteps.append(timestep)
+        self.days_passed.append(days_passed)
+        self.count.append(np.zeros(n_variables))
+        self.mean.append(np.zeros(n_variables))
+        self.m2.append(np.zeros(n_variables))
+        self.digests.append([TDigest(self.compression) for _ in self.variables])
+        return len(self.timesteps) - 1
+
+    def _update(self, row: int, i: int, count: float, mean: float, m2: float) -> None:
+        # Chan et al.'s pairwise update of Welford's running moments
+        total = self.count[row][i] + count
+        if total == 0:
+            return
+        delta = mean - self.mean[row][i]
+        self.mean[row][i] += delta * count / total
+        self.m2[row][i] += m2 + delta ** 2 * self.count[row][i] * count / total
+        self.count[row][i] = total
+
+    def record(self, model: VectorizedModel) -> None:
+        row = self._row(model.state.timestep, model.state.days_passed)
+        metrics = model.metrics()
+        for i, name in enumerate(self.variables):
+            values = np.asarray(metrics[name], dtype=np.float64)
+            values = values[np.isfinite(values)]
+            if values.size:
+                mean = values.mean()
+                self._update(row, i, values.size, mean, ((values - mean) ** 2).sum())
+                self.digests[row][i].update(values)
+
+    def merge(self, other: 'StreamingStatistics') -> None:
+        """Fold in the statistics of another instance with the same variables"""
+        for j, timestep in enumerate(other.timesteps):
+            row = self._row(timestep, other.days_passed[j])
+            for i in range(len(self.variables)):
+                self._update(row, i, other.count[j][i], other.mean[j][i], other.m2[j][i])
+                self.digests[row][i].merge(other.digests[j][i])
+
+    def to_dataframe(self):
+        """One row per timestep and statistic, with a column per variable
+
+        The statistics are `count`, `mean`, `std` (sample standard
+        deviation), `min`, `max` and `q<quantile>` for each quantile.
+        """
+        import pandas as pd
+
+        order = np.argsort(self.timesteps, kind='stable')
+        statistics = ['count', 'mean', 'std', 'min', 'max', *(f'q{q:g}' for q in self.quantiles)]
+        values = {name: [] for name in self.variables}
+        for row in order:
+            count, mean, m2 = self.count[row], self.mean[row], self.m2[row]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                std = np.sqrt(m2 / (count - 1))
+            for i, name in enumerate(self.variables):
+                digest = self.digests[row][i]
+                values[name].extend([count[i], mean[i] if count[i] else np.nan, std[i],
+                                     digest.min if count[i] else np.nan,
+                                     digest.max if count[i] else np.nan,
+                                     *digest.quantile(self.quantiles)])
+        return pd.DataFrame({
+            'timestep': np.repeat(np.array(self.timesteps)[order], len(statistics)),
+            'days_passed': np.repeat(np.array(self.days_passed)[order], len(statistics)),
+            'statistic': np.tile(statistics, len(order)),
+            **values})
+
+
+def _run_chunk(initial_state: ConsensusPledgeDemoState,
+               params: ConsensusPledgeParams,
+               timesteps: int,
+               samples: int,
+               stochastic: StochasticParams,
+               seed: np.random.SeedSequence,
+               compact: bool,
+               statistics: StreamingStatistics) -> StreamingStatistics:
+    model = VectorizedModel(initial_state,
+                            [params] * samples,
+                            stochastic=stochastic,
+                            rng=np.random.default_rng(seed),
+                            compact=compact)
+    return model.run(timesteps, statistics)
+
+
+def run_ensemble(initial_state: ConsensusPledgeDemoState,
+                 params: ConsensusPledgeParams,
+                 timesteps: int,
+                 samples: int,
+                 stochastic: StochasticParams = StochasticParams(),
+                 seed: Optional[int] = None,
+                 batch_size: int = 1000,
+                 n_jobs: int = 1,
+                 variables: Sequence[str] = STREAMING_VARIABLES,
+                 quantiles: Sequence[float] = STREAMING_QUANTILES,
+                 compact: bool = False) -> StreamingStatistics:
+    """Run stochastic samples of one parameter set in batches, keeping only
+    their streaming statistics
+
+    Memory is bounded by one batch and the statistics rather than growing
+    with the number of samples.
+
+    Args:
+        initial_state (ConsensusPledgeDemoState): Initial state
+        params (ConsensusPledgeParams): System parameters
+        timesteps (int): Number of timesteps
+        samples (int): Number of Monte Carlo samples
+        stochastic (StochasticParams, optional): Noise assumptions
+        seed (int, optional): Seed from which each batch's generator is spawned
+        batch_size (int, optional): Samples per vectorized batch. Defaults to 1000.
+        n_jobs (int, optional): Worker processes running batches. Defaults to 1.
+        variables (Sequence[str], optional): Metrics to summarize
+        quantiles (Sequence[float], optional): Quantiles to estimate
+        compact (bool, optional): Run in float32, see `VectorizedModel`
+
+    Returns:
+        StreamingStatistics: The statistics of all samples
+    """
+    sizes = [min(batch_size, samples - start) for start in range(0, samples, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    statistics = StreamingStatistics(variables, quantiles)
+    if n_jobs == 1:
+        for size, chunk_seed in zip(sizes, seeds):
+            _run_chunk(initial_state, params, timesteps, size, stochastic, chunk_seed, compact,
+                       statistics)
+        return statistics
+
+    from joblib import Parallel, delayed
+    for chunk in Parallel(n_jobs=n_jobs, return_as='generator')(
+            delayed(_run_chunk)(initial_state, params, timesteps, size, stochastic, chunk_seed,
+                                compact, StreamingStatistics(variables, quantiles))
+            for size, chunk_seed in zip(sizes, seeds)):
+        statistics.merge(chunk)
+    return statistics
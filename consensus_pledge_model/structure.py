@@ -1,4 +1,5 @@
 from consensus_pledge_model.logic import *
+from consensus_pledge_model.scheduler import schedule
 from typing import Callable
 
 
@@ -176,3 +177,69 @@ for block in CONSENSUS_PLEDGE_DEMO_BLOCKS:
                          for key, policy in policies.items()}
     block['variables'] = {key: generate_generic_suf(key) if variable is None else variable
                           for key, variable in variables.items()}
+
+
+def scheduled_blocks() -> list[dict]:
+    """`CONSENSUS_PLEDGE_DEMO_BLOCKS` fused into one substep per timestep, with
+    the same final state on each timestep, see `scheduler.schedule`
+
+    The fused blocks remember the last evaluation of each update, so every
+    run needs blocks of its own.
+    """
+    return schedule(CONSENSUS_PLEDGE_DEMO_BLOCKS)
+
+
+# Top-down blocks where the network power follows `network_power_scenario`
+# instead of the aggregate sectors, which are left out. The state needs a
+# `network_power` variable, see `topdown.topdown_initial_state`
+NETWORK_POWER_BLOCKS = [
+    {
+        'label': 'Time Tracking & Network Power',
+        'desc': 'Updates the time and grows the network power at the rate of the starting day',
+        'policies': {
+            'evolve_time': p_evolve_time
+        },
+        'variables': {
+            'days_passed': s_days_passed,
+            'delta_days': s_delta_days,
+            'network_power': s_network_power
+        }
+    },
+    {
+        'label': 'Compute Network Statistics',
+        'desc': 'Power and baseline of the current timestep',
+        'policies': {
+        },
+        'variables': {
+            'power_rb': s_exogenous_power_rb,
+            'baseline': s_baseline
+        }
+    },
+    {
+        'label': 'Cummulative Capped Power',
+        'desc': 'Update the cummulative capped power from the baseline functions',
+        'policies': {
+        },
+        'variables': {
+            'cumm_capped_power': s_cumm_capped_power
+        }
+    },
+    {
+        'label': 'Effective Network Time',
+        'desc': 'Update the effective network time as defined by baseline functions',
+        'policies': {
+        },
+        'variables': {
+            'effective_network_time': s_effective_network_time
+        }
+    },
+    {
+        'label': 'Compute Rewards',
+        'desc': 'Compute the rewards of this timestep',
+        'policies': {
+        },
+        'variables': {
+            'reward': s_reward
+        }
+    },
+]
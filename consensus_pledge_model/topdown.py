@@ -0,0 +1,162 @@
+"""Top-down runs driven by an exogenous network power.
+
+Instead of deriving the raw byte power from onboarded, renewed and expired
+sectors, it follows the piecewise growth of a `NetworkPowerScenario`. Since
+the power no longer depends on the state, its whole trajectory is computed
+up front, and with it the baseline, effective network time and rewards of
+every timestep, as array operations over time and batch members at once.
+
+The results are those of `NETWORK_POWER_BLOCKS`, without the sector
+bookkeeping of the full model.
+"""
+from typing import Sequence
+
+import numpy as np
+
+from consensus_pledge_model.params import YEAR
+from consensus_pledge_model.types import ConsensusPledgeDemoState, NetworkPowerScenario
+from consensus_pledge_model.types import TopDownParams, TopDownState
+from consensus_pledge_model.vectorized import VectorizedParams
+
+# Variables of a top-down run, with shape (timesteps + 1, batch)
+TOPDOWN_VARIABLES = ('network_power',
+                     'baseline',
+                     'cumm_capped_power',
+                     'effective_network_time',
+                     'simple_reward',
+                     'baseline_reward')
+
+
+def topdown_initial_state(initial_state: ConsensusPledgeDemoState) -> TopDownState:
+    """`initial_state` with the `network_power` variable of the top-down
+    blocks, starting from its raw byte power
+
+    Args:
+        initial_state (ConsensusPledgeDemoState): Initial state
+
+    Returns:
+        TopDownState: The initial state for `NETWORK_POWER_BLOCKS`
+    """
+    return {'network_power': initial_state['power_rb'], **initial_state}
+
+
+def growth_rates(scenarios: Sequence[NetworkPowerScenario], days_passed: np.ndarray) -> np.ndarray:
+    """Vectorized `NetworkPowerScenario.growth_rate`
+
+    Args:
+        scenarios (Sequence[NetworkPowerScenario]): Scenario of each batch member
+        days_passed (np.ndarray): Days passed, shape (timesteps,)
+
+    Returns:
+        np.ndarray: Growth rates, shape (timesteps, batch)
+    """
+    ends = np.array([scenario.phase_ends for scenario in scenarios], dtype=float)
+    rates = np.array([scenario.growth_rates for scenario in scenarios], dtype=float)
+    # Phases ended on or before each day, as `bisect_right` counts them
+    phase = (ends[None, :, :] <= days_passed[:, None, None]).sum(axis=2)
+    phase = np.minimum(phase, rates.shape[1] - 1)
+    return rates[np.arange(len(scenarios))[None, :], phase]
+
+
+def power_trajectory(scenarios: Sequence[NetworkPowerScenario],
+                     initial_power,
+                     days_passed: np.ndarray) -> np.ndarray:
+    """Network power on each of `days_passed`, as `s_network_power` grows it
+
+    Each step grows at the rate of the day it starts on.
+
+    Args:
+        scenarios (Sequence[NetworkPowerScenario]): Scenario of each batch member
+        initial_power (PiB | np.ndarray): Power on `days_passed[0]`
+        days_passed (np.ndarray): Days passed, shape (timesteps + 1,)
+
+    Returns:
+        np.ndarray: Network power, shape (timesteps + 1, batch)
+    """
+    rates = growth_rates(scenarios, days_passed[:-1])
+    growth = (1 + rates) ** (np.diff(days_passed) / YEAR)[:, None]
+    growth = np.concatenate([np.ones((1, len(scenarios))), growth])
+    return np.asarray(initial_power, dtype=float) * np.cumprod(growth, axis=0)
+
+
+def topdown_arrays(initial_state: TopDownState,
+                   params: Sequence[TopDownParams],
+                   timesteps: int) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """Trajectories of a top-down run of every parameter set
+
+    Args:
+        initial_state (TopDownState): Initial state. Its `network_power`
+            defaults to its `power_rb`.
+        params (Sequence[TopDownParams]): One entry per batch member,
+            each with a `network_power_scenario`
+        timesteps (int): Number of timesteps
+
+    Raises:
+        ValueError: If a parameter set has no `network_power_scenario`
+
+    Returns:
+        tuple[np.ndarray, dict[str, np.ndarray]]: Days passed on each
+            timestep, and the `TOPDOWN_VARIABLES` with shape (timesteps + 1, batch)
+    """
+    if any('network_power_scenario' not in p for p in params):
+        raise ValueError("Every parameter set needs a network_power_scenario")
+    p = VectorizedParams.from_params(params)
+    batch_size = p.batch_size
+    dt = p.timestep_in_days
+    state = topdown_initial_state(initial_state)
+
+    days_passed = state['days_passed'] + dt * np.arange(timesteps + 1)
+    years_passed = (days_passed / YEAR)[:, None]
+    network_power = power_trajectory([member['network_power_scenario'] for member in params],
+                                     state['network_power'],
+                                     days_passed)
+
+    def initial(value) -> np.ndarray:
+        return np.full((1, batch_size), value, dtype=float)
+
+    # Compute Network Statistics
+    baseline = p.baseline_function(years_passed)
+    baseline[0] = state['baseline']
+
+    # Cummulative Capped Power & Effective Network Time
+    capped_power = np.where(p.baseline_activated,
+                            np.minimum(network_power[1:], baseline[1:]),
+                            baseline[1:])
+    cumm_capped_power = np.concatenate([initial(state['cumm_capped_power']),
+                                        capped_power * dt / YEAR]).cumsum(axis=0)
+    effective_network_time = p.effective_network_time(cumm_capped_power)
+    effective_network_time[0] = state['effective_network_time']
+
+    # Compute Rewards
+    simple_reward = np.concatenate([initial(state['reward'].simple_reward),
+                                    np.diff(p.simple_issuance(years_passed), axis=0)])
+    baseline_reward = np.concatenate([initial(state['reward'].baseline_reward),
+                                      np.diff(p.baseline_issuance(effective_network_time), axis=0)])
+
+    return days_passed, dict(network_power=network_power,
+                             baseline=baseline,
+                             cumm_capped_power=cumm_capped_power,
+                             effective_network_time=effective_network_time,
+                             simple_reward=simple_reward,
+                             baseline_reward=baseline_reward)
+
+
+def run_topdown(initial_state: TopDownState,
+                params: Sequence[TopDownParams],
+                timesteps: int):
+    """Run a top-down simulation per parameter set, see `topdown_arrays`
+
+    Returns:
+        DataFrame: Long-format results, one row per timestep and batch member
+            with the `timestep`, `subset`, `days_passed` and `TOPDOWN_VARIABLES`,
+            like `TrajectoryRecorder.to_dataframe`
+    """
+    import pandas as pd
+
+    days_passed, arrays = topdown_arrays(initial_state, params, timesteps)
+    batch_size = len(params)
+    return pd.DataFrame({
+        'timestep': np.repeat(np.arange(timesteps + 1), batch_size),
+        'subset': np.tile(np.arange(batch_size), timesteps + 1),
+        'days_passed': np.repeat(days_passed, batch_size),
+        **{name: arrays[name].ravel() for name in TOPDOWN_VARIABLES}})
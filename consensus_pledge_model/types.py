@@ -1,4 +1,5 @@
-from typing import Annotated, TypedDict, Union
+from typing import Annotated, Optional, TypedDict, Union
+from bisect import bisect_right
 from math import exp, log, nan
 from dataclasses import dataclass
 from dataclasses_json import dataclass_json
@@ -257,6 +258,65 @@ class BehaviouralParams():
     renewal_lifetime: Days
 
 
+@dataclass_json
+@dataclass(frozen=True)
+class StochasticParams():
+    # Raw byte power that renews or not as a single unit. Sets the number of
+    # binomial trials drawn for each aggregate sector
+    renewal_unit: PiB = 1.0
+    # Coefficient of variation of the raw byte power onboarded per timestep
+    onboarding_noise: float = 0.25
+
+
+@dataclass_json
+@dataclass(frozen=True)
+class NetworkPowerScenario():
+    # Label of the scenario
+    label: Optional[str]
+    # Days passed at which each growth phase ends
+    phase_1_end: Days
+    phase_2_end: Days
+    phase_3_end: Days
+    phase_4_end: Days
+    # Yearly growth of the network power during each phase. The last one
+    # continues after the last phase ends
+    phase_1_growth: yearly_growth_rate
+    phase_2_growth: yearly_growth_rate
+    phase_3_growth: yearly_growth_rate
+    phase_4_growth: yearly_growth_rate
+
+    @property
+    def phase_ends(self) -> tuple[Days, ...]:
+        return (self.phase_1_end, self.phase_2_end, self.phase_3_end, self.phase_4_end)
+
+    @property
+    def growth_rates(self) -> tuple[yearly_growth_rate, ...]:
+        return (self.phase_1_growth, self.phase_2_growth, self.phase_3_growth, self.phase_4_growth)
+
+    def growth_rate(self, days_passed: Days) -> yearly_growth_rate:
+        """Find the yearly growth rate of the phase at a given day
+
+        Args:
+            days_passed (Days): Days passed since the simulation start
+
+        Returns:
+            yearly_growth_rate: Growth rate of the phase which `days_passed` is in
+        """
+        phase = min(bisect_right(self.phase_ends, days_passed), 3)
+        return self.growth_rates[phase]
+
+
+@dataclass_json
+@dataclass
+class CalculatorSimParams():
+    # Number of phases in use, out of `phases`
+    phase_count: int
+    # Behaviour of each phase, numbered from 1
+    phases: dict[int, BehaviouralParams]
+    # Duration of each phase in years
+    phase_durations: dict[int, float]
+
+
 @dataclass
 class AggregateSectorList():
     # All the aggregate sectors
@@ -334,3 +394,14 @@ class ConsensusPledgeSweepParams(TypedDict):
     immediate_release_fraction: list[float]
     # Behavioural Params
     behavioural_params: list[dict[Days, BehaviouralParams]]
+
+
+class TopDownState(ConsensusPledgeDemoState, total=False):
+    # Exogenous raw byte power of `NETWORK_POWER_BLOCKS`, which
+    # `topdown_initial_state` adds
+    network_power: PiB
+
+
+class TopDownParams(ConsensusPledgeParams, total=False):
+    # Growth of the network power in `NETWORK_POWER_BLOCKS`
+    network_power_scenario: NetworkPowerScenario
@@ -0,0 +1,865 @@
+"""Array-backed implementation of the consensus pledge model.
+
+Runs the same timestep logic as `CONSENSUS_PLEDGE_DEMO_BLOCKS`, with every
+state variable carrying a leading batch axis so that many parameter sets or
+Monte Carlo samples advance together in one vectorized pass.
+
+Aggregate sectors are bucketed by the timestep on which they expire. Every
+operation of the model is linear in the sectors and sectors expiring on the
+same timestep leave together, so merging them is exact. Reward schedules are
+kept as the FIL unlocking on each upcoming timestep. Both axes are ring
+buffers indexed by the absolute timestep.
+"""
+from dataclasses import dataclass, field
+from math import ceil, floor
+from typing import Optional, Sequence
+
+import numpy as np
+
+from consensus_pledge_model.guards import Guard, Halt
+from consensus_pledge_model.params import YEAR
+from consensus_pledge_model.types import AggregateSector, ConsensusPledgeDemoState
+from consensus_pledge_model.types import ConsensusPledgeParams, Days, StochasticParams
+
+# Days of block reward required as storage pledge, as in `s_storage_pledge_per_new_qa_power`
+STORAGE_PLEDGE_DAYS = 20.0
+# Share of the network QA power an attacker needs, as in the app post-processing
+CRITICAL_POWER_SHARE = 0.33
+
+
+def expiry_step(remaining_days, timestep: int, timestep_in_days: Days):
+    """Timestep on which `s_sectors_expire` removes a sector
+
+    Args:
+        remaining_days (Days | np.ndarray): Remaining days of the sector
+            after the expiry substep of `timestep` has run
+        timestep (int): Current timestep
+        timestep_in_days (Days): Days per timestep
+
+    Returns:
+        int | np.ndarray: The timestep on which the sector is removed
+    """
+    steps = np.floor(np.divide(remaining_days, timestep_in_days)).astype(np.int64) + 2
+    return timestep + np.maximum(1, steps)
+
+
+def unlock_step(day, days_passed: Days, timestep: int, timestep_in_days: Days):
+    """Timestep on which `s_sectors_rewards` unlocks a reward schedule entry
+
+    Args:
+        day (Days | np.ndarray): Key of the reward schedule entry
+        days_passed (Days): Days passed at `timestep`
+        timestep (int): Current timestep
+        timestep_in_days (Days): Days per timestep
+
+    Returns:
+        int | np.ndarray: The timestep on which the entry unlocks
+    """
+    steps = np.ceil(np.subtract(day, days_passed) / timestep_in_days).astype(np.int64)
+    return timestep + np.maximum(1, steps)
+
+
+@dataclass
+class SectorCohorts():
+    """Aggregate sectors in array form, one cohort per entry"""
+    # Shape (cohorts,) each
+    remaining_days: np.ndarray
+    power_rb: np.ndarray
+    power_qa: np.ndarray
+    storage_pledge: np.ndarray
+    consensus_pledge: np.ndarray
+    # Reward schedule entries, shape (entries,) each: the cohort they belong
+    # to, their unlock day and their amount
+    reward_cohort: np.ndarray
+    reward_day: np.ndarray
+    reward: np.ndarray
+
+    @classmethod
+    def from_aggregate_sectors(cls, aggregate_sectors: list[AggregateSector]) -> 'SectorCohorts':
+        def column(attribute: str) -> np.ndarray:
+            return np.array([getattr(s, attribute) for s in aggregate_sectors], dtype=float)
+
+        return cls(remaining_days=column('remaining_days'),
+                   power_rb=column('power_rb'),
+                   power_qa=column('power_qa'),
+                   storage_pledge=column('storage_pledge'),
+                   consensus_pledge=column('consensus_pledge'),
+                   reward_cohort=np.array([i for i, s in enumerate(aggregate_sectors)
+                                           for _ in s.reward_schedule], dtype=np.int64),
+                   reward_day=np.array([day for s in aggregate_sectors
+                                        for day in s.reward_schedule], dtype=float),
+                   reward=np.array([reward for s in aggregate_sectors
+                                    for reward in s.reward_schedule.values()], dtype=float))
+
+    def to_aggregate_sectors(self) -> list[AggregateSector]:
+        """The cohorts as the `aggregate_sectors` of a cadCAD state"""
+        schedules: list[dict[Days, float]] = [{} for _ in self.remaining_days]
+        for cohort, day, reward in zip(self.reward_cohort.tolist(),
+                                       self.reward_day.tolist(),
+                                       self.reward.tolist()):
+            schedule = schedules[cohort]
+            schedule[day] = schedule.get(day, 0.0) + reward
+        return [AggregateSector(*values, schedule)
+                for *values, schedule in zip(self.power_rb.tolist(),
+                                             self.power_qa.tolist(),
+                                             self.remaining_days.tolist(),
+                                             self.storage_pledge.tolist(),
+                                             self.consensus_pledge.tolist(),
+                                             schedules)]
+
+    @property
+    def collateral(self) -> float:
+        return float(self.storage_pledge.sum() + self.consensus_pledge.sum())
+
+    @property
+    def locked_rewards(self) -> float:
+        return float(self.reward.sum())
+
+
+@dataclass
+class SectorBook():
+    """Aggregate sectors bucketed by expiry timestep, for every batch member"""
+    # Raw byte power per expiry slot, shape (batch, slots)
+    power_rb: np.ndarray
+    # Quality adjusted power per expiry slot, shape (batch, slots)
+    power_qa: np.ndarray
+    # Pledges per expiry slot, shape (batch, slots)
+    storage_pledge: np.ndarray
+    consensus_pledge: np.ndarray
+    # FIL unlocking on each upcoming timestep, shape (batch, slots, unlock slots)
+    reward_schedule: np.ndarray
+
+    @classmethod
+    def empty(cls, batch_size: int, slots: int, unlock_slots: int,
+              dtype: np.dtype = np.float64) -> 'SectorBook':
+        return cls(power_rb=np.zeros((batch_size, slots), dtype=dtype),
+                   power_qa=np.zeros((batch_size, slots), dtype=dtype),
+                   storage_pledge=np.zeros((batch_size, slots), dtype=dtype),
+                   consensus_pledge=np.zeros((batch_size, slots), dtype=dtype),
+                   reward_schedule=np.zeros((batch_size, slots, unlock_slots), dtype=dtype))
+
+    @classmethod
+    def from_cohorts(cls,
+                     cohorts: SectorCohorts,
+                     batch_size: int,
+                     slots: int,
+                     unlock_slots: int,
+                     days_passed: Days,
+                     timestep: int,
+                     timestep_in_days: Days,
+                     dtype: np.dtype = np.float64) -> 'SectorBook':
+        """Bucket sector cohorts, repeated across the batch
+
+        Args:
+            cohorts (SectorCohorts): Sectors of the initial state
+            batch_size (int): Number of batch members
+            slots (int): Size of the expiry ring
+            unlock_slots (int): Size of the unlock ring
+            days_passed (Days): Days passed at `timestep`
+            timestep (int): Timestep of the sectors' state
+            timestep_in_days (Days): Days per timestep
+            dtype (np.dtype, optional): Storage precision. Defaults to float64.
+
+        Returns:
+            SectorBook: The bucketed sectors
+        """
+        book = cls.empty(1, slots, unlock_slots)
+        slot = expiry_step(cohorts.remaining_days, timestep, timestep_in_days) % slots
+        np.add.at(book.power_rb[0], slot, cohorts.power_rb)
+        np.add.at(book.power_qa[0], slot, cohorts.power_qa)
+        np.add.at(book.storage_pledge[0], slot, cohorts.storage_pledge)
+        np.add.at(book.consensus_pledge[0], slot, cohorts.consensus_pledge)
+        unlock_slot = unlock_step(cohorts.reward_day, days_passed, timestep, timestep_in_days) % unlock_slots
+        np.add.at(book.reward_schedule[0], (slot[cohorts.reward_cohort], unlock_slot), cohorts.reward)
+        return book.astype(dtype).repeat(batch_size)
+
+    def astype(self, dtype: np.dtype) -> 'SectorBook':
+        return SectorBook(**{k: v.astype(dtype, copy=False) for k, v in self.__dict__.items()})
+
+    def repeat(self, batch_size: int) -> 'SectorBook':
+        return SectorBook(**{k: np.repeat(v, batch_size, axis=0)
+                             for k, v in self.__dict__.items()})
+
+    @property
+    def collateral(self) -> np.ndarray:
+        return (self.storage_pledge.sum(axis=1, dtype=np.float64)
+                + self.consensus_pledge.sum(axis=1, dtype=np.float64))
+
+    @property
+    def locked_rewards(self) -> np.ndarray:
+        return self.reward_schedule.sum(axis=(1, 2), dtype=np.float64)
+
+    def add(self, slot: np.ndarray, power_rb, power_qa, storage_pledge,
+            consensus_pledge, reward_schedule=None) -> None:
+        """Merge one aggregate sector per batch member into its expiry slot"""
+        rows = np.arange(len(slot))
+        self.power_rb[rows, slot] += power_rb
+        self.power_qa[rows, slot] += power_qa
+        self.storage_pledge[rows, slot] += storage_pledge
+        self.consensus_pledge[rows, slot] += consensus_pledge
+        if reward_schedule is not None:
+            self.reward_schedule[rows, slot] += reward_schedule
+
+    def expire(self, slot: int) -> None:
+        """Drop every sector of an expiry slot, releasing all it holds"""
+        self.power_rb[:, slot] = 0.0
+        self.power_qa[:, slot] = 0.0
+        self.storage_pledge[:, slot] = 0.0
+        self.consensus_pledge[:, slot] = 0.0
+        self.reward_schedule[:, slot] = 0.0
+
+
+@dataclass
+class VectorizedParams():
+    """`ConsensusPledgeParams` of every batch member as arrays of shape (batch,)"""
+    timestep_in_days: Days
+    target_locked_supply: np.ndarray
+    linear_duration: np.ndarray
+    immediate_release_fraction: np.ndarray
+    baseline_activated: np.ndarray
+    # Minting mechanisms
+    simple_total_issuance: np.ndarray
+    simple_decay: np.ndarray
+    simple_time_offset: np.ndarray
+    baseline_total_issuance: np.ndarray
+    baseline_decay: np.ndarray
+    baseline_time_offset: np.ndarray
+    initial_baseline: np.ndarray
+    annual_baseline_growth: np.ndarray
+    # Behavioural params, shape (batch, phases). Phases are padded with the
+    # last one of each member
+    phase_end: np.ndarray
+    new_sector_rb_onboarding_rate: np.ndarray
+    new_sector_quality_factor: np.ndarray
+    new_sector_lifetime: np.ndarray
+    daily_renewal_probability: np.ndarray
+    renewal_lifetime: np.ndarray
+    vesting_schedules: list[dict[Days, float]] = field(default_factory=list)
+
+    @classmethod
+    def from_params(cls, params: Sequence[ConsensusPledgeParams]) -> 'VectorizedParams':
+        timesteps_in_days = {p['timestep_in_days'] for p in params}
+        if len(timesteps_in_days) != 1:
+            raise ValueError("All batch members must share the same timestep_in_days")
+
+        def column(get) -> np.ndarray:
+            return np.array([get(p) for p in params], dtype=float)
+
+        phases = [sorted(p['behavioural_params'].items()) for p in params]
+        n_phases = max(len(member_phases) for member_phases in phases)
+        phases = [member_phases + [member_phases[-1]] * (n_phases - len(member_phases))
+                  for member_phases in phases]
+
+        def phase_column(attribute: str) -> np.ndarray:
+            return np.array([[getattr(b, attribute) for _, b in member_phases]
+                             for member_phases in phases], dtype=float)
+
+        return cls(timestep_in_days=timesteps_in_days.pop(),
+                   target_locked_supply=column(lambda p: p['target_locked_supply']),
+                   linear_duration=column(lambda p: p['linear_duration']),
+                   immediate_release_fraction=column(lambda p: p['immediate_release_fraction']),
+                   baseline_activated=np.array([p['baseline_activated'] is True for p in params]),
+                   simple_total_issuance=column(lambda p: p['simple_mechanism'].total_issuance),
+                   simple_decay=column(lambda p: p['simple_mechanism'].decay),
+                   simple_time_offset=column(lambda p: p['simple_mechanism'].time_offset),
+                   baseline_total_issuance=column(lambda p: p['baseline_mechanism'].total_issuance),
+                   baseline_decay=column(lambda p: p['baseline_mechanism'].decay),
+                   baseline_time_offset=column(lambda p: p['baseline_mechanism'].time_offset),
+                   initial_baseline=column(lambda p: p['baseline_mechanism'].initial_baseline),
+                   annual_baseline_growth=column(lambda p: p['baseline_mechanism'].annual_baseline_growth),
+                   phase_end=np.array([[k for k, _ in member_phases] for member_phases in phases],
+                                      dtype=float),
+                   new_sector_rb_onboarding_rate=phase_column('new_sector_rb_onboarding_rate'),
+                   new_sector_quality_factor=phase_column('new_sector_quality_factor'),
+                   new_sector_lifetime=phase_column('new_sector_lifetime'),
+                   daily_renewal_probability=phase_column('daily_renewal_probability'),
+                   renewal_lifetime=phase_column('renewal_lifetime'),
+                   vesting_schedules=[p['vesting_schedule'] for p in params])
+
+    @property
+    def batch_size(self) -> int:
+        return len(self.target_locked_supply)
+
+    @property
+    def max_lifetime(self) -> Days:
+        return max(self.new_sector_lifetime.max(), self.renewal_lifetime.max())
+
+    def simple_issuance(self, years_passed) -> np.ndarray:
+        """Vectorized `SimpleMinting.issuance`"""
+        return self.simple_total_issuance * (
+            1 - np.exp(-self.simple_decay * (years_passed + self.simple_time_offset)))
+
+    def baseline_issuance(self, effective_years_passed) -> np.ndarray:
+        """Vectorized `BaselineMinting.issuance`"""
+        return self.baseline_total_issuance * (
+            1 - np.exp(-self.baseline_decay * effective_years_passed))
+
+    def baseline_function(self, years_passed) -> np.ndarray:
+        """Vectorized `BaselineMinting.baseline_function`"""
+        return (self.initial_baseline
+                * (1 + self.annual_baseline_growth)
+                ** (years_passed + self.baseline_time_offset))
+
+    def effective_network_time(self, cumm_capped_power) -> np.ndarray:
+        """Vectorized `BaselineMinting.effective_network_time`"""
+        g = np.log(1 + self.annual_baseline_growth)
+        return np.log(1 + g * cumm_capped_power / self.initial_baseline) / g
+
+    def vested(self, days_passed: Days) -> np.ndarray:
+        """FIL vesting on `days_passed`, as in `p_vest_fil`"""
+        return np.array([schedule.get(days_passed, 0.0)
+                         for schedule in self.vesting_schedules])
+
+    def unlock_profile(self, unlock_slots: int) -> np.ndarray:
+        """Days of a new linear reward schedule unlocking `j` timesteps
+        after it is created, shape (batch, unlock slots)
+        """
+        dt = self.timestep_in_days
+        j = np.arange(unlock_slots)
+        # Keys `days_passed + i` for i < linear_duration unlock once they
+        # are not greater than `days_passed + j * dt`
+        unlocked = np.minimum(j * dt + 1, self.linear_duration[:, None])
+        unlocked[:, 0] = 0.0
+        return np.diff(unlocked, axis=1, prepend=0.0)
+
+
+@dataclass
+class VectorizedState():
+    """`ConsensusPledgeDemoState` of every batch member, shape (batch,)"""
+    timestep: int
+    days_passed: Days
+    power_qa: np.ndarray
+    power_rb: np.ndarray
+    baseline: np.ndarray
+    cumm_capped_power: np.ndarray
+    effective_network_time: np.ndarray
+    simple_reward: np.ndarray
+    baseline_reward: np.ndarray
+    storage_pledge_per_new_qa_power: np.ndarray
+    consensus_pledge_per_new_qa_power: np.ndarray
+    # Token distribution
+    minted: np.ndarray
+    vested: np.ndarray
+    burnt: np.ndarray
+    collateral: np.ndarray
+    locked_rewards: np.ndarray
+    sectors: SectorBook
+
+    @property
+    def circulating(self) -> np.ndarray:
+        return self.minted + self.vested - self.burnt - self.collateral - self.locked_rewards
+
+    @property
+    def critical_cost(self) -> np.ndarray:
+        initial_pledge = self.storage_pledge_per_new_qa_power + self.consensus_pledge_per_new_qa_power
+        return self.power_qa * CRITICAL_POWER_SHARE * initial_pledge
+
+    @property
+    def locked(self) -> np.ndarray:
+        return self.collateral + self.locked_rewards
+
+    @property
+    def circulating_surplus(self) -> np.ndarray:
+        """Circulating supply over the critical cost, infinite while it is zero"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.circulating / self.critical_cost
+
+
+# Variables recorded by `VectorizedModel.metrics`
+METRICS = ('power_qa',
+           'power_rb',
+           'baseline',
+           'cumm_capped_power',
+           'effective_network_time',
+           'simple_reward',
+           'baseline_reward',
+           'storage_pledge_per_new_qa_power',
+           'consensus_pledge_per_new_qa_power',
+           'minted',
+           'vested',
+           'burnt',
+           'collateral',
+           'locked_rewards',
+           'locked',
+           'circulating',
+           'critical_cost',
+           'circulating_surplus')
+
+
+def take_members(value: object, members: np.ndarray) -> object:
+    """Keep the batch members `members` of a batched dataclass"""
+    kept = {}
+    for name, v in value.__dict__.items():
+        if isinstance(v, np.ndarray):
+            kept[name] = v[members]
+        elif isinstance(v, list):
+            kept[name] = [v[i] for i in members]
+        elif isinstance(v, SectorBook):
+            kept[name] = take_members(v, members)
+        else:
+            kept[name] = v
+    return type(value)(**kept)
+
+
+class VectorizedModel():
+    """Batched consensus pledge simulation
+
+    Args:
+        initial_state (ConsensusPledgeDemoState): Initial state, shared by all members
+        params (Sequence[ConsensusPledgeParams]): Parameters of each batch member
+        stochastic (StochasticParams, optional): Draw renewals and onboarding
+            at random instead of using their expected values. Defaults to None.
+        rng (np.random.Generator, optional): Source of randomness for the
+            stochastic mode. Defaults to a generator without a fixed seed.
+        compact (bool, optional): Store the sector book and recorded metrics
+            as float32, halving their memory. Running totals still accumulate
+            in float64. Defaults to False.
+        cohorts (SectorCohorts, optional): Sectors of the initial state in
+            array form, eg. from `load_sector_snapshot`. Defaults to the
+            initial state's aggregate sectors.
+    """
+
+    def __init__(self,
+                 initial_state: ConsensusPledgeDemoState,
+                 params: Sequence[ConsensusPledgeParams],
+                 stochastic: Optional[StochasticParams] = None,
+                 rng: Optional[np.random.Generator] = None,
+                 compact: bool = False,
+                 cohorts: Optional[SectorCohorts] = None):
+        self.params = p = VectorizedParams.from_params(params)
+        self.stochastic = stochastic
+        self.rng = np.random.default_rng() if rng is None else rng
+        # Precision of the sector book and of recorded metrics
+        self.dtype = np.dtype(np.float32 if compact else np.float64)
+        # Index in `params` of each remaining batch member
+        self.members = np.arange(p.batch_size)
+        # Members stopped by a guard, by index in `params`
+        self.halted: dict[int, Halt] = {}
+
+        dt = p.timestep_in_days
+        days_passed = initial_state['days_passed']
+        if cohorts is None:
+            cohorts = SectorCohorts.from_aggregate_sectors(initial_state['aggregate_sectors'])
+
+        # Size the rings so that live slots never collide
+        self.slots = int(max(floor(p.max_lifetime / dt) + 2,
+                             expiry_step(cohorts.remaining_days, 0, dt).max(initial=0) + 1))
+        self.unlock_slots = int(max(int(ceil((p.linear_duration.max() - 1) / dt)) + 2,
+                                    unlock_step(cohorts.reward_day, days_passed, 0, dt).max(initial=0) + 1))
+        self._unlock_profile = p.unlock_profile(self.unlock_slots).astype(self.dtype)
+
+        book = SectorBook.from_cohorts(cohorts,
+                                       p.batch_size,
+                                       self.slots,
+                                       self.unlock_slots,
+                                       days_passed,
+                                       0,
+                                       dt,
+                                       self.dtype)
+        distribution = initial_state['token_distribution']
+        reward = initial_state['reward']
+
+        def full(value) -> np.ndarray:
+            return np.full(p.batch_size, value, dtype=float)
+
+        self.state = VectorizedState(
+            timestep=0,
+            days_passed=days_passed,
+            power_qa=full(initial_state['power_qa']),
+            power_rb=full(initial_state['power_rb']),
+            baseline=full(initial_state['baseline']),
+            cumm_capped_power=full(initial_state['cumm_capped_power']),
+            effective_network_time=full(initial_state['effective_network_time']),
+            simple_reward=full(reward.simple_reward),
+            baseline_reward=full(reward.baseline_reward),
+            storage_pledge_per_new_qa_power=full(initial_state['storage_pledge_per_new_qa_power']),
+            consensus_pledge_per_new_qa_power=full(initial_state['consensus_pledge_per_new_qa_power']),
+            minted=full(distribution.minted),
+            vested=full(distribution.vested),
+            burnt=full(distribution.burnt),
+            collateral=full(distribution.collateral),
+            locked_rewards=full(distribution.locked_rewards),
+            sectors=book)
+
+    @property
+    def batch_size(self) -> int:
+        return self.params.batch_size
+
+    def take(self, members: np.ndarray) -> None:
+        """Keep only the batch members `members`, e.g. to drop finished runs"""
+        self.params = take_members(self.params, members)
+        self.state = take_members(self.state, members)
+        self._unlock_profile = self._unlock_profile[members]
+        self.members = self.members[members]
+
+    def check_guards(self, guards: Sequence[Guard]) -> np.ndarray:
+        """Evaluate guards on the current state, recording the members they halt
+
+        Args:
+            guards (Sequence[Guard]): Guards, the first one tripped gives the reason
+
+        Returns:
+            np.ndarray: Whether each batch member tripped a guard
+        """
+        tripped = np.zeros(self.batch_size, dtype=bool)
+        for guard in guards:
+            hit = guard.check(self.state) & ~tripped
+            for i in np.flatnonzero(hit):
+                self.halted[int(self.members[i])] = Halt(self.state.timestep, guard.reason)
+            tripped |= hit
+        return tripped
+
+    def _onboarded_power_rb(self, rate: np.ndarray) -> np.ndarray:
+        power_rb = rate * self.params.timestep_in_days
+        noise = self.stochastic.onboarding_noise if self.stochastic else 0.0
+        if noise > 0.0:
+            # Lognormal multiplier with unit mean
+            sigma = np.sqrt(np.log1p(noise ** 2))
+            power_rb = power_rb * self.rng.lognormal(-sigma ** 2 / 2, sigma, size=power_rb.shape)
+        return power_rb
+
+    def _renew_share(self, daily_renewal_probability: np.ndarray) -> np.ndarray:
+        # Expected share of renewals, as in `s_sectors_renew`
+        share = (daily_renewal_probability * self.params.timestep_in_days)[:, None]
+        if self.stochastic is None:
+            return share
+        # Binomial draw per aggregate sector, with one trial per renewal unit
+        sectors = self.state.sectors
+        trials = np.ceil(np.maximum(sectors.power_rb, 0.0) / self.stochastic.renewal_unit)
+        renewed = self.rng.binomial(trials.astype(np.int64), np.clip(share, 0.0, 1.0))
+        return np.divide(renewed, trials, out=np.zeros_like(trials), where=trials > 0)
+
+    def step(self) -> None:
+        """Advance every batch member by one timestep"""
+        p, s = self.params, self.state
+        book = s.sectors
+        rows = np.arange(p.batch_size)
+        dt = p.timestep_in_days
+        timestep = s.timestep + 1
+        days_passed = s.days_passed + dt
+
+        # Select Behaviour Params: the first phase ending on or after today
+        phase = np.minimum((p.phase_end < days_passed).sum(axis=1), p.phase_end.shape[1] - 1)
+
+        def behaviour(values: np.ndarray) -> np.ndarray:
+            return values[rows, phase]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Compute Collateral to be paid on this Round
+            consensus_pledge_per_new_qa_power = (p.target_locked_supply
+                                                 * s.circulating
+                                                 / np.maximum(s.baseline, s.power_qa))
+            daily_reward_estimate = (s.simple_reward + s.baseline_reward) / dt
+            storage_pledge_per_new_qa_power = (daily_reward_estimate
+                                               * STORAGE_PLEDGE_DAYS
+                                               / s.power_qa)
+
+            # Onboard Sectors
+            power_rb_new = self._onboarded_power_rb(behaviour(p.new_sector_rb_onboarding_rate))
+            power_qa_new = power_rb_new * behaviour(p.new_sector_quality_factor)
+            lifetime = behaviour(p.new_sector_lifetime)
+            book.add(self._expiry_slot(lifetime, timestep),
+                     power_rb_new,
+                     power_qa_new,
+                     storage_pledge_per_new_qa_power * power_qa_new,
+                     consensus_pledge_per_new_qa_power * power_qa_new)
+
+            # Renew Sectors
+            share = self._renew_share(behaviour(p.daily_renewal_probability))
+            power_rb_renew = (book.power_rb * share).sum(axis=1)
+            power_qa_renew = (book.power_qa * share).sum(axis=1)
+            storage_pledge_old = (book.storage_pledge * share).sum(axis=1)
+            consensus_pledge_old = (book.consensus_pledge * share).sum(axis=1)
+            schedule_renew = np.einsum('bs,bsk->bk',
+                                       np.broadcast_to(share, book.power_rb.shape).astype(self.dtype),
+                                       book.reward_schedule)
+            kept = 1.0 - share
+            book.power_rb *= kept
+            book.power_qa *= kept
+            book.storage_pledge *= kept
+            book.consensus_pledge *= kept
+            book.reward_schedule *= kept[:, :, None]
+
+            storage_pledge_renew = storage_pledge_per_new_qa_power * power_qa_renew
+            consensus_pledge_renew = consensus_pledge_per_new_qa_power * power_qa_renew
+            keep_old_pledge = (storage_pledge_old + consensus_pledge_old
+                               > storage_pledge_renew + consensus_pledge_renew)
+            book.add(self._expiry_slot(behaviour(p.renewal_lifetime), timestep),
+                     power_rb_renew,
+                     power_qa_renew,
+                     np.where(keep_old_pledge, storage_pledge_old, storage_pledge_renew),
+                     np.where(keep_old_pledge, consensus_pledge_old, consensus_pledge_renew),
+                     schedule_renew)
+
+            # Expire Sectors
+            book.expire(timestep % self.slots)
+
+            # Compute Network Statistics
+            power_qa = book.power_qa.sum(axis=1, dtype=np.float64)
+            power_rb = book.power_rb.sum(axis=1, dtype=np.float64)
+            baseline = p.baseline_function(days_passed / YEAR)
+
+            # Cummulative Capped Power & Effective Network Time
+            capped_power = np.where(p.baseline_activated, np.minimum(power_rb, baseline), baseline)
+            cumm_capped_power = s.cumm_capped_power + capped_power * dt / YEAR
+            effective_network_time = p.effective_network_time(cumm_capped_power)
+
+            # Compute Rewards
+            simple_reward = (p.simple_issuance(days_passed / YEAR)
+                             - p.simple_issuance(s.days_passed / YEAR))
+            baseline_reward = (p.baseline_issuance(effective_network_time)
+                               - p.baseline_issuance(s.effective_network_time))
+
+            # Lock / Unlock Rewards
+            book.reward_schedule[:, :, timestep % self.unlock_slots] = 0.0
+            available_reward = (simple_reward + baseline_reward) * (1.0 - p.immediate_release_fraction)
+            daily_reward = (book.power_qa / power_qa[:, None]) * (available_reward / p.linear_duration)[:, None]
+            profile = np.roll(self._unlock_profile, timestep, axis=1)
+            book.reward_schedule += (daily_reward.astype(self.dtype)[:, :, None]
+                                     * profile[:, None, :])
+
+        # Distribute Unlocked Rewards & Compute Token Distribution
+        self.state = VectorizedState(
+            timestep=timestep,
+            days_passed=days_passed,
+            power_qa=power_qa,
+            power_rb=power_rb,
+            baseline=baseline,
+            cumm_capped_power=cumm_capped_power,
+            effective_network_time=effective_network_time,
+            simple_reward=simple_reward,
+            baseline_reward=baseline_reward,
+            storage_pledge_per_new_qa_power=storage_pledge_per_new_qa_power,
+            consensus_pledge_per_new_qa_power=consensus_pledge_per_new_qa_power,
+            minted=(p.simple_issuance(effective_network_time)
+                    + p.baseline_issuance(effective_network_time)),
+            vested=s.vested + p.vested(days_passed),
+            burnt=s.burnt,
+            collateral=book.collateral,
+            locked_rewards=book.locked_rewards,
+            sectors=book)
+
+    def _expiry_slot(self, lifetime: np.ndarray, timestep: int) -> np.ndarray:
+        steps = np.floor(lifetime / self.params.timestep_in_days).astype(int) + 1
+        return (timestep + np.maximum(steps, 0)) % self.slots
+
+    def metrics(self) -> dict[str, np.ndarray]:
+        """The recorded variables of the current state, shape (batch,) each"""
+        return {name: getattr(self.state, name) for name in METRICS}
+
+    def run(self,
+            timesteps: int,
+            recorder: Optional['Recorder'] = None,
+            guards: Sequence[Guard] = ()) -> 'Recorder':
+        """Run the simulation, recording the initial state and every timestep
+
+        Members tripping a guard are recorded on that timestep and then
+        leave the batch. The run ends early once no member is left.
+
+        Args:
+            timesteps (int): Number of timesteps to run
+            recorder (Recorder, optional): Defaults to a `TrajectoryRecorder`
+            guards (Sequence[Guard], optional): Checks run after each timestep
+
+        Returns:
+            Recorder: The recorder
+        """
+        recorder = TrajectoryRecorder() if recorder is None else recorder
+        recorder.record(self)
+        for _ in range(timesteps):
+            self.step()
+            tripped = self.check_guards(guards)
+            recorder.record(self)
+            if tripped.any():
+                if tripped.all():
+                    break
+                self.take(np.flatnonzero(~tripped))
+        return recorder
+
+
+class Recorder():
+    """Collects what is kept of each timestep of a `VectorizedModel` run"""
+
+    def record(self, model: VectorizedModel) -> None:
+        raise NotImplementedError
+
+
+class TrajectoryRecorder(Recorder):
+    """Keeps every metric of every batch member on every timestep
+
+    Args:
+        variables (Sequence[str], optional): Metrics to keep. Defaults to all.
+    """
+
+    def __init__(self, variables: Optional[Sequence[str]] = None):
+        self.variables = tuple(METRICS if variables is None else variables)
+        self.batch_size: Optional[int] = None
+        self.timesteps: list[int] = []
+        self.days_passed: list[Days] = []
+        self.records: list[dict[str, np.ndarray]] = []
+
+    def record(self, model: VectorizedModel) -> None:
+        self.timesteps.append(model.state.timestep)
+        self.days_passed.append(model.state.days_passed)
+        if self.batch_size is None:
+            self.batch_size = model.batch_size
+        metrics = model.metrics()
+        if model.batch_size < self.batch_size:
+            # Members halted by a guard are NaN from then on
+            for name in self.variables:
+                values = np.full(self.batch_size, np.nan)
+                values[model.members] = metrics[name]
+                metrics[name] = values
+        self.records.append({name: metrics[name].astype(model.dtype, copy=False)
+                             for name in self.variables})
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        """Recorded metrics with shape (timesteps + 1, batch), NaN once a
+        member is halted by a guard
+        """
+        return {name: np.stack([record[name] for record in self.records])
+                for name in self.records[0]}
+
+    def to_dataframe(self):
+        """Long-format results, one row per timestep and batch member
+
+        The `subset` column is the batch member, as cadCAD's parameter subset.
+        """
+        import pandas as pd
+
+        arrays = self.arrays()
+        n_timesteps, batch_size = next(iter(arrays.values())).shape
+        df = pd.DataFrame({
+            'timestep': np.repeat(self.timesteps, batch_size),
+            'subset': np.tile(np.arange(batch_size), n_timesteps),
+            'days_passed': np.repeat(self.days_passed, batch_size),
+            **{name: values.ravel() for name, values in arrays.items()}})
+        # Drop the timesteps after a member was halted
+        return df.dropna(how='all', subset=list(arrays)).reset_index(drop=True)
+
+
+class QuantileRecorder(Recorder):
+    """Keeps per-timestep quantiles across the batch instead of every member
+
+    Args:
+        variables (Sequence[str]): Metrics to summarize
+        quantiles (Sequence[float]): Quantiles to compute
+    """
+
+    def __init__(self,
+                 variables: Sequence[str] = ('power_qa', 'circulating', 'critical_cost'),
+                 quantiles: Sequence[float] = (0.05, 0.25, 0.5, 0.75, 0.95)):
+        self.variables = tuple(variables)
+        self.quantiles = np.asarray(quantiles, dtype=float)
+        self.timesteps: list[int] = []
+        self.days_passed: list[Days] = []
+        self.records: list[dict[str, np.ndarray]] = []
+
+    def record(self, model: VectorizedModel) -> None:
+        metrics = model.metrics()
+        self.timesteps.append(model.state.timestep)
+        self.days_passed.append(model.state.days_passed)
+        self.records.append({name: np.quantile(metrics[name], self.quantiles)
+                             for name in self.variables})
+
+    def to_dataframe(self):
+        """One row per timestep and quantile"""
+        import pandas as pd
+
+        n_quantiles = len(self.quantiles)
+        return pd.DataFrame({
+            'timestep': np.repeat(self.timesteps, n_quantiles),
+            'days_passed': np.repeat(self.days_passed, n_quantiles),
+            'quantile': np.tile(self.quantiles, len(self.timesteps)),
+            **{name: np.concatenate([record[name] for record in self.records])
+               for name in self.variables}})
+
+
+def run_batch(initial_state: ConsensusPledgeDemoState,
+              params: Sequence[ConsensusPledgeParams],
+              timesteps: int,
+              guards: Sequence[Guard] = (),
+              compact: bool = False):
+    """Run one deterministic simulation per parameter set in a single batch
+
+    Args:
+        initial_state (ConsensusPledgeDemoState): Initial state
+        params (Sequence[ConsensusPledgeParams]): One entry per batch member
+        timesteps (int): Number of timesteps
+        guards (Sequence[Guard], optional): Checks stopping members early,
+            eg. `DEFAULT_GUARDS`
+        compact (bool, optional): Run in float32, see `VectorizedModel`
+
+    Returns:
+        DataFrame: Long-format results, see `TrajectoryRecorder.to_dataframe`.
+            `attrs['halted']` holds the `Halt` of each stopped subset.
+    """
+    model = VectorizedModel(initial_state, params, compact=compact)
+    df = model.run(timesteps, guards=guards).to_dataframe()
+    df.attrs['halted'] = model.halted
+    return df
+
+
+def compact_error(initial_state: ConsensusPledgeDemoState,
+                  params: Sequence[ConsensusPledgeParams],
+                  timesteps: int,
+                  variables: Sequence[str] = METRICS) -> dict[str, float]:
+    """Maximum relative error of the float32 compact mode against float64
+
+    Args:
+        initial_state (ConsensusPledgeDemoState): Initial state
+        params (Sequence[ConsensusPledgeParams]): One entry per batch member
+        timesteps (int): Number of timesteps
+        variables (Sequence[str], optional): Metrics to compare. Defaults to all.
+
+    Returns:
+        dict[str, float]: Error by metric, over all timesteps and members
+            where the float64 value is finite and non-zero
+    """
+    exact = VectorizedModel(initial_state, params).run(
+        timesteps, TrajectoryRecorder(variables)).arrays()
+    compact = VectorizedModel(initial_state, params, compact=True).run(
+        timesteps, TrajectoryRecorder(variables)).arrays()
+    errors = {}
+    for name in variables:
+        reference = exact[name]
+        valid = np.isfinite(reference) & (reference != 0.0)
+        error = np.abs(compact[name][valid] - reference[valid]) / np.abs(reference[valid])
+        errors[name] = float(error.max()) if error.size else 0.0
+    return errors
+
+
+def run_monte_carlo(initial_state: ConsensusPledgeDemoState,
+                    params: ConsensusPledgeParams,
+                    timesteps: int,
+                    samples: int,
+                    stochastic: StochasticParams = StochasticParams(),
+                    seed: Optional[int] = None,
+                    quantiles: Sequence[float] = (0.05, 0.25, 0.5, 0.75, 0.95),
+                    compact: bool = False):
+    """Run stochastic samples of one parameter set along the batch axis
+
+    Only the per-timestep quantiles of `power_qa`, `circulating` and
+    `critical_cost` are kept, so memory does not grow with the horizon
+    times the number of samples.
+
+    Args:
+        initial_state (ConsensusPledgeDemoState): Initial state
+        params (ConsensusPledgeParams): System parameters
+        timesteps (int): Number of timesteps
+        samples (int): Number of Monte Carlo samples
+        stochastic (StochasticParams, optional): Noise assumptions
+        seed (int, optional): Seed of the NumPy generator. Defaults to None.
+        quantiles (Sequence[float], optional): Quantiles to report
+        compact (bool, optional): Run in float32, see `VectorizedModel`
+
+    Returns:
+        DataFrame: One row per timestep and quantile
+    """
+    model = VectorizedModel(initial_state,
+                            [params] * samples,
+                            stochastic=stochastic,
+                            rng=np.random.default_rng(seed),
+                            compact=compact)
+    recorder = QuantileRecorder(quantiles=quantiles)
+    return model.run(timesteps, recorder).to_dataframe()
@@ -0,0 +1,50 @@
+"""Latency benchmark of six-year runs with daily timesteps.
+
+Fails when the full horizon exceeds the time budget, or when the run time
+grows faster than linearly with the number of timesteps. Run from the
+repository root, as a module so that the package is importable:
+
+    python -m profiling.benchmark_daily_run
+"""
+from statistics import median
+import time
+
+import click
+
+from consensus_pledge_model.params import DAILY_INITIAL_STATE, DAILY_RUN_PARAMS
+from consensus_pledge_model.params import DAILY_TIMESTEPS
+from consensus_pledge_model.vectorized import VectorizedModel
+
+
+def time_run(timesteps: int, repeat: int) -> float:
+    """Median wall time in seconds of a daily run of `timesteps`"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        VectorizedModel(DAILY_INITIAL_STATE, [DAILY_RUN_PARAMS]).run(timesteps)
+        timings.append(time.perf_counter() - start)
+    return median(timings)
+
+
+@click.command()
+@click.option('-n', '--repeat', default=3, show_default=True,
+              help="Number of runs per horizon")
+@click.option('-b', '--budget', default=5.0, show_default=True,
+              help="Maximum seconds for the full horizon")
+@click.option('--max-growth', default=1.5, show_default=True,
+              help="Maximum per-timestep cost of the full horizon "
+                   "relative to its first quarter")
+def main(repeat: int, budget: float, max_growth: float) -> None:
+    quarter = time_run(DAILY_TIMESTEPS // 4, repeat)
+    full = time_run(DAILY_TIMESTEPS, repeat)
+    growth = (full / DAILY_TIMESTEPS) / (quarter / (DAILY_TIMESTEPS // 4))
+    click.echo(f"{DAILY_TIMESTEPS // 4:>5} steps {quarter:.3f}s")
+    click.echo(f"{DAILY_TIMESTEPS:>5} steps {full:.3f}s "
+               f"(budget {budget:.1f}s)")
+    click.echo(f"per-step cost growth {growth:.2f}x (max {max_growth:.2f}x)")
+    if full > budget or growth > max_growth:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Cold-start benchmark for the CLI and the Streamlit app.
+
+Each command runs in a fresh interpreter so that nothing is cached in
+`sys.modules`. Run from the repository root:
+
+    python profiling/benchmark_import_time.py
+"""
+from statistics import median
+import subprocess
+import sys
+import time
+
+import click
+
+
+COMMANDS = {
+    'cli --help': [sys.executable, '-m', 'consensus_pledge_model', '--help'],
+    'package import': [sys.executable, '-c', 'import consensus_pledge_model'],
+    # Everything `app/main.py` imports before it starts rendering
+    'app cold start': [sys.executable, '-c',
+                       'import sys; sys.path.insert(0, "app"); '
+                       'import streamlit, chart, description, download, '
+                       'glossary, model, preview, simulation, utils'],
+    # Everything `app/service.py` imports before it starts its workers
+    'service cold start': [sys.executable, '-c',
+                           'import sys; sys.path.insert(0, "app"); '
+                           'import service'],
+}
+
+
+def time_command(command: list[str], repeat: int) -> float:
+    """Median wall time in seconds of running `command` `repeat` times"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, capture_output=True)
+        timings.append(time.perf_counter() - start)
+    return median(timings)
+
+
+@click.command()
+@click.option('-n', '--repeat', default=5, show_default=True,
+              help="Number of cold starts per command")
+def main(repeat: int) -> None:
+    for label, command in COMMANDS.items():
+        click.echo(f"{label:<20} {time_command(command, repeat):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
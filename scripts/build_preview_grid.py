@@ -0,0 +1,163 @@
+"""Build the grid of `app/preview.py` and measure the error of its previews.
+
+Runs the grid with the vectorized engine, compares previews of random
+requests with their exact runs, and stores both at `data/preview_grid.npz`.
+Run from the repository root, with the package and the app importable:
+
+    PYTHONPATH=.:app python scripts/build_preview_grid.py
+"""
+from dataclasses import replace
+from itertools import product
+from pathlib import Path
+from typing import Optional
+
+import click
+import numpy as np
+
+from consensus_pledge_model.results import RESULT_METRICS, results_frame
+from consensus_pledge_model.types import BehaviouralParams
+from preview import ERROR_KPIS, GRID_AXES, GRID_PATH, VALIDATED_CHANGES
+from preview import PreviewGrid, relative_error
+from simulation import FIRST_TIMESTEP, SCENARIOS, behavioural_params
+from simulation import cumulative_durations, default_phases
+
+# Members per vectorized batch of the build
+BATCH_SIZE = 512
+
+
+def run_requests(phase_durations: dict[int, float],
+                 requests: list[dict[int, BehaviouralParams]]) -> np.ndarray:
+    """`RESULT_METRICS` of each request and scenario with the vectorized
+    engine
+
+    Args:
+        phase_durations (dict[int, float]): Cumulative phase durations in
+            years
+        requests (list[dict[int, BehaviouralParams]]): Phases of each
+            request
+
+    Returns:
+        np.ndarray: Shape (requests, scenarios, metrics, timesteps + 1)
+    """
+    from consensus_pledge_model.params import INITIAL_STATE
+    from consensus_pledge_model.params import SINGLE_RUN_PARAMS
+    from consensus_pledge_model.params import TIMESTEP_IN_DAYS
+    from consensus_pledge_model.vectorized import TrajectoryRecorder
+    from consensus_pledge_model.vectorized import VectorizedModel
+
+    years = max(phase_durations.values())
+    timesteps = int(years * 365.25 / TIMESTEP_IN_DAYS) + 1
+    params = [{**SINGLE_RUN_PARAMS,
+               'target_locked_supply': tls,
+               'behavioural_params': behavioural_params(phase_durations,
+                                                        phases)}
+              for phases in requests for tls in SCENARIOS.values()]
+    batches = []
+    for start in range(0, len(params), BATCH_SIZE):
+        model = VectorizedModel(INITIAL_STATE,
+                                params[start:start + BATCH_SIZE])
+        recorder = TrajectoryRecorder(RESULT_METRICS)
+        arrays = model.run(timesteps, recorder).arrays()
+        batches.append(np.stack([arrays[name].T for name in RESULT_METRICS],
+                                axis=1))
+    values = np.concatenate(batches)
+    return values.reshape(len(requests), len(SCENARIOS), *values.shape[1:])
+
+
+def build() -> PreviewGrid:
+    """Run the grid of every phase"""
+    phases, phase_durations = default_phases()
+    requests = []
+    for i_phase in phases:
+        for nodes in product(*GRID_AXES.values()):
+            request = dict(phases)
+            request[i_phase] = replace(phases[i_phase],
+                                       **dict(zip(GRID_AXES, nodes)))
+            requests.append(request)
+    sim_phase_durations = cumulative_durations(phase_durations, len(phases))
+    runs = run_requests(sim_phase_durations, [phases, *requests])
+    return PreviewGrid.from_runs(runs[0], runs[1:])
+
+
+def exact_result(run: np.ndarray):
+    """The result of a run of `run_requests`, as the calculator shows it"""
+    from consensus_pledge_model.params import SINGLE_RUN_PARAMS
+    from consensus_pledge_model.params import TIMESTEP_IN_DAYS
+
+    params = [{**SINGLE_RUN_PARAMS, 'target_locked_supply': tls}
+              for tls in SCENARIOS.values()]
+    days_passed = np.arange(run.shape[-1]) * TIMESTEP_IN_DAYS
+    df = results_frame({name: run[:, i].T
+                        for i, name in enumerate(RESULT_METRICS)},
+                       days_passed, params, list(SCENARIOS))
+    return df[df.timestep >= FIRST_TIMESTEP]
+
+
+def validate(grid: PreviewGrid,
+             samples: int,
+             seed: Optional[int] = None
+             ) -> dict[int, dict[str, tuple[float, float]]]:
+    """Error of previews of random requests, by number of changed phases
+
+    Args:
+        grid (PreviewGrid): The grid to validate
+        samples (int): Random requests per number of changed phases
+        seed (int, optional): Seed of the requests
+
+    Returns:
+        dict[int, dict[str, tuple[float, float]]]: For `VALIDATED_CHANGES`,
+            the median and 95th percentile over the requests of the
+            `relative_error` of each KPI
+    """
+    rng = np.random.default_rng(seed)
+    requests = []
+    for changes in VALIDATED_CHANGES:
+        for _ in range(samples):
+            phases = dict(grid.phases)
+            changed = rng.choice(list(phases), size=changes, replace=False)
+            for i_phase in changed:
+                phases[i_phase] = replace(
+                    phases[i_phase],
+                    new_sector_rb_onboarding_rate=float(
+                        10 ** rng.uniform(-1, 3)),
+                    new_sector_quality_factor=float(rng.uniform(1, 20)),
+                    daily_renewal_probability=float(
+                        rng.uniform(0, 20) / (100 * 30)))
+            requests.append(phases)
+
+    runs = run_requests(grid.sim_phase_durations, requests)
+    errors = {changes: [] for changes in VALIDATED_CHANGES}
+    for phases, run in zip(requests, runs):
+        preview = grid.preview(grid.sim_phase_durations, phases)
+        errors[grid.changed_phases(phases)].append(
+            relative_error(preview, exact_result(run)))
+    return {changes: {kpi: (float(np.median([e[kpi] for e in kpi_errors])),
+                            float(np.percentile([e[kpi] for e in kpi_errors],
+                                                95)))
+                      for kpi in ERROR_KPIS}
+            for changes, kpi_errors in errors.items()}
+
+
+@click.command()
+@click.option('-n', '--samples', default=128, show_default=True,
+              help="Random requests per number of changed phases the "
+                   "preview error is measured on")
+@click.option('--seed', default=0, show_default=True)
+@click.option('-o', '--output', default=str(GRID_PATH), show_default=True)
+def main(samples: int, seed: int, output: str) -> None:
+    grid = build()
+    grid.error = validate(grid, samples, seed)
+    grid.save(output)
+    size = Path(output).stat().st_size / 2**20
+    click.echo(f"{grid.values[..., 0, 0, 0].size} grid points, "
+               f"{size:.1f} MiB")
+    for changes, error in grid.error.items():
+        usable = "" if grid.usable(changes) else ", not previewed"
+        click.echo(f"\nRequests changing {changes} phase(s){usable}")
+        click.echo(f"{'KPI':<34}{'median':>10}{'p95':>10}")
+        for kpi, (median, p95) in error.items():
+            click.echo(f"{kpi:<34}{median:>10.2%}{p95:>10.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+from pathlib import Path
+
+import pytest
+from pandas.testing import assert_frame_equal
+
+APP = Path(__file__).parent.parent / 'app'
+# Short phases, so that the cadCAD runs are quick
+PHASE_DURATIONS = {1: 0.1, 2: 0.15, 3: 0.2, 4: 0.3, 5: 0.4}
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.syspath_prepend(str(APP))
+
+
+def test_arrow_and_pandas_backends_match(app, monkeypatch):
+    import simulation
+    from simulation import SCENARIOS, combine_scenarios, combine_tables, default_phases, run_scenario
+
+    phases, _ = default_phases()
+    results = {}
+    for backend, combine in (('pandas', combine_scenarios), ('arrow', combine_tables)):
+        monkeypatch.setattr(simulation, 'RESULTS_BACKEND', backend)
+        results[backend] = combine([run_scenario(PHASE_DURATIONS, phases, scenario)
+                                    for scenario in SCENARIOS])
+
+    assert_frame_equal(results['arrow'], results['pandas'])
+    assert results['arrow'].attrs == results['pandas'].attrs
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from consensus_pledge_model.calibration import behavioural_params, calibrate, initial_sim_params
+from consensus_pledge_model.params import INITIAL_STATE, SINGLE_RUN_PARAMS
+from consensus_pledge_model.types import BehaviouralParams, CalculatorSimParams
+from consensus_pledge_model.vectorized import VectorizedModel
+
+TRUTH = CalculatorSimParams(
+    phase_count=2,
+    phases={1: BehaviouralParams(1, 3.0, 5.0, 360, 0.003, 360),
+            2: BehaviouralParams(2, 6.0, 10.0, 360, 0.005, 360)},
+    phase_durations={1: 0.5, 2: 0.5})
+
+
+def observe(sim_params: CalculatorSimParams, days: np.ndarray) -> pd.DataFrame:
+    params = {**SINGLE_RUN_PARAMS, 'behavioural_params': behavioural_params(sim_params)}
+    timesteps = int(days.max() / SINGLE_RUN_PARAMS['timestep_in_days']) + 1
+    recorder = VectorizedModel(INITIAL_STATE, [params]).run(timesteps)
+    arrays = recorder.arrays()
+    pledge = (arrays['storage_pledge_per_new_qa_power']
+              + arrays['consensus_pledge_per_new_qa_power'])
+    return pd.DataFrame({
+        'days_passed': days,
+        'power_rb': np.interp(days, recorder.days_passed, arrays['power_rb'][:, 0]),
+        'power_qa': np.interp(days, recorder.days_passed, arrays['power_qa'][:, 0]),
+        'pledge_per_qa_power': np.interp(days, recorder.days_passed, pledge[:, 0])})
+
+
+def test_behavioural_params():
+    assert list(behavioural_params(TRUTH)) == [182, np.inf]
+
+
+def test_calibrate():
+    observations = observe(TRUTH, np.arange(28.0, 365.0, 28.0))
+    result = calibrate(observations, initial_sim_params(observations, phase_count=2),
+                       population=64, generations=15, seed=1)
+    assert result.history[-1] < result.history[0] / 10
+    assert result.loss < 1e-3
+
+    fitted = observe(result.sim_params, observations.days_passed.to_numpy())
+    assert np.allclose(fitted.power_qa, observations.power_qa, rtol=0.05)
+    assert CalculatorSimParams.from_json(result.sim_params.to_json()).phase_count == 2
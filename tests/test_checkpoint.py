@@ -0,0 +1,56 @@
+import pytest
+from pytest import approx
+
+from consensus_pledge_model.checkpoint import SweepCheckpoint, run_sweep
+from consensus_pledge_model.params import INITIAL_STATE, SINGLE_RUN_PARAMS
+from consensus_pledge_model.sensitivity import with_parameter
+from consensus_pledge_model.vectorized import VectorizedModel, run_batch
+
+TIMESTEPS = 20
+PARAMS = [with_parameter(SINGLE_RUN_PARAMS, 'target_locked_supply', tls)
+          for tls in (0.1, 0.2, 0.3)]
+
+
+def test_run_sweep(tmp_path):
+    df = run_sweep(INITIAL_STATE, PARAMS, TIMESTEPS, tmp_path, batch_size=2)
+    expected = run_batch(INITIAL_STATE, PARAMS, TIMESTEPS)
+    df = df.sort_values(['timestep', 'subset']).reset_index(drop=True)
+    assert df.critical_cost.to_numpy() == approx(expected.critical_cost.to_numpy(), rel=1e-12)
+    assert SweepCheckpoint(tmp_path).completed() == {0, 1}
+
+
+def test_resume(tmp_path, monkeypatch):
+    expected = run_sweep(INITIAL_STATE, PARAMS, TIMESTEPS, tmp_path / 'full', batch_size=2)
+
+    # Kill the sweep halfway through its second batch
+    steps = []
+    step = VectorizedModel.step
+
+    def counted_step(model):
+        if len(steps) == TIMESTEPS + 10:
+            raise KeyboardInterrupt
+        steps.append(model.state.timestep)
+        step(model)
+
+    monkeypatch.setattr(VectorizedModel, 'step', counted_step)
+    with pytest.raises(KeyboardInterrupt):
+        run_sweep(INITIAL_STATE, PARAMS, TIMESTEPS, tmp_path, batch_size=2, interval=0.0)
+    assert SweepCheckpoint(tmp_path).completed() == {0}
+
+    steps.clear()
+    df = run_sweep(INITIAL_STATE, PARAMS, TIMESTEPS, tmp_path,
+                   batch_size=2, interval=0.0, resume=True)
+    assert steps == list(range(10, TIMESTEPS))
+    assert df.critical_cost.to_numpy() == approx(expected.critical_cost.to_numpy(), rel=1e-12)
+
+
+def test_starting_over_only_drops_the_sweep_files(tmp_path):
+    notes = tmp_path / 'notes.txt'
+    notes.write_text('kept')
+    stale = tmp_path / 'batch-00007.parquet'
+    stale.write_bytes(b'')
+    run_sweep(INITIAL_STATE, PARAMS, TIMESTEPS, tmp_path, batch_size=2)
+
+    assert notes.read_text() == 'kept'
+    assert not stale.exists()
+    assert SweepCheckpoint(tmp_path).completed() == {0, 1}
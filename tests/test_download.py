@@ -0,0 +1,41 @@
+import io
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+
+APP = Path(__file__).parent.parent / 'app'
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.syspath_prepend(str(APP))
+
+
+def read_download(data: bytes, format_name: str) -> pd.DataFrame:
+    file = io.BytesIO(data)
+    if format_name == 'Parquet':
+        return pd.read_parquet(file)
+    compression = 'gzip' if format_name == 'CSV (gzip)' else None
+    return pd.read_csv(file, index_col=0, compression=compression)
+
+
+def test_downloads_round_trip_through_streamlit(app, monkeypatch):
+    import download
+    from download import DOWNLOAD_FORMATS, encode_results
+
+    # Several chunks, the last one partial
+    monkeypatch.setattr(download, 'CHUNK_ROWS', 7)
+    df = pd.DataFrame({'timestep': np.arange(20),
+                       'scenario': ['consensus_pledge_on', 'consensus_pledge_off'] * 10,
+                       'power_qa': np.linspace(0.5, 20.0, 20),
+                       'unselected': 0.0})
+    columns = ['scenario', 'timestep', 'power_qa']
+
+    for format_name in DOWNLOAD_FORMATS:
+        data, _ = convert_data_to_bytes_and_infer_mime(
+            encode_results(df, columns, format_name), RuntimeError(format_name))
+        assert_frame_equal(read_download(data, format_name), df[columns])
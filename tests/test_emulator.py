@@ -0,0 +1,49 @@
+from copy import deepcopy
+
+import numpy as np
+import pytest
+from pytest import approx
+
+from consensus_pledge_model.emulator import EMULATOR_KPIS, fit_emulator, legendre_features, polynomial_terms
+from consensus_pledge_model.params import INITIAL_STATE, SINGLE_RUN_PARAMS
+from consensus_pledge_model.results import results_frame
+from consensus_pledge_model.sensitivity import with_parameters
+from consensus_pledge_model.vectorized import TrajectoryRecorder, VectorizedModel
+
+TIMESTEPS = 20
+BOUNDS = {'target_locked_supply': (0.2, 0.4), 'immediate_release_fraction': (0.15, 0.35)}
+
+
+def test_legendre_features_are_orthonormal():
+    terms = polynomial_terms(2, 3)
+    assert len(terms) == 10
+    nodes, weights = np.polynomial.legendre.leggauss(4)
+    x, y = np.meshgrid(nodes, nodes)
+    features = legendre_features(np.stack([x.ravel(), y.ravel()], axis=1), terms)
+    gram = features.T @ (features * np.outer(weights, weights).ravel()[:, None]) / 4
+    assert gram == approx(np.eye(len(terms)), abs=1e-12)
+
+
+def test_emulator_predicts_held_out_runs():
+    emulator = fit_emulator(deepcopy(INITIAL_STATE), SINGLE_RUN_PARAMS, TIMESTEPS,
+                            bounds=BOUNDS, samples=64, seed=0)
+    assert set(emulator.held_out_error) == set(EMULATOR_KPIS)
+    assert all(median < 0.01 for median, _ in emulator.held_out_error.values())
+
+    params = with_parameters(SINGLE_RUN_PARAMS, {'target_locked_supply': 0.33,
+                                                 'immediate_release_fraction': 0.2})
+    predicted = emulator.predict(params)
+    recorder = VectorizedModel(deepcopy(INITIAL_STATE), [params]).run(
+        TIMESTEPS, TrajectoryRecorder())
+    exact = results_frame(recorder.arrays(), np.array(recorder.days_passed), [params])
+    assert list(predicted.columns) == list(exact.columns)
+    assert predicted.critical_cost.to_numpy() == approx(exact.critical_cost.to_numpy(), rel=0.01)
+
+    with pytest.raises(ValueError):
+        emulator.predict(with_parameters(SINGLE_RUN_PARAMS, {'target_locked_supply': 0.5}))
+
+
+def test_emulator_rejects_unused_parameters():
+    with pytest.raises(ValueError, match='storage_pledge_factor'):
+        fit_emulator(deepcopy(INITIAL_STATE), SINGLE_RUN_PARAMS, TIMESTEPS,
+                     bounds={**BOUNDS, 'storage_pledge_factor': (15.0, 25.0)}, samples=8)
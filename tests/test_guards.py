@@ -0,0 +1,78 @@
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from pathlib import Path
+
+import numpy as np
+import pytest
+from cadCAD_tools import easy_run
+from pytest import approx
+
+from consensus_pledge_model.guards import DEFAULT_GUARDS, Guard, Halt, RunHalted, ThresholdGuard
+from consensus_pledge_model.guards import guarded_blocks
+from consensus_pledge_model.params import INITIAL_STATE, SINGLE_RUN_PARAMS
+from consensus_pledge_model.sensitivity import with_parameter
+from consensus_pledge_model.structure import CONSENSUS_PLEDGE_DEMO_BLOCKS
+from consensus_pledge_model.vectorized import VectorizedModel, run_batch
+
+TIMESTEPS = 20
+APP = Path(__file__).parent.parent / 'app'
+
+
+class LateGuard(Guard):
+    reason = 'too late'
+
+    def check(self, state):
+        return np.full(len(state.power_qa), state.timestep >= 5)
+
+
+def test_guards():
+    params = [with_parameter(SINGLE_RUN_PARAMS, 'target_locked_supply', tls)
+              for tls in (0.3, 100.0, 0.0)]
+    guards = DEFAULT_GUARDS + (ThresholdGuard('circulating_surplus', high=60.0),)
+    df = run_batch(INITIAL_STATE, params, TIMESTEPS, guards=guards)
+
+    assert df.attrs['halted'] == {1: Halt(1, 'negative circulating supply'),
+                                  2: Halt(1, 'circulating_surplus above 60.0')}
+    assert df.groupby('subset').timestep.max().tolist() == [TIMESTEPS, 1, 1]
+
+    # The remaining member is unaffected
+    full = run_batch(INITIAL_STATE, params[:1], TIMESTEPS)
+    assert df.query('subset == 0').critical_cost.to_numpy() == approx(full.critical_cost.to_numpy(),
+                                                                      rel=1e-12)
+
+
+def test_custom_guard_ends_run():
+    model = VectorizedModel(INITIAL_STATE, [SINGLE_RUN_PARAMS] * 2)
+    recorder = model.run(TIMESTEPS, guards=[LateGuard()])
+    assert recorder.timesteps[-1] == 5
+    assert model.halted == {0: Halt(5, 'too late'), 1: Halt(5, 'too late')}
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.syspath_prepend(str(APP))
+
+
+def test_guarded_cadcad_run_halts():
+    blocks = guarded_blocks(CONSENSUS_PLEDGE_DEMO_BLOCKS)
+    params = {k: [v] for k, v in with_parameter(SINGLE_RUN_PARAMS, 'target_locked_supply', 100.0).items()}
+    with pytest.raises(RunHalted) as halted:
+        easy_run(deepcopy(INITIAL_STATE), params, blocks, TIMESTEPS, 1)
+    # The same halt as the vectorized model's
+    assert halted.value.halt == Halt(1, 'negative circulating supply')
+
+    params = {k: [v] for k, v in SINGLE_RUN_PARAMS.items()}
+    df = easy_run(deepcopy(INITIAL_STATE), params, blocks, TIMESTEPS, 1)
+    assert df.timestep.max() == TIMESTEPS
+
+
+def test_app_reports_halted_scenarios(app, monkeypatch):
+    import simulation
+    from simulation import SimulationHalted, SimulationJob, default_phases
+
+    monkeypatch.setattr(simulation, 'SCENARIOS', {**simulation.SCENARIOS, 'consensus_pledge_on': 100.0})
+    phases, _ = default_phases()
+    with ThreadPoolExecutor() as executor:
+        job = SimulationJob(executor, {1: 0.1, 2: 0.15, 3: 0.2, 4: 0.3, 5: 0.4}, phases)
+        with pytest.raises(SimulationHalted, match='consensus_pledge_on.*negative circulating supply on timestep 1'):
+            job.result()
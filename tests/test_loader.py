@@ -0,0 +1,39 @@
+import pandas as pd
+from pytest import approx
+
+from consensus_pledge_model.loader import load_sector_snapshot, snapshot_initial_state
+from consensus_pledge_model.params import INITIAL_AGGREGATE_SECTORS, INITIAL_STATE, SINGLE_RUN_PARAMS
+from consensus_pledge_model.vectorized import VectorizedModel
+
+TIMESTEPS = 20
+
+
+def test_load_sector_snapshot(tmp_path):
+    # Every aggregate sector is exported as two half-sized rows
+    sectors = pd.DataFrame([{'remaining_days': s.remaining_days,
+                             'power_rb': s.power_rb / 2,
+                             'power_qa': s.power_qa / 2,
+                             'storage_pledge': s.storage_pledge / 2,
+                             'consensus_pledge': s.consensus_pledge / 2}
+                            for s in INITIAL_AGGREGATE_SECTORS for _ in range(2)])
+    rewards = pd.DataFrame([{'remaining_days': s.remaining_days, 'day': day, 'reward': reward / 2}
+                            for s in INITIAL_AGGREGATE_SECTORS
+                            for day, reward in s.reward_schedule.items() for _ in range(2)])
+    sectors.to_csv(tmp_path / 'sectors.csv', index=False)
+    rewards.to_parquet(tmp_path / 'rewards.parquet')
+
+    cohorts = load_sector_snapshot(tmp_path / 'sectors.csv', tmp_path / 'rewards.parquet')
+    assert len(cohorts.remaining_days) == len(INITIAL_AGGREGATE_SECTORS)
+
+    state = snapshot_initial_state(cohorts)
+    distribution = INITIAL_STATE['token_distribution']
+    assert state['power_qa'] == approx(sum(s.power_qa for s in INITIAL_AGGREGATE_SECTORS))
+    assert state['token_distribution'].collateral == approx(distribution.collateral)
+    assert state['token_distribution'].locked_rewards == approx(distribution.locked_rewards)
+
+    # Same run as from the original sectors
+    initial_state = {**INITIAL_STATE, 'power_rb': state['power_rb'], 'power_qa': state['power_qa']}
+    expected = VectorizedModel(initial_state, [SINGLE_RUN_PARAMS]).run(TIMESTEPS).arrays()
+    loaded = VectorizedModel(state, [SINGLE_RUN_PARAMS], cohorts=cohorts).run(TIMESTEPS).arrays()
+    for variable in ['power_qa', 'collateral', 'locked_rewards', 'circulating']:
+        assert loaded[variable] == approx(expected[variable], rel=1e-9)
@@ -0,0 +1,65 @@
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from pathlib import Path
+
+import numpy as np
+import pytest
+from pytest import approx
+
+from consensus_pledge_model.params import INITIAL_STATE, SINGLE_RUN_PARAMS, TIMESTEP_IN_DAYS
+from consensus_pledge_model.results import RESULT_METRICS
+from consensus_pledge_model.vectorized import TrajectoryRecorder, VectorizedModel
+
+APP = Path(__file__).parent.parent / 'app'
+# Short phases, so that the exact cadCAD run is quick
+PHASE_DURATIONS = {1: 0.1, 2: 0.15, 3: 0.2, 4: 0.3, 5: 0.4}
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.syspath_prepend(str(APP))
+
+
+def default_run(phases):
+    """Metrics of the default phases, shape (scenarios, metrics, timesteps + 1)"""
+    from simulation import SCENARIOS, behavioural_params
+
+    timesteps = int(max(PHASE_DURATIONS.values()) * 365.25 / TIMESTEP_IN_DAYS) + 1
+    params = [{**SINGLE_RUN_PARAMS,
+               'target_locked_supply': tls,
+               'behavioural_params': behavioural_params(PHASE_DURATIONS, phases)}
+              for tls in SCENARIOS.values()]
+    model = VectorizedModel(deepcopy(INITIAL_STATE), params)
+    arrays = model.run(timesteps, TrajectoryRecorder(RESULT_METRICS)).arrays()
+    return np.stack([arrays[name].T for name in RESULT_METRICS], axis=1)
+
+
+def test_preview_matches_exact_rows(app):
+    from preview import GRID_AXES, PreviewGrid, relative_error
+    from simulation import SimulationJob, default_phases
+
+    phases, _ = default_phases()
+    base = default_run(phases)
+    values = np.zeros((len(phases), *(len(nodes) for nodes in GRID_AXES.values()), *base.shape))
+    grid = PreviewGrid(base, values, np.zeros(base.shape[1], dtype=bool))
+    preview = grid.preview(PHASE_DURATIONS, phases)
+    with ThreadPoolExecutor() as executor:
+        exact = SimulationJob(executor, PHASE_DURATIONS, phases).result()
+
+    keys = ['scenario', 'timestep']
+    assert sorted(map(tuple, preview[keys].to_numpy())) == sorted(map(tuple, exact[keys].to_numpy()))
+    error = relative_error(preview, exact)
+    assert error == approx(dict.fromkeys(error, 0.0), abs=1e-9)
+    assert relative_error(preview.sample(frac=1, random_state=0), exact) == approx(error, abs=1e-9)
+
+
+def test_relative_error_needs_common_rows(app):
+    from preview import relative_error
+    from simulation import SimulationJob, default_phases
+
+    phases, _ = default_phases()
+    with ThreadPoolExecutor() as executor:
+        exact = SimulationJob(executor, PHASE_DURATIONS, phases).result()
+
+    with pytest.raises(ValueError):
+        relative_error(exact, exact.assign(timestep=exact.timestep + 10_000))
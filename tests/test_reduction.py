@@ -0,0 +1,59 @@
+from copy import deepcopy
+
+import numpy as np
+import pytest
+from pytest import approx
+
+from consensus_pledge_model.guards import ThresholdGuard
+from consensus_pledge_model.params import INITIAL_STATE, SINGLE_RUN_PARAMS
+from consensus_pledge_model.reduction import DEFAULT_REDUCERS, ReducingRecorder, reduce_sweep
+from consensus_pledge_model.sensitivity import with_parameters
+from consensus_pledge_model.vectorized import TrajectoryRecorder, VectorizedModel
+
+TIMESTEPS = 20
+PARAMS = [with_parameters(SINGLE_RUN_PARAMS, {'target_locked_supply': value})
+          for value in np.linspace(0.0, 0.4, 5)]
+REDUCERS = {**DEFAULT_REDUCERS,
+            'initial_circulating': ('circulating', 'initial'),
+            'mean_power_qa': ('power_qa', 'mean'),
+            'day_of_max_locked': ('locked', 'day_of_max')}
+
+
+def test_reductions_match_trajectories():
+    recorder = VectorizedModel(deepcopy(INITIAL_STATE), PARAMS).run(TIMESTEPS, TrajectoryRecorder())
+    arrays, days_passed = recorder.arrays(), np.array(recorder.days_passed)
+    kpis = VectorizedModel(deepcopy(INITIAL_STATE), PARAMS).run(
+        TIMESTEPS, ReducingRecorder(REDUCERS)).kpis()
+
+    surplus, locked = arrays['circulating_surplus'], arrays['locked']
+    assert kpis['min_circulating_surplus'] == approx(surplus.min(axis=0))
+    assert kpis['day_of_min_circulating_surplus'] == approx(days_passed[surplus.argmin(axis=0)])
+    assert kpis['peak_locked'] == approx(locked.max(axis=0))
+    assert kpis['day_of_max_locked'] == approx(days_passed[locked.argmax(axis=0)])
+    assert kpis['final_power_qa'] == approx(arrays['power_qa'][-1])
+    assert kpis['mean_power_qa'] == approx(arrays['power_qa'].mean(axis=0))
+    assert kpis['initial_circulating'] == approx(arrays['circulating'][0])
+
+
+def test_halted_members_keep_their_last_values():
+    guard = ThresholdGuard('circulating_surplus', high=200.0)
+    model = VectorizedModel(deepcopy(INITIAL_STATE), PARAMS)
+    kpis = model.run(TIMESTEPS, ReducingRecorder(), [guard]).kpis()
+    assert list(model.halted) == [0]
+    arrays = VectorizedModel(deepcopy(INITIAL_STATE), PARAMS).run(
+        TIMESTEPS, TrajectoryRecorder(), [guard]).arrays()
+    last = np.array([values[~np.isnan(values)][-1] for values in arrays['power_qa'].T])
+    assert kpis['final_power_qa'] == approx(last)
+    assert kpis['final_power_qa'][0] > kpis['final_power_qa'][1]
+
+
+def test_reduce_sweep_is_independent_of_workers():
+    serial = reduce_sweep(deepcopy(INITIAL_STATE), PARAMS, TIMESTEPS, batch_size=2)
+    parallel = reduce_sweep(deepcopy(INITIAL_STATE), PARAMS, TIMESTEPS, batch_size=2, n_jobs=2)
+    assert list(serial.columns) == ['subset', 'target_locked_supply', *DEFAULT_REDUCERS]
+    assert serial.subset.tolist() == list(range(len(PARAMS)))
+    for name in DEFAULT_REDUCERS:
+        assert serial[name].to_numpy() == approx(parallel[name].to_numpy())
+
+    with pytest.raises(ValueError):
+        reduce_sweep(deepcopy(INITIAL_STATE), PARAMS, TIMESTEPS, {'x': ('power_qa', 'median')})
@@ -0,0 +1,43 @@
+import pytest
+
+from consensus_pledge_model.params import INITIAL_STATE, SINGLE_RUN_PARAMS
+from consensus_pledge_model.registry import RunRegistry, canonical_hash
+from consensus_pledge_model.sensitivity import with_parameter
+
+TIMESTEPS = 10
+
+
+def test_canonical_hash():
+    assert canonical_hash({180: 1, 270.0: 2}) == canonical_hash({270: 2.0, 180.0: 1})
+    assert canonical_hash({180: 1}) != canonical_hash({180: 2})
+
+
+def test_registry(tmp_path):
+    params = [with_parameter(SINGLE_RUN_PARAMS, 'target_locked_supply', tls)
+              for tls in (0.1, 0.2, 0.3)]
+    with RunRegistry(tmp_path) as registry:
+        run_hashes = registry.run_batch(INITIAL_STATE, params[:2], TIMESTEPS)
+        assert len(registry) == 2
+
+        # Only the new parameter set is run
+        assert registry.run_batch(INITIAL_STATE, params, TIMESTEPS)[:2] == run_hashes
+        assert len(registry) == 3
+        assert len(list((tmp_path / 'results').glob('*.parquet'))) == 2
+
+        runs = registry.find(target_locked_supply=(0.15, None))
+        assert sorted(runs.target_locked_supply) == [0.2, 0.3]
+        runs = registry.find('"phase_2.new_sector_quality_factor" > ?', 4)
+        assert len(runs) == 0
+        runs = registry.find(**{'phase_1.new_sector_quality_factor': (1.0, None),
+                                'phase_count': (3, 3)})
+        assert len(runs) == 3
+        with pytest.raises(ValueError):
+            registry.find(**{'behavioural_params[270].new_sector_quality_factor': (4, None)})
+        with pytest.raises(ValueError):
+            registry.find('"phase_9.new_sector_quality_factor" > ?', 4)
+        with pytest.raises(ValueError):
+            registry.find('quality_factor > ?', 4)
+
+        df = registry.load(run_hashes[1:])
+        assert len(df) == TIMESTEPS + 1
+        assert set(df.run_hash) == {run_hashes[1]}
@@ -0,0 +1,40 @@
+from copy import deepcopy
+
+import numpy as np
+from cadCAD_tools import easy_run
+from pytest import approx
+
+from consensus_pledge_model.params import INITIAL_STATE, SINGLE_RUN_PARAMS, TIMESTEP_IN_DAYS
+from consensus_pledge_model.results import PARAM_COLUMNS, RESULT_METRICS, results_frame
+from consensus_pledge_model.structure import CONSENSUS_PLEDGE_DEMO_BLOCKS
+from consensus_pledge_model.vectorized import TrajectoryRecorder, VectorizedModel
+
+TIMESTEPS = 30
+
+
+def test_results_frame_matches_cadcad():
+    batch = [SINGLE_RUN_PARAMS, {**SINGLE_RUN_PARAMS, 'target_locked_supply': 0.0}]
+    model = VectorizedModel(deepcopy(INITIAL_STATE), batch)
+    arrays = model.run(TIMESTEPS, TrajectoryRecorder(RESULT_METRICS)).arrays()
+    days_passed = np.arange(TIMESTEPS + 1) * TIMESTEP_IN_DAYS
+    df = results_frame(arrays, days_passed, batch, ['on', 'off'])
+
+    assert len(df) == (TIMESTEPS + 1) * len(batch)
+    assert set(PARAM_COLUMNS) <= set(df.columns)
+    assert list(df.query('subset == 1').scenario.unique()) == ['off']
+
+    for subset, params in enumerate(batch):
+        exact = easy_run(deepcopy(INITIAL_STATE),
+                         {k: [v] for k, v in params.items()},
+                         CONSENSUS_PLEDGE_DEMO_BLOCKS,
+                         TIMESTEPS,
+                         1).sort_values('timestep')
+        result = df.query(f'subset == {subset}').sort_values('timestep')
+        tokens = exact.token_distribution
+        initial_pledge = exact.storage_pledge_per_new_qa_power + exact.consensus_pledge_per_new_qa_power
+        assert result.timestep.tolist() == exact.timestep.tolist()
+        assert result.fil_locked.to_numpy() == approx(tokens.map(lambda x: x.locked).to_numpy())
+        assert result.fil_circulating.to_numpy() == approx(tokens.map(lambda x: x.circulating).to_numpy())
+        assert result.critical_cost.to_numpy() == approx((exact.power_qa * 0.33 * initial_pledge).to_numpy())
+        assert result.daily_reward.to_numpy() == approx(
+            exact.reward.map(lambda x: x.simple_reward + x.baseline_reward).to_numpy() / TIMESTEP_IN_DAYS)
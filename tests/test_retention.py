@@ -0,0 +1,40 @@
+from copy import deepcopy
+
+import pytest
+from cadCAD_tools import easy_run
+from pandas.testing import assert_frame_equal
+
+from consensus_pledge_model.params import INITIAL_STATE, SINGLE_RUN_PARAMS
+from consensus_pledge_model.retention import RetentionPolicy, run_retained
+from consensus_pledge_model.structure import CONSENSUS_PLEDGE_DEMO_BLOCKS
+
+TIMESTEPS = 10
+PARAMS = {**{k: [v] for k, v in SINGLE_RUN_PARAMS.items()}, 'target_locked_supply': [0.3, 0.0]}
+# Dict parameters, which `easy_run` aligns on the index instead of assigning
+DICT_PARAMS = ['vesting_schedule', 'behavioural_params']
+
+
+def test_default_retention_matches_easy_run():
+    exact = easy_run(deepcopy(INITIAL_STATE), PARAMS, CONSENSUS_PLEDGE_DEMO_BLOCKS, TIMESTEPS, 1)
+    df = run_retained(deepcopy(INITIAL_STATE), PARAMS, CONSENSUS_PLEDGE_DEMO_BLOCKS, TIMESTEPS)
+    assert_frame_equal(df.drop(columns=DICT_PARAMS), exact.drop(columns=DICT_PARAMS))
+    assert (df.behavioural_params == SINGLE_RUN_PARAMS['behavioural_params']).all()
+
+
+def test_retention_policy():
+    retention = RetentionPolicy(every=3, start=2, variables=('power_qa', 'target_locked_supply'))
+    df = run_retained(deepcopy(INITIAL_STATE), PARAMS, CONSENSUS_PLEDGE_DEMO_BLOCKS, TIMESTEPS,
+                      retention=retention)
+    assert list(df.columns) == ['power_qa', 'simulation', 'subset', 'run', 'timestep',
+                                'target_locked_supply']
+    assert df.query('subset == 1').timestep.tolist() == [2, 5, 8]
+    assert df.query('subset == 1').target_locked_supply.unique().tolist() == [0.0]
+
+    all_substeps = run_retained(deepcopy(INITIAL_STATE), PARAMS, CONSENSUS_PLEDGE_DEMO_BLOCKS, 2,
+                                retention=RetentionPolicy(last_substep_only=False))
+    substeps = len(CONSENSUS_PLEDGE_DEMO_BLOCKS)
+    assert len(all_substeps) == len(PARAMS['target_locked_supply']) * (1 + 2 * substeps)
+    assert all_substeps.substep.max() == substeps
+
+    with pytest.raises(ValueError):
+        RetentionPolicy(every=0)
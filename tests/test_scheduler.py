@@ -0,0 +1,52 @@
+from copy import deepcopy
+
+from cadCAD_tools import easy_run
+from pandas.testing import assert_frame_equal
+
+from consensus_pledge_model.params import INITIAL_STATE, SINGLE_RUN_PARAMS
+from consensus_pledge_model.scheduler import dependency_levels, reads, schedule, split_blocks
+from consensus_pledge_model.structure import CONSENSUS_PLEDGE_DEMO_BLOCKS, scheduled_blocks
+
+TIMESTEPS = 20
+OBJECT_COLUMNS = ['aggregate_sectors', 'token_distribution', 'reward', 'behaviour']
+
+
+def test_scheduled_blocks_match_the_original_ones():
+    scheduled = scheduled_blocks()
+    assert len(scheduled) == 1
+    params = {k: [v] for k, v in SINGLE_RUN_PARAMS.items()}
+    results = []
+    for blocks in (CONSENSUS_PLEDGE_DEMO_BLOCKS, scheduled):
+        df = easy_run(deepcopy(INITIAL_STATE), params, blocks, TIMESTEPS, 1, assign_params=False)
+        # Objects compare by their fields
+        results.append(df.reset_index(drop=True).assign(
+            **{name: df[name].map(repr).to_numpy() for name in OBJECT_COLUMNS}))
+    assert_frame_equal(*results)
+
+    fused = scheduled[0]['policies']['fused'].__self__
+    assert fused.skipped > 0
+    # A new run starts without the evaluations of this one
+    assert not scheduled_blocks()[0]['policies']['fused'].__self__.memo
+
+
+def test_dependency_levels_and_undeclared_updates():
+    @reads('a')
+    def s_b(_1, _2, _3, state, _5):
+        return ('b', state['a'] + 1)
+
+    @reads()
+    def s_c(_1, _2, _3, _4, _5):
+        return ('c', 1)
+
+    def s_a(_1, _2, _3, state, _5):
+        return ('a', state['b'] + state['c'])
+
+    blocks = [{'label': 'b', 'policies': {}, 'variables': {'b': s_b}},
+              {'label': 'c', 'policies': {}, 'variables': {'c': s_c}},
+              {'label': 'a', 'policies': {}, 'variables': {'a': s_a}}]
+    levels = dependency_levels(split_blocks(blocks), frozenset('abc'))
+    assert [[update.label for update in level] for level in levels] == [['b', 'c'], ['a']]
+
+    scheduled = schedule(blocks)
+    assert [block['label'] for block in scheduled] == ['b / c', 'a']
+    assert scheduled[1]['variables']['a'] is s_a
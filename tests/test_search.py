@@ -0,0 +1,37 @@
+import numpy as np
+from pytest import approx
+
+from consensus_pledge_model.params import INITIAL_STATE, SINGLE_RUN_PARAMS
+from consensus_pledge_model.search import search_parameter
+from consensus_pledge_model.sensitivity import with_parameter
+from consensus_pledge_model.vectorized import VectorizedModel
+
+TIMESTEPS = 20
+
+
+def test_take_members():
+    params = [with_parameter(SINGLE_RUN_PARAMS, 'target_locked_supply', tls)
+              for tls in (0.1, 0.2, 0.3)]
+    full = VectorizedModel(INITIAL_STATE, params).run(TIMESTEPS).arrays()
+
+    model = VectorizedModel(INITIAL_STATE, params)
+    for _ in range(5):
+        model.step()
+    model.take(np.array([0, 2]))
+    for _ in range(TIMESTEPS - 5):
+        model.step()
+    assert model.state.critical_cost == approx(full['critical_cost'][-1, [0, 2]], rel=1e-12)
+
+
+def test_search_parameter():
+    result = search_parameter(INITIAL_STATE, SINGLE_RUN_PARAMS, TIMESTEPS,
+                              'circulating_surplus', 10.0, tolerance=1e-3)
+    assert abs(result.bracket[1] - result.bracket[0]) <= 1e-3
+    assert result.simulations < 100
+    assert result.timesteps_simulated < result.simulations * TIMESTEPS
+
+    params = [with_parameter(SINGLE_RUN_PARAMS, 'target_locked_supply', tls)
+              for tls in result.bracket]
+    surplus = VectorizedModel(INITIAL_STATE, params).run(TIMESTEPS).arrays()['circulating_surplus']
+    feasible, infeasible = surplus[1:].max(axis=0)
+    assert feasible <= 10.0 < infeasible
@@ -0,0 +1,33 @@
+from pytest import approx
+
+from consensus_pledge_model.params import INITIAL_STATE, SINGLE_RUN_PARAMS
+from consensus_pledge_model.sensitivity import local_sensitivity, with_parameter
+from consensus_pledge_model.vectorized import VectorizedModel
+
+TIMESTEPS = 20
+
+
+def test_local_sensitivity():
+    sensitivity = local_sensitivity(INITIAL_STATE, SINGLE_RUN_PARAMS, TIMESTEPS,
+                                    central_differences=True)
+    assert sensitivity.jacobian.shape == (TIMESTEPS + 1,
+                                          len(sensitivity.kpis),
+                                          len(sensitivity.parameters))
+
+    # The critical cost is linear on the target locked supply in the first step
+    tls = SINGLE_RUN_PARAMS['target_locked_supply']
+    batch = [SINGLE_RUN_PARAMS,
+             with_parameter(SINGLE_RUN_PARAMS, 'target_locked_supply', 1.1 * tls)]
+    cost = VectorizedModel(INITIAL_STATE, batch).run(1).arrays()['critical_cost'][1]
+    i = sensitivity.parameters.index('target_locked_supply')
+    assert sensitivity.jacobian[1, 0, i] == approx((cost[1] - cost[0]) / (0.1 * tls),
+                                                   rel=1e-6)
+
+    # Discrete and unused params are left out
+    assert 'storage_pledge_factor' not in sensitivity.parameters
+    assert 'linear_duration' not in sensitivity.parameters
+    assert not any(name.endswith('lifetime') for name in sensitivity.parameters)
+    assert any(name.endswith('.new_sector_quality_factor') for name in sensitivity.parameters)
+
+    df = sensitivity.to_dataframe()
+    assert len(df) == sensitivity.jacobian.size
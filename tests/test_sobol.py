@@ -0,0 +1,29 @@
+import numpy as np
+from pytest import approx
+
+from consensus_pledge_model.params import INITIAL_STATE, SINGLE_RUN_PARAMS
+from consensus_pledge_model.sobol import saltelli_sample, sobol_analysis, sobol_indices
+
+
+def test_sobol_indices():
+    # y = x1 + 2 x2 on the unit square: variance shares of 1/5 and 4/5
+    samples = 20_000
+    rows = saltelli_sample({'x1': (0.0, 1.0), 'x2': (0.0, 1.0)}, samples, seed=0)
+    y = rows @ np.array([1.0, 2.0])
+    first_order, total = sobol_indices(y[:samples],
+                                       y[samples:2 * samples],
+                                       y[2 * samples:].reshape(2, samples))
+    assert first_order == approx([0.2, 0.8], abs=0.03)
+    assert total == approx([0.2, 0.8], abs=0.03)
+
+
+def test_sobol_analysis():
+    indices = sobol_analysis(INITIAL_STATE, SINGLE_RUN_PARAMS, 10,
+                             samples=64, seed=0, num_resamples=10)
+    n_parameters = len(indices.parameters)
+    assert indices.evaluations == 64 * (n_parameters + 2)
+    assert indices.total.shape == (11, len(indices.kpis), n_parameters)
+
+    # The storage pledge factor isn't used by the mechanism
+    assert 'storage_pledge_factor' not in indices.parameters
+    assert 'target_locked_supply' in indices.parameters
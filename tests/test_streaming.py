@@ -0,0 +1,61 @@
+from copy import deepcopy
+
+import numpy as np
+from pytest import approx
+
+from consensus_pledge_model.params import INITIAL_STATE, SINGLE_RUN_PARAMS
+from consensus_pledge_model.streaming import STREAMING_QUANTILES, STREAMING_VARIABLES
+from consensus_pledge_model.streaming import StreamingStatistics, TDigest, run_ensemble
+from consensus_pledge_model.types import StochasticParams
+from consensus_pledge_model.vectorized import TrajectoryRecorder, VectorizedModel
+
+TIMESTEPS = 20
+
+
+def test_tdigest_quantiles():
+    values = np.random.default_rng(0).normal(size=50_000)
+    digest, other = TDigest(), TDigest()
+    for chunk in np.array_split(values[:30_000], 30):
+        digest.update(chunk)
+    other.update(values[30_000:])
+    digest.merge(other)
+
+    assert digest.count == len(values)
+    assert digest.weights.size <= digest.compression
+    assert (digest.min, digest.max) == (values.min(), values.max())
+    quantiles = np.array([0.01, 0.1, 0.5, 0.9, 0.99])
+    assert digest.quantile(quantiles) == approx(np.quantile(values, quantiles), abs=0.01)
+
+
+def test_streaming_statistics_match_trajectories():
+    seeds = np.random.SeedSequence(0).spawn(2)
+    statistics = StreamingStatistics()
+    trajectories = []
+    for seed in seeds:
+        def model():
+            return VectorizedModel(deepcopy(INITIAL_STATE), [SINGLE_RUN_PARAMS] * 50,
+                                   stochastic=StochasticParams(),
+                                   rng=np.random.default_rng(seed))
+        model().run(TIMESTEPS, statistics)
+        trajectories.append(model().run(TIMESTEPS, TrajectoryRecorder(STREAMING_VARIABLES)).arrays())
+
+    df = statistics.to_dataframe()
+    for name in STREAMING_VARIABLES:
+        values = np.concatenate([arrays[name] for arrays in trajectories], axis=1)
+        by_statistic = {statistic: rows[name].to_numpy() for statistic, rows in df.groupby('statistic')}
+        assert by_statistic['count'] == approx(np.full(TIMESTEPS + 1, 100))
+        assert by_statistic['mean'] == approx(values.mean(axis=1))
+        assert by_statistic['std'][1:] == approx(values.std(axis=1, ddof=1)[1:])
+        assert by_statistic['min'] == approx(values.min(axis=1))
+        assert by_statistic['max'] == approx(values.max(axis=1))
+        assert by_statistic['q0.5'] == approx(np.median(values, axis=1), rel=0.01)
+
+
+def test_run_ensemble_is_independent_of_workers():
+    kwargs = dict(samples=30, seed=1, batch_size=10)
+    serial = run_ensemble(deepcopy(INITIAL_STATE), SINGLE_RUN_PARAMS, TIMESTEPS, **kwargs)
+    parallel = run_ensemble(deepcopy(INITIAL_STATE), SINGLE_RUN_PARAMS, TIMESTEPS, n_jobs=2, **kwargs)
+    a, b = serial.to_dataframe(), parallel.to_dataframe()
+    assert len(a) == (TIMESTEPS + 1) * (5 + len(STREAMING_QUANTILES))
+    for name in STREAMING_VARIABLES:
+        assert a[name].to_numpy() == approx(b[name].to_numpy(), nan_ok=True)
@@ -0,0 +1,56 @@
+from copy import deepcopy
+
+import numpy as np
+import pytest
+from cadCAD_tools import easy_run
+from pytest import approx
+
+from consensus_pledge_model.logic import s_network_power
+from consensus_pledge_model.params import INITIAL_STATE, SINGLE_RUN_PARAMS
+from consensus_pledge_model.structure import NETWORK_POWER_BLOCKS
+from consensus_pledge_model.topdown import growth_rates, power_trajectory, run_topdown
+from consensus_pledge_model.topdown import topdown_initial_state
+from consensus_pledge_model.types import NetworkPowerScenario
+
+TIMESTEPS = 40
+SCENARIOS = [NetworkPowerScenario('boom', 30, 100, 200, 250, 0.5, 1.0, -0.2, 0.1),
+             NetworkPowerScenario('flat', 50, 60, 70, 80, 0.0, 0.0, 0.0, 0.0)]
+PARAMS = [dict(SINGLE_RUN_PARAMS, network_power_scenario=scenario) for scenario in SCENARIOS]
+
+
+def test_power_trajectory_matches_s_network_power():
+    days_passed = np.arange(0.0, 400.0, 7.0)
+    rates = growth_rates(SCENARIOS, days_passed)
+    for i, scenario in enumerate(SCENARIOS):
+        assert rates[:, i] == approx([scenario.growth_rate(day) for day in days_passed])
+
+    trajectory = power_trajectory(SCENARIOS, 100.0, days_passed)
+    params = dict(timestep_in_days=7.0, network_power_scenario=SCENARIOS[0])
+    state = dict(network_power=100.0, days_passed=0.0)
+    for expected in trajectory[1:, 0]:
+        _, state['network_power'] = s_network_power(params, None, None, state, None)
+        state['days_passed'] += 7.0
+        assert state['network_power'] == approx(expected)
+    assert trajectory[:, 1] == approx(100.0)
+
+
+def test_run_topdown_matches_network_power_blocks():
+    df = run_topdown(deepcopy(INITIAL_STATE), PARAMS, TIMESTEPS)
+    assert len(df) == len(PARAMS) * (TIMESTEPS + 1)
+    for subset, params in enumerate(PARAMS):
+        exact = easy_run(topdown_initial_state(deepcopy(INITIAL_STATE)),
+                         {k: [v] for k, v in params.items()},
+                         NETWORK_POWER_BLOCKS, TIMESTEPS, 1, assign_params=False)
+        member = df.query(f'subset == {subset}')
+        assert member.days_passed.to_numpy() == approx(exact.days_passed.to_numpy())
+        for name in ('network_power', 'baseline', 'cumm_capped_power', 'effective_network_time'):
+            assert member[name].to_numpy() == approx(exact[name].to_numpy())
+        assert exact.power_rb.to_numpy()[1:] == approx(exact.network_power.to_numpy()[1:])
+        rewards = exact.reward.iloc[1:]
+        assert member.simple_reward.to_numpy()[1:] == approx(
+            rewards.map(lambda r: r.simple_reward).to_numpy())
+        assert member.baseline_reward.to_numpy()[1:] == approx(
+            rewards.map(lambda r: r.baseline_reward).to_numpy())
+
+    with pytest.raises(ValueError):
+        run_topdown(deepcopy(INITIAL_STATE), [SINGLE_RUN_PARAMS], TIMESTEPS)
@@ -0,0 +1,81 @@
+from copy import deepcopy
+from math import inf
+
+import numpy as np
+import pytest
+from cadCAD_tools import easy_run
+from pytest import approx
+
+from consensus_pledge_model.params import DAILY_INITIAL_STATE, DAILY_RUN_PARAMS
+from consensus_pledge_model.params import INITIAL_STATE, SINGLE_RUN_PARAMS
+from consensus_pledge_model.structure import CONSENSUS_PLEDGE_DEMO_BLOCKS
+from consensus_pledge_model.types import BehaviouralParams, StochasticParams
+from consensus_pledge_model.vectorized import VectorizedModel, compact_error, run_monte_carlo
+
+TIMESTEPS = 30
+
+PHASED_PARAMS = {**SINGLE_RUN_PARAMS,
+                 'behavioural_params': {
+                     70: BehaviouralParams(1, 1.0, 1.5, 180, 0.004, 180),
+                     140: BehaviouralParams(2, 200.0, 4.5, 360, 0.0, 360),
+                     inf: BehaviouralParams(3, 1.0, 5.5, 360, 0.004, 360)}}
+
+
+def cadcad_run(params, initial_state=INITIAL_STATE):
+    df = easy_run(deepcopy(initial_state),
+                  {k: [v] for k, v in params.items()},
+                  CONSENSUS_PLEDGE_DEMO_BLOCKS,
+                  TIMESTEPS,
+                  1)
+    return df.assign(
+        circulating=df.token_distribution.map(lambda x: x.circulating),
+        locked_rewards=df.token_distribution.map(lambda x: x.locked_rewards),
+        collateral=df.token_distribution.map(lambda x: x.collateral))
+
+
+@pytest.mark.parametrize('initial_state, batch', [
+    (INITIAL_STATE, [SINGLE_RUN_PARAMS, PHASED_PARAMS]),
+    (DAILY_INITIAL_STATE, [DAILY_RUN_PARAMS])])
+def test_matches_cadcad(initial_state, batch):
+    arrays = VectorizedModel(deepcopy(initial_state), batch).run(TIMESTEPS).arrays()
+
+    for i_member, params in enumerate(batch):
+        expected = cadcad_run(params, initial_state)
+        for variable in ['power_qa',
+                         'power_rb',
+                         'cumm_capped_power',
+                         'consensus_pledge_per_new_qa_power',
+                         'storage_pledge_per_new_qa_power',
+                         'collateral',
+                         'locked_rewards',
+                         'circulating']:
+            assert arrays[variable][:, i_member] == approx(
+                expected[variable].to_numpy(dtype=float), rel=1e-9)
+
+
+def test_monte_carlo():
+    df = run_monte_carlo(INITIAL_STATE, PHASED_PARAMS, TIMESTEPS, 200, seed=42)
+    assert len(df) == (TIMESTEPS + 1) * 5
+    assert df.equals(run_monte_carlo(INITIAL_STATE, PHASED_PARAMS, TIMESTEPS, 200, seed=42))
+
+    # Quantiles are ordered within every timestep
+    for _, timestep_df in df.groupby('timestep'):
+        assert np.all(np.diff(timestep_df.power_qa) >= 0)
+
+    # Without onboarding noise and with fine-grained renewals, the samples
+    # converge to the deterministic run
+    stochastic = StochasticParams(renewal_unit=1e-6, onboarding_noise=0.0)
+    df = run_monte_carlo(INITIAL_STATE, PHASED_PARAMS, TIMESTEPS, 20,
+                         stochastic=stochastic, seed=42, quantiles=[0.5])
+    expected = VectorizedModel(INITIAL_STATE, [PHASED_PARAMS]).run(TIMESTEPS).arrays()
+    assert df.power_qa.to_numpy() == approx(expected['power_qa'][:, 0], rel=1e-3)
+
+
+def test_compact():
+    model = VectorizedModel(INITIAL_STATE, [SINGLE_RUN_PARAMS, PHASED_PARAMS], compact=True)
+    arrays = model.run(TIMESTEPS).arrays()
+    assert model.state.sectors.reward_schedule.dtype == np.float32
+    assert arrays['critical_cost'].dtype == np.float32
+
+    errors = compact_error(INITIAL_STATE, [SINGLE_RUN_PARAMS, PHASED_PARAMS], TIMESTEPS)
+    assert max(errors.values()) < 1e-5